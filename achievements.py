@@ -0,0 +1,67 @@
+"""
+Achievement rules for Nexus Elite Bot
+Each achievement declares the counter it watches, the threshold that unlocks
+it and a fixed bit in the member's achievement bitset. Rules are indexed by
+counter and sorted by threshold, so a counter changing only looks at the
+rules on that counter it has just passed
+"""
+
+import bisect
+
+
+class Achievement:
+    __slots__ = ('id', 'bit', 'counter', 'threshold', 'name', 'description', 'xp', 'icon')
+
+    def __init__(self, id, bit, counter, threshold, name, description, xp, icon):
+        self.id = id
+        # Stored in user bitsets; never reuse or renumber a bit
+        self.bit = bit
+        self.counter = counter
+        self.threshold = threshold
+        self.name = name
+        self.description = description
+        self.xp = xp
+        self.icon = icon
+
+    @property
+    def mask(self):
+        return 1 << self.bit
+
+
+class AchievementRules:
+    """Achievements indexed by counter, with bitset helpers"""
+
+    def __init__(self, achievements):
+        self.achievements = sorted(achievements, key=lambda achievement: achievement.bit)
+        self.by_id = {achievement.id: achievement for achievement in self.achievements}
+        if len({achievement.bit for achievement in self.achievements}) != len(self.achievements):
+            raise ValueError("Achievement bits must be unique")
+        # counter -> (thresholds ascending, achievements in the same order)
+        self._index = {}
+        for achievement in sorted(self.achievements, key=lambda achievement: achievement.threshold):
+            thresholds, rules = self._index.setdefault(achievement.counter, ([], []))
+            thresholds.append(achievement.threshold)
+            rules.append(achievement)
+
+    def __len__(self):
+        return len(self.achievements)
+
+    def __iter__(self):
+        return iter(self.achievements)
+
+    def counters(self):
+        return self._index.keys()
+
+    def reached(self, bits, counter, value):
+        """Achievements on ``counter`` that ``value`` reaches and ``bits`` lacks"""
+        index = self._index.get(counter)
+        if index is None:
+            return []
+        thresholds, rules = index
+        return [rule for rule in rules[:bisect.bisect_right(thresholds, value)] if not bits & rule.mask]
+
+    def unlocked(self, bits):
+        return [achievement for achievement in self.achievements if bits & achievement.mask]
+
+    def count(self, bits):
+        return bin(bits).count('1')
@@ -4,16 +4,31 @@ import audioop_compat
 import discord
 from discord.ext import commands
 import json
-import aiosqlite
 import os
 from datetime import datetime
 import asyncio
+import importlib
 from datetime import datetime, timedelta
 import pytz
 from discord import ui
 from cogs.membercount import update_membercount_channel
 from dotenv import load_dotenv
 from keep_alive import keep_alive
+from database import Database
+from prefixes import PrefixResolver
+from guild_settings import SettingsStore
+from registration import ScrimRegistry, parse_team
+from timers import TimerService
+from counters import ActivityCounters
+from levels import XPEngine
+from voice_sessions import VoiceSessions
+from bounded import Sweeper
+from leaderboards import Leaderboards
+from charts import ChartService
+from rankcards import AvatarCache, RANK_CARD_WORKERS, RANK_CARD_CACHE_SIZE
+from reports import ReportEngine
+from pipeline import MessagePipeline, ORDER_CORE, ORDER_COMMANDS, ORDER_REGISTRATION
+import migrations
 
 # Load environment variables
 load_dotenv()
@@ -58,27 +73,116 @@ except ValueError:
 BOT_ADMINS = [OWNER_ID, 697811836040511498]
 PREFIX = '-'
 
+# Core tables used by bot.py itself; cogs register their own in their modules
+migrations.register('core', [
+    '''CREATE TABLE IF NOT EXISTS noprefix_users (user_id INTEGER PRIMARY KEY)''',
+    '''CREATE TABLE IF NOT EXISTS invite_tracker (user_id INTEGER, guild_id INTEGER, invites INTEGER, PRIMARY KEY (user_id, guild_id))''',
+    '''CREATE TABLE IF NOT EXISTS server_owners (guild_id INTEGER, user_id INTEGER, PRIMARY KEY (guild_id, user_id))''',
+    '''CREATE TABLE IF NOT EXISTS bot_config (key TEXT PRIMARY KEY, value TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS scrim_config (id INTEGER PRIMARY KEY, tag_check_channel_id INTEGER, player_count INTEGER)''',
+    '''CREATE TABLE IF NOT EXISTS scrim_tags (id INTEGER PRIMARY KEY AUTOINCREMENT, team_name TEXT, tag TEXT, user_id INTEGER)''',
+], [
+    '''CREATE TABLE IF NOT EXISTS guild_prefixes (guild_id INTEGER PRIMARY KEY, prefix TEXT NOT NULL)''',
+], migrations.add_columns('scrim_tags', 'guild_id INTEGER'), [
+    # Keep the first registration of each player so the unique index can be built
+    '''DELETE FROM scrim_tags WHERE id NOT IN (SELECT MIN(id) FROM scrim_tags GROUP BY guild_id, tag)''',
+    '''CREATE UNIQUE INDEX IF NOT EXISTS idx_scrim_tags_guild_tag ON scrim_tags (guild_id, tag)''',
+], [
+    '''CREATE INDEX IF NOT EXISTS idx_invite_tracker_guild ON invite_tracker (guild_id, invites)''',
+])
+
 intents = discord.Intents.default()
 intents.members = True
 intents.guilds = True
 intents.messages = True
 intents.message_content = True
 
-# Helper: Check if user is in no-prefix list
-async def is_noprefix(user_id):
-    if user_id in BOT_ADMINS:
-        return True
-    async with aiosqlite.connect('database.db') as db:
-        async with db.execute('SELECT 1 FROM noprefix_users WHERE user_id = ?', (user_id,)) as cursor:
-            return await cursor.fetchone() is not None
-
-# Override get_prefix to allow no-prefix for owner/whitelisted users
+# Override get_prefix to allow per-guild prefixes and no-prefix for owner/whitelisted users
 async def get_prefix(bot, message):
-    if message.author.id == OWNER_ID or await is_noprefix(message.author.id):
-        return commands.when_mentioned_or(PREFIX, '')(bot, message)
-    return commands.when_mentioned_or(PREFIX)(bot, message)
-
-bot = commands.Bot(command_prefix=get_prefix, intents=intents, owner_id=OWNER_ID)
+    return bot.prefixes.resolve(bot, message)
+
+class EliteBot(commands.Bot):
+    async def setup_hook(self):
+        # Open the shared database on the bot's own event loop before any cog loads
+        self.db = Database()
+        await self.db.connect()
+        self.pipeline = MessagePipeline(self)
+        self.pipeline.add_stage('core', core_stage, ORDER_CORE, guild_only=False)
+        self.pipeline.add_stage('commands', commands_stage, ORDER_COMMANDS)
+        self.pipeline.add_stage('registration', registration_stage, ORDER_REGISTRATION)
+        # Import every cog first so all migrations are registered, then migrate once
+        for extension in EXTENSIONS:
+            importlib.import_module(extension)
+        for applied in await migrations.run_migrations(self.db):
+            print(f'Database migrated: {applied}')
+        self.prefixes = PrefixResolver(self.db, PREFIX, BOT_ADMINS)
+        await self.prefixes.load()
+        self.settings = SettingsStore(self.db)
+        self.registrations = ScrimRegistry(self.db)
+        await self.registrations.load()
+        self.timers = TimerService(self.db)
+        await self.timers.load()
+        self.timers.register('noprefix_expire', noprefix_expire)
+        self.counters = ActivityCounters(self.db)
+        self.counters.start()
+        self.levels = XPEngine(self.db)
+        self.levels.start()
+        self.voice = VoiceSessions(self.counters)
+        self.voice.start()
+        # Cogs hand their cooldown and tracker maps to the sweeper as they load
+        self.sweeper = Sweeper()
+        self.sweeper.start()
+        # Filled by each ranking cog from its table as it loads
+        self.leaderboards = Leaderboards(self.db)
+        self.charts = ChartService()
+        # Rank cards get their own pool so a burst of them never waits behind analytics charts
+        self.cards = ChartService(RANK_CARD_WORKERS, RANK_CARD_CACHE_SIZE)
+        self.avatars = AvatarCache()
+        self.reports = ReportEngine(self.db, self.counters)
+        await self.reports.start()
+        # Shown by databasestatus, one field each: title -> the service's stats()
+        self.status_sources = {
+            '⏳ Write Queue': self.db.deferred.stats,
+            '🎯 XP Engine': self.levels.stats,
+            '🎤 Voice Sessions': self.voice.stats,
+            '🏆 Leaderboards': self.leaderboards.stats,
+            '📑 Report Engine': self.reports.stats,
+        }
+        await load_cogs()
+        # Started once the cogs have registered their timer handlers and the guild
+        # and channel caches are filled, so overdue timers can find their targets
+        self.timer_start = asyncio.create_task(self.start_timers())
+
+    async def start_timers(self):
+        await self.wait_until_ready()
+        self.timers.start()
+
+    async def close(self):
+        # Last voice minutes go out while the cogs that take them are still loaded
+        if getattr(self, 'voice', None):
+            await self.voice.close()
+        await super().close()
+        if getattr(self, 'timer_start', None):
+            # Never ready (closed while connecting): the sleeper must not start now
+            self.timer_start.cancel()
+        if getattr(self, 'charts', None):
+            self.charts.close()
+        if getattr(self, 'cards', None):
+            self.cards.close()
+        if getattr(self, 'reports', None):
+            await self.reports.close()
+        if getattr(self, 'timers', None):
+            await self.timers.close()
+        if getattr(self, 'counters', None):
+            await self.counters.close()
+        if getattr(self, 'levels', None):
+            await self.levels.close()
+        if getattr(self, 'sweeper', None):
+            await self.sweeper.close()
+        if getattr(self, 'db', None):
+            await self.db.close()
+
+bot = EliteBot(command_prefix=get_prefix, intents=intents, owner_id=OWNER_ID)
 bot.remove_command('help')
 
 # Invite tracker cache
@@ -95,15 +199,18 @@ async def on_ready():
         print(f'Guild sync failed: {e}')
     await bot.tree.sync()
     print(f'Logged in as {bot.user} (ID: {bot.user.id})')
-    # Initialize database
-    async with aiosqlite.connect('database.db') as db:
-        await db.execute('''CREATE TABLE IF NOT EXISTS noprefix_users (user_id INTEGER PRIMARY KEY)''')
-        await db.execute('''CREATE TABLE IF NOT EXISTS invite_tracker (user_id INTEGER, guild_id INTEGER, invites INTEGER, PRIMARY KEY (user_id, guild_id))''')
-        await db.commit()
-    print('Database initialized.')
     print('Registered commands:')
     for command in bot.commands:
         print(f'- {command.qualified_name}')
+    # Voice sessions from the cached gateway voice states; sessions that ended while disconnected close now
+    for guild in bot.guilds:
+        states = {}
+        for channel in guild.voice_channels + guild.stage_channels:
+            for user_id, state in channel.voice_states.items():
+                member = guild.get_member(user_id)
+                if member and not member.bot:
+                    states[user_id] = (channel.id, state.afk)
+        bot.voice.restore(guild.id, states)
     # Cache invites for all guilds
     for guild in bot.guilds:
         try:
@@ -175,19 +282,62 @@ def modern_embed(
         embed.set_thumbnail(url=thumbnail)
     return embed
 
-# DM auto-reply for bot (more professional)
+class EmbedPages(ui.View):
+    """Previous/next buttons over a list of embeds, usable only by the requester"""
+
+    def __init__(self, author, pages, timeout=120):
+        super().__init__(timeout=timeout)
+        self.author = author
+        self.pages = pages
+        self.page = 0
+        for number, embed in enumerate(pages, 1):
+            embed.set_author(name=f"Page {number}/{len(pages)}")
+        self.update_buttons()
+
+    def update_buttons(self):
+        self.previous.disabled = self.page == 0
+        self.next.disabled = self.page == len(self.pages) - 1
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        if interaction.user.id != self.author.id:
+            await interaction.response.send_message("Only the requester can turn these pages.", ephemeral=True)
+            return False
+        return True
+
+    @ui.button(label="Previous", style=discord.ButtonStyle.secondary, emoji="⬅️")
+    async def previous(self, interaction: discord.Interaction, button: ui.Button):
+        self.page -= 1
+        self.update_buttons()
+        await interaction.response.edit_message(embed=self.pages[self.page], view=self)
+
+    @ui.button(label="Next", style=discord.ButtonStyle.secondary, emoji="➡️")
+    async def next(self, interaction: discord.Interaction, button: ui.Button):
+        self.page += 1
+        self.update_buttons()
+        await interaction.response.edit_message(embed=self.pages[self.page], view=self)
+
+async def send_pages(ctx, pages):
+    """Send one embed as is, or several behind page buttons"""
+    if len(pages) == 1:
+        return await ctx.send(embed=pages[0])
+    return await ctx.send(embed=pages[0], view=EmbedPages(ctx.author, pages))
+
+# Every message goes through the ordered stage pipeline (see pipeline.py)
 @bot.event
 async def on_message(message):
-    if message.author.bot:
-        return
+    await bot.pipeline.dispatch(message)
+
+# Bot info card, DM auto-reply (more professional) and mention reactions
+async def core_stage(ctx):
+    message = ctx.message
     # Respond with self-info ONLY if the message is exactly a mention of the bot
-    if message.guild and len(message.mentions) == 1 and bot.user in message.mentions and message.content.strip() in [f'<@{bot.user.id}>', f'<@!{bot.user.id}>']:
+    if message.guild and ctx.mention_ids == {bot.user.id} and ctx.content.strip() in [f'<@{bot.user.id}>', f'<@!{bot.user.id}>']:
         invite_url = discord.utils.oauth_url(
             bot.user.id,
             permissions=discord.Permissions(administrator=True)
         )
         support_url = "https://discord.gg/xPGJCWpMbM"  # Official support server link
-        prefix = PREFIX
+        prefix = bot.prefixes.prefix_for(message.guild.id)
         total_commands = len(bot.commands)
         help_cmd = f"{prefix}help"
         # Only show features/modules the bot actually supports
@@ -230,7 +380,7 @@ async def on_message(message):
                 self.add_item(discord.ui.Button(label="Support", url=support_url, style=discord.ButtonStyle.link))
         view = InfoView()
         await message.channel.send(embed=embed, view=view, reference=message)
-        return
+        return True
     # DM auto-reply
     if isinstance(message.channel, discord.DMChannel):
         try:
@@ -248,9 +398,9 @@ async def on_message(message):
             await message.channel.send(embed=embed)
         except Exception:
             pass
-        return
+        return True
     # React with emoji if owner is mentioned
-    if any(user.id == OWNER_ID for user in message.mentions):
+    if OWNER_ID in ctx.mention_ids:
         try:
             emoji = bot.get_emoji(1397943669666873344)
             if emoji:
@@ -258,136 +408,70 @@ async def on_message(message):
         except Exception:
             pass
     # React with 👀 if owner is mentioned
-    if any(user.id == OWNER_ID for user in message.mentions):
+    if OWNER_ID in ctx.mention_ids:
         try:
             await message.add_reaction('👀')
         except Exception:
             pass
     # React with 🫣 if user 1201173322843566140 is mentioned
-    if any(user.id == 1201173322843566140 for user in message.mentions):
+    if 1201173322843566140 in ctx.mention_ids:
         try:
             await message.add_reaction('🫣')
         except Exception:
             pass
     # React with ⚔️ if user 697811836040511498 is mentioned
-    if any(user.id == 697811836040511498 for user in message.mentions):
+    if 697811836040511498 in ctx.mention_ids:
         try:
             await message.add_reaction('⚡')
         except Exception:
             pass
-    # Load registration channel
-    
-    # Process commands
-    await bot.process_commands(message)
-    async with aiosqlite.connect('database.db') as db:
-        async with db.execute('SELECT value FROM bot_config WHERE key = ?', ('registration_channel',)) as cursor:
-            reg_row = await cursor.fetchone()
-            if not reg_row:
-                await bot.process_commands(message)
-                return  # Registration channel not set
-            registration_channel_id = int(reg_row[0])
-    if message.channel.id != registration_channel_id:
-        await bot.process_commands(message)
+
+async def commands_stage(ctx):
+    await bot.process_commands(ctx.message)
+
+# Scrim team registration in the configured channel
+async def registration_stage(ctx):
+    message = ctx.message
+    registry = bot.registrations
+    if not registry.is_registration_channel(message.channel.id):
         return  # Only allow registration in the set channel
-    # Load tag check player count
-    async with aiosqlite.connect('database.db') as db:
-        async with db.execute('SELECT player_count FROM scrim_config WHERE id = 1') as cursor:
-            row = await cursor.fetchone()
-            if not row:
-                await bot.process_commands(message)
-                return  # Tag check is disabled, do nothing
-            player_count = row[0]
+    player_count = registry.player_count
+    if not player_count:
+        return  # Tag check is disabled, do nothing
     # Simplified format: first word/line is team name, rest are tags
-    content = message.content.strip()
-    if not content:
+    team = parse_team(message.content, player_count)
+    if team is None:
         await message.add_reaction('❌')
-        await bot.process_commands(message)
-        return
-    lines = content.split('\n')
-    if len(lines) == 1:
-        parts = lines[0].split()
-        if len(parts) < 1 + player_count:
-            await message.add_reaction('❌')
-            await bot.process_commands(message)
-            return
-        team_name = parts[0]
-        tags = parts[1:]
-    else:
-        team_name = lines[0].strip()
-        tags = []
-        for line in lines[1:]:
-            tags.extend(line.strip().split())
-    tags = [tag for tag in tags if tag]
-    # Ensure each tag is a single word (no spaces)
-    if any(' ' in tag for tag in tags):
-        await message.add_reaction('❌')
-        await bot.process_commands(message)
-        return
-    if len(tags) != player_count:
-        await message.add_reaction('❌')
-        await bot.process_commands(message)
         return
+    team_name, tags = team
     # Check that each tag is a valid member and not already registered
     member_ids = set()
     for tag in tags:
-        user_id = None
-        if tag.startswith('<@') and tag.endswith('>'):
-            # Mention format
-            tag_id = tag.replace('<@!', '').replace('<@', '').replace('>', '')
-            if tag_id.isdigit():
-                user_id = int(tag_id)
-        elif tag.isdigit():
-            user_id = int(tag)
-        else:
-            # Try username#discriminator
-            if '#' in tag:
-                name, discrim = tag.rsplit('#', 1)
-                member = discord.utils.get(message.guild.members, name=name, discriminator=discrim)
-                if member:
-                    user_id = member.id
+        user_id = registry.resolve_tag(message.guild, tag)
         if user_id is None:
             await message.add_reaction('❌')
-            await bot.process_commands(message)
-            return
-        member = message.guild.get_member(user_id)
-        if not member:
-            await message.add_reaction('❌')
-            await bot.process_commands(message)
             return
         member_ids.add(user_id)
     if len(member_ids) != player_count:
         await message.add_reaction('❌')
-        await bot.process_commands(message)
         return
-    # Check for duplicate registrations in DB
-    async with aiosqlite.connect('database.db') as db:
-        await db.execute('''CREATE TABLE IF NOT EXISTS scrim_tags (id INTEGER PRIMARY KEY AUTOINCREMENT, team_name TEXT, tag TEXT, user_id INTEGER)''')
-        for user_id in member_ids:
-            async with db.execute('SELECT team_name FROM scrim_tags WHERE tag = ?', (str(user_id),)) as cursor:
-                if await cursor.fetchone():
-                    await message.add_reaction('❌')
-                    await bot.process_commands(message)
-                    return
-        for user_id in member_ids:
-            await db.execute('INSERT INTO scrim_tags (team_name, tag, user_id) VALUES (?, ?, ?)', (team_name, str(user_id), message.author.id))
-        await db.commit()
+    if not await registry.register(message.guild.id, team_name, member_ids, message.author.id):
+        await message.add_reaction('❌')
+        return
     await message.add_reaction('✅')
     # After successful registration:
-    async with aiosqlite.connect('database.db') as db:
-        async with db.execute('SELECT value FROM bot_config WHERE key = ?', ('show_channel',)) as cursor:
-            show_row = await cursor.fetchone()
-    if show_row:
-        show_channel_mention = f'<#{show_row[0]}>'
+    settings = await bot.settings.get(message.guild.id)
+    if settings.show_channel:
+        show_channel_mention = f'<#{settings.show_channel}>'
         await message.channel.send(embed=discord.Embed(title='Registration Successful', description=f'Your team has been registered!\nView all registered teams in {show_channel_mention}.', color=discord.Color.green()), reference=message)
     else:
         await message.channel.send(embed=discord.Embed(title='Registration Successful', description='Your team has been registered!', color=discord.Color.green()), reference=message)
-    await bot.process_commands(message)
 
 async def is_server_owner(ctx):
     # True if server owner or admin or in custom owner list
     if ctx.author.id == ctx.guild.owner_id or ctx.author.guild_permissions.administrator:
         return True
-    async with aiosqlite.connect('database.db') as db:
+    async with bot.db.read() as db:
         async with db.execute('SELECT user_id FROM server_owners WHERE guild_id = ? AND user_id = ?', (ctx.guild.id, ctx.author.id)) as cursor:
             return await cursor.fetchone() is not None
 
@@ -404,10 +488,8 @@ def is_admin(ctx):
 @commands.check(is_guild_owner)
 async def addowner(ctx, user: discord.User):
     """Add a user as a server-level bot owner (server owner or bot owner only)."""
-    async with aiosqlite.connect('database.db') as db:
-        await db.execute('''CREATE TABLE IF NOT EXISTS server_owners (guild_id INTEGER, user_id INTEGER, PRIMARY KEY (guild_id, user_id))''')
+    async with bot.db.write() as db:
         await db.execute('INSERT OR IGNORE INTO server_owners (guild_id, user_id) VALUES (?, ?)', (ctx.guild.id, user.id))
-        await db.commit()
     embed = discord.Embed(
         title="Server Owner Added",
         description=f"{user.mention} is now a server-level bot owner and can use all admin/server owner commands in this server.",
@@ -431,9 +513,7 @@ async def addnoprefix_timed(ctx, user: discord.User):
         return
     duration_str = msg.content.strip().lower()
     if duration_str in ["lifetime", "permanent"]:
-        async with aiosqlite.connect('database.db') as db:
-            await db.execute('INSERT OR IGNORE INTO noprefix_users (user_id) VALUES (?)', (user.id,))
-            await db.commit()
+        await bot.prefixes.add_noprefix(user.id)
         await ctx.send(f'Added {user.mention} to no-prefix list for lifetime.')
         return
     def parse_duration(duration_str):
@@ -460,26 +540,26 @@ async def addnoprefix_timed(ctx, user: discord.User):
     if seconds == 0:
         await ctx.send("❌ Invalid duration format. Use e.g. 1h, 30m, 2d, 2mo, lifetime.")
         return
-    async with aiosqlite.connect('database.db') as db:
-        await db.execute('INSERT OR IGNORE INTO noprefix_users (user_id) VALUES (?)', (user.id,))
-        await db.commit()
+    await bot.prefixes.add_noprefix(user.id)
+    await bot.timers.schedule('noprefix_expire', datetime.utcnow() + timedelta(seconds=seconds),
+                              {'user_id': user.id, 'channel_id': ctx.channel.id, 'duration': duration_str})
     await ctx.send(f'Added {user.mention} to no-prefix list for {duration_str} ({seconds//60} minutes).')
-    await asyncio.sleep(seconds)
-    async with aiosqlite.connect('database.db') as db:
-        await db.execute('DELETE FROM noprefix_users WHERE user_id = ?', (user.id,))
-        await db.commit()
-    try:
-        await ctx.send(f'Removed {user.mention} from no-prefix list after {duration_str}.')
-    except Exception:
-        pass
+
+# Timer handler: end a timed no-prefix grant
+async def noprefix_expire(payload):
+    await bot.prefixes.remove_noprefix(payload['user_id'])
+    channel = bot.get_channel(payload['channel_id'])
+    if channel:
+        try:
+            await channel.send(f"Removed <@{payload['user_id']}> from no-prefix list after {payload['duration']}.")
+        except Exception:
+            pass
 
 @bot.command(name='np')
 @commands.check(is_owner)
 async def np(ctx, user: discord.User):
     """Give no-prefix access to a user (owner only, can be used without prefix)."""
-    async with aiosqlite.connect('database.db') as db:
-        await db.execute('INSERT OR IGNORE INTO noprefix_users (user_id) VALUES (?)', (user.id,))
-        await db.commit()
+    await bot.prefixes.add_noprefix(user.id)
     embed = discord.Embed(
         title="No-Prefix Granted",
         description=f"{user.mention} can now use commands without a prefix.",
@@ -491,9 +571,7 @@ async def np(ctx, user: discord.User):
 @commands.check(is_owner)
 async def removenp(ctx, user: discord.User):
     """Remove no-prefix access from a user (owner only, can be used without prefix)."""
-    async with aiosqlite.connect('database.db') as db:
-        await db.execute('DELETE FROM noprefix_users WHERE user_id = ?', (user.id,))
-        await db.commit()
+    await bot.prefixes.remove_noprefix(user.id)
     embed = discord.Embed(
         title="No-Prefix Revoked",
         description=f"{user.mention} can no longer use commands without a prefix.",
@@ -505,19 +583,16 @@ async def removenp(ctx, user: discord.User):
 @commands.check(is_owner)
 async def listnp(ctx):
     """List all users with no-prefix access (owner only, can be used without prefix)."""
-    async with aiosqlite.connect('database.db') as db:
-        async with db.execute('SELECT user_id FROM noprefix_users') as cursor:
-            rows = await cursor.fetchall()
-    if not rows:
+    if not bot.prefixes.noprefix:
         await ctx.send('No users have no-prefix access.')
         return
     user_mentions = []
-    for row in rows:
-        user = bot.get_user(row[0])
+    for user_id in sorted(bot.prefixes.noprefix):
+        user = bot.get_user(user_id)
         if user:
             user_mentions.append(user.mention)
         else:
-            user_mentions.append(f'`{row[0]}`')
+            user_mentions.append(f'`{user_id}`')
     embed = discord.Embed(
         title="No-Prefix Users",
         description='\n'.join(user_mentions),
@@ -529,9 +604,8 @@ async def listnp(ctx):
 @commands.check(is_guild_owner)
 async def removeowner(ctx, user: discord.User):
     """Remove a user as a server-level bot owner (server owner or bot owner only)."""
-    async with aiosqlite.connect('database.db') as db:
+    async with bot.db.write() as db:
         await db.execute('DELETE FROM server_owners WHERE guild_id = ? AND user_id = ?', (ctx.guild.id, user.id))
-        await db.commit()
     embed = discord.Embed(
         title="Server Owner Removed",
         description=f"{user.mention} is no longer a server-level bot owner in this server.",
@@ -543,7 +617,7 @@ async def removeowner(ctx, user: discord.User):
 @commands.check(is_guild_owner)
 async def listowners(ctx):
     """List all server-level bot owners for this server (server owner or bot owner only)."""
-    async with aiosqlite.connect('database.db') as db:
+    async with bot.db.read() as db:
         async with db.execute('SELECT user_id FROM server_owners WHERE guild_id = ?', (ctx.guild.id,)) as cursor:
             rows = await cursor.fetchall()
     if not rows:
@@ -709,51 +783,46 @@ async def setup_help(bot):
     await bot.add_cog(HelpCog(bot))
 
 # Auto-load all cogs from cogs directory
-async def load_cogs():
-    await bot.load_extension('cogs.utility')
-    await bot.load_extension('cogs.invites')
-    await bot.load_extension('cogs.config')
-    await bot.load_extension('cogs.voice')
-    await bot.load_extension('cogs.moderation')
-    await bot.load_extension('cogs.info')
-    await bot.load_extension('cogs.welcome')
-    await bot.load_extension('cogs.logging')
-    await bot.load_extension('cogs.economy')
-    await bot.load_extension('cogs.fun')
-    await bot.load_extension('cogs.game')
-    await bot.load_extension('cogs.settings')
-    await bot.load_extension('cogs.leveling')
-    await bot.load_extension('cogs.automod')
-    await bot.load_extension('cogs.analytics')
-    await bot.load_extension('cogs.events')
-    await bot.load_extension('cogs.ai')
-    await bot.load_extension('cogs.social')
-    await bot.load_extension('cogs.weather')
-    await bot.load_extension('cogs.advanced')
-    await bot.load_extension('cogs.entertainment')
-    await bot.load_extension('cogs.security')
-    await bot.load_extension('cogs.productivity')
-    await bot.load_extension('cogs.automation')
-    await bot.load_extension('cogs.announce')
-    await bot.load_extension('cogs.giveaway')
+EXTENSIONS = [
+    'cogs.utility',
+    'cogs.invites',
+    'cogs.config',
+    'cogs.voice',
+    'cogs.moderation',
+    'cogs.info',
+    'cogs.welcome',
+    'cogs.logging',
+    'cogs.economy',
+    'cogs.fun',
+    'cogs.game',
+    'cogs.settings',
+    'cogs.leveling',
+    'cogs.automod',
+    'cogs.analytics',
+    'cogs.events',
+    'cogs.ai',
+    'cogs.social',
+    'cogs.weather',
+    'cogs.advanced',
+    'cogs.entertainment',
+    'cogs.security',
+    'cogs.productivity',
+    'cogs.automation',
+    'cogs.announce',
+    'cogs.giveaway',
     # Add more cogs here if needed
-    await setup_help(bot)
+]
 
-if __name__ == "__main__":
-    import asyncio
-    # Start keep-alive server for Render
-    keep_alive()
-    print("🚀 Keep-alive server started!")
-    
-    # Load cogs and run bot
-    asyncio.run(load_cogs())
+async def load_cogs():
+    for extension in EXTENSIONS:
+        await bot.load_extension(extension)
+    await setup_help(bot)
     print("✅ All cogs loaded successfully!")
-    print("🤖 Starting Nexus Elite Bot...")
-    bot.run(TOKEN)
 
 @bot.event
 async def on_member_join(member):
     await update_membercount_channel(member.guild)
+    bot.registrations.add_member(member)
     # Invite tracker logic
     try:
         old_invites = invite_cache.get(member.guild.id, [])
@@ -768,46 +837,57 @@ async def on_member_join(member):
         invite_count = None
         if used:
             inviter = used.inviter
-            async with aiosqlite.connect('database.db') as db:
+            async with bot.db.read() as db:
                 row = await db.execute('SELECT invites FROM invite_tracker WHERE user_id = ? AND guild_id = ?', (inviter.id, member.guild.id))
                 result = await row.fetchone()
                 invite_count = result[0] if result else 1
+            # Cogs counting invites (leveling achievements) listen for this
+            bot.dispatch('member_invited', member, inviter)
         invite_cache[member.guild.id] = new_invites
         # Announce in invite log channel if set
-        async with aiosqlite.connect('database.db') as db:
-            row = await db.execute('SELECT value FROM bot_config WHERE key = ?', (f'invite_log_channel_{member.guild.id}',))
-            result = await row.fetchone()
-        if result:
-            channel = member.guild.get_channel(int(result[0]))
-            if channel:
-                if inviter:
-                    await channel.send(f"{member.mention} has joined {member.guild.name}, invited by {inviter.mention}, who now has {invite_count} invites.")
-                else:
-                    await channel.send(f"{member.mention} has joined {member.guild.name}, but I don't know who invited them.")
+        settings = await bot.settings.get(member.guild.id)
+        channel = settings.channel(member.guild, 'invite_log_channel')
+        if channel:
+            if inviter:
+                await channel.send(f"{member.mention} has joined {member.guild.name}, invited by {inviter.mention}, who now has {invite_count} invites.")
+            else:
+                await channel.send(f"{member.mention} has joined {member.guild.name}, but I don't know who invited them.")
     except Exception:
         pass
 
 @bot.event
 async def on_member_remove(member):
     await update_membercount_channel(member.guild)
+    bot.registrations.remove_member(member)
     # Find inviter for leave log
     inviter = None
-    async with aiosqlite.connect('database.db') as db:
-        row = await db.execute('SELECT value FROM bot_config WHERE key = ?', (f'leave_log_channel_{member.guild.id}',))
-        result = await row.fetchone()
-        inviter_row = await db.execute('SELECT user_id FROM invite_tracker WHERE guild_id = ? AND user_id IN (SELECT user_id FROM invite_tracker WHERE guild_id = ?)', (member.guild.id, member.guild.id))
-        inviter_result = await inviter_row.fetchone()
-    if result:
-        channel = member.guild.get_channel(int(result[0]))
-        if channel:
-            # Try to find the inviter by checking the invite_tracker table for the member's inviter
-            # (This is a best-effort guess, as Discord does not provide a direct way to track who invited a user after they leave)
-            # We'll use the last known inviter if available
-            inviter_id = None
-            async with aiosqlite.connect('database.db') as db:
-                row = await db.execute('SELECT user_id FROM invite_tracker WHERE guild_id = ? ORDER BY invites DESC LIMIT 1', (member.guild.id,))
-                inviter_row = await row.fetchone()
-                if inviter_row:
-                    inviter_id = inviter_row[0]
-            inviter_mention = f'<@{inviter_id}>' if inviter_id else 'Unknown'
-            await channel.send(f'**{member.display_name}** left the server, they were invited by {inviter_mention}.') 
+    settings = await bot.settings.get(member.guild.id)
+    channel = settings.channel(member.guild, 'leave_log_channel')
+    if channel:
+        # Try to find the inviter by checking the invite_tracker table for the member's inviter
+        # (This is a best-effort guess, as Discord does not provide a direct way to track who invited a user after they leave)
+        # We'll use the last known inviter if available
+        inviter_id = None
+        top = bot.leaderboards.board('invites', member.guild.id).page(0, 1)
+        if top:
+            inviter_id = top[0][0]
+        inviter_mention = f'<@{inviter_id}>' if inviter_id else 'Unknown'
+        await channel.send(f'**{member.display_name}** left the server, they were invited by {inviter_mention}.')
+
+@bot.event
+async def on_user_update(before, after):
+    bot.registrations.rename_user(before, after)
+
+@bot.event
+async def on_voice_state_update(member, before, after):
+    if not member.bot:
+        bot.voice.update(member.guild.id, member.id, after.channel.id if after.channel else None, after.afk)
+
+if __name__ == "__main__":
+    # Start keep-alive server for Render
+    keep_alive()
+    print("🚀 Keep-alive server started!")
+    
+    # Cogs are loaded from setup_hook once the database is open
+    print("🤖 Starting Nexus Elite Bot...")
+    bot.run(TOKEN)
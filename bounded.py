@@ -0,0 +1,191 @@
+"""
+Bounded in-memory containers for Nexus Elite Bot
+Cooldowns, spam trackers and pending requests live in these instead of plain
+dicts. Entries expire on the monotonic clock, are dropped when read after
+expiring and are swept periodically, so a long-running bot only holds state
+for recent activity
+"""
+
+import asyncio
+import os
+import time
+import weakref
+from collections import OrderedDict
+
+SWEEP_SECONDS = int(os.getenv('CONTAINER_SWEEP_SECONDS', '60'))
+
+_MISSING = object()
+
+
+class TTLMap:
+    """Mapping whose entries expire ``ttl`` seconds after they were last set
+
+    Setting a key moves it to the back, so entries are always in expiry order
+    and a sweep stops at the first live one. With ``maxlen`` the entry closest
+    to expiring makes room for a new one.
+    """
+
+    __slots__ = ('ttl', 'maxlen', '_data', '__weakref__')
+
+    def __init__(self, ttl, maxlen=None):
+        self.ttl = ttl
+        self.maxlen = maxlen
+        # key -> (monotonic expiry, value)
+        self._data = OrderedDict()
+
+    def __setitem__(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        if self.maxlen is not None and len(self._data) > self.maxlen:
+            self._data.popitem(last=False)
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        if entry[0] <= time.monotonic():
+            del self._data[key]
+            return default
+        return entry[1]
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        if entry is None or entry[0] <= time.monotonic():
+            return default
+        return entry[1]
+
+    def __len__(self):
+        # Expired entries count until they are read or swept
+        return len(self._data)
+
+    def sweep(self, now=None):
+        """Drop expired entries and return how many there were"""
+        now = time.monotonic() if now is None else now
+        data = self._data
+        removed = 0
+        while data:
+            key, (expires, _) = next(iter(data.items()))
+            if expires > now:
+                break
+            del data[key]
+            removed += 1
+        return removed
+
+
+class LRU:
+    """Mapping of at most ``maxlen`` entries, dropping the least recently used"""
+
+    __slots__ = ('maxlen', '_data')
+
+    def __init__(self, maxlen):
+        self.maxlen = maxlen
+        self._data = OrderedDict()
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxlen:
+            self._data.popitem(last=False)
+
+    def get(self, key, default=None):
+        value = self._data.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def pop(self, key, default=None):
+        return self._data.pop(key, default)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TimeRing:
+    """Count of events in the last ``window`` seconds, kept in a ring of ``buckets`` slots
+
+    Memory is fixed however many events arrive; counts are exact to one
+    slot's width (``window / buckets`` seconds).
+    """
+
+    __slots__ = ('width', 'counts', 'slots')
+
+    def __init__(self, window, buckets=10):
+        self.width = window / buckets
+        self.counts = [0] * buckets
+        # Which time slot each bucket currently counts
+        self.slots = [-1] * buckets
+
+    def add(self, amount=1, now=None):
+        slot = int((time.monotonic() if now is None else now) // self.width)
+        index = slot % len(self.counts)
+        if self.slots[index] != slot:
+            self.slots[index] = slot
+            self.counts[index] = 0
+        self.counts[index] += amount
+
+    def count(self, now=None):
+        slot = int((time.monotonic() if now is None else now) // self.width)
+        oldest = slot - len(self.counts) + 1
+        return sum(count for count, bucket in zip(self.counts, self.slots) if bucket >= oldest)
+
+
+class Sweeper:
+    """Sweeps every TTLMap passed to ``track`` once per interval"""
+
+    def __init__(self, interval=SWEEP_SECONDS):
+        self.interval = interval
+        # Maps of unloaded cogs disappear with them
+        self._maps = weakref.WeakSet()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._closing = False
+        self.swept = 0
+
+    def track(self, ttl_map):
+        self._maps.add(ttl_map)
+        return ttl_map
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+    def sweep(self):
+        now = time.monotonic()
+        for ttl_map in list(self._maps):
+            self.swept += ttl_map.sweep(now)
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not self._closing:
+                self.sweep()
@@ -0,0 +1,145 @@
+"""
+Chart rendering for Nexus Elite Bot
+Charts are drawn with matplotlib's object-oriented Figure API in worker
+processes, so a render never blocks the event loop and concurrent renders
+never share pyplot's global state. Finished PNGs are cached by the caller's
+key, which should include a version of the data being drawn
+"""
+
+import asyncio
+import io
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+CHART_WORKERS = int(os.getenv('CHART_WORKERS', '2'))
+CHART_CACHE_SIZE = int(os.getenv('CHART_CACHE_SIZE', '64'))
+
+# Workers are forked from a clean single-threaded server where available
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# (width, height) in inches and dpi; 'embed' is 800x500, the width Discord shows inline
+PRESETS = {
+    'embed': ((8, 5), 100),
+    'hd': ((12, 8), 150),
+}
+
+
+def render_trends(title, dates, series, preset='embed'):
+    """PNG of the two-panel activity trends chart
+
+    ``dates`` are 'YYYY-MM-DD' strings and ``series`` maps a label to
+    (values, color, panel). Runs in a worker process, which is where
+    matplotlib is imported.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.dates as mdates
+    from matplotlib.figure import Figure
+
+    figsize, dpi = PRESETS[preset]
+    days = [datetime.strptime(date, '%Y-%m-%d') for date in dates]
+    figure = Figure(figsize=figsize, dpi=dpi)
+    top, bottom = figure.subplots(2, 1, sharex=True)
+    for label, (values, color, panel) in series.items():
+        axes = top if panel == 0 else bottom
+        axes.plot(days, values, color=color, label=label, linewidth=2)
+    top.set_title(title)
+    for axes in (top, bottom):
+        axes.set_ylabel('Count')
+        axes.legend()
+        axes.grid(True, alpha=0.3)
+    bottom.set_xlabel('Date')
+    bottom.xaxis.set_major_formatter(mdates.DateFormatter('%m-%d'))
+    bottom.xaxis.set_major_locator(mdates.DayLocator(interval=max(1, len(days) // 7)))
+    for label in bottom.get_xticklabels():
+        label.set_rotation(45)
+    figure.tight_layout()
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+def render_heatmap(title, grid, preset='embed'):
+    """PNG of a weekday x hour heatmap; ``grid`` is 7 rows (Monday first) of 24 counts"""
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.figure import Figure
+
+    figsize, dpi = PRESETS[preset]
+    figure = Figure(figsize=figsize, dpi=dpi)
+    axes = figure.subplots()
+    image = axes.imshow(grid, aspect='auto', cmap='YlOrRd', interpolation='nearest')
+    axes.set_title(title)
+    axes.set_yticks(range(7))
+    axes.set_yticklabels(['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'])
+    axes.set_xticks(range(0, 24, 2))
+    axes.set_xlabel('Hour (UTC)')
+    figure.colorbar(image, ax=axes, label='Messages')
+    figure.tight_layout()
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+class ChartService:
+    """Process pool for chart renders with an LRU cache of the results"""
+
+    def __init__(self, workers=CHART_WORKERS, cache_size=CHART_CACHE_SIZE):
+        self.workers = workers
+        self.cache_size = cache_size
+        self._pool = None
+        self._cache = OrderedDict()
+        # Renders in progress, shared by every caller asking for the same key
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _executor(self):
+        # Started on first use so the bot does not pay for workers it never needs
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context(START_METHOD))
+        return self._pool
+
+    async def render(self, key, func, *args):
+        """PNG bytes of ``func(*args)`` run in a worker, cached under ``key``
+
+        ``func`` must be a module-level function so it can be pickled.
+        """
+        png = self._cache.get(key)
+        if png is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return png
+        future = self._inflight.get(key)
+        if future is None:
+            self.misses += 1
+            future = asyncio.get_running_loop().run_in_executor(self._executor(), func, *args)
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._finished(key, done))
+        # A cancelled caller must not cancel a render others are waiting for
+        return await asyncio.shield(future)
+
+    def _finished(self, key, future):
+        self._inflight.pop(key, None)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            self._cache[key] = future.result()
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        elif isinstance(error, BrokenProcessPool):
+            # A worker died; start a fresh pool for the next render
+            self._pool = None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
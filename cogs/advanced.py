@@ -2,43 +2,67 @@ import discord
 from discord.ext import commands
 from discord import ui
 from bot import modern_embed
-import aiosqlite
 import json
 import asyncio
 from datetime import datetime
 import os
+import random
+import migrations
+from pipeline import ORDER_RESPONDERS
+
+migrations.register('advanced', [
+    '''CREATE TABLE IF NOT EXISTS custom_commands
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER, command_name TEXT, response TEXT,
+        created_by INTEGER, created_at TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS webhooks
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER, channel_id INTEGER, webhook_id INTEGER,
+        name TEXT, created_at TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS backups
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER, backup_name TEXT, backup_data TEXT,
+        created_by INTEGER, created_at TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS auto_responses
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER, trigger TEXT, response TEXT,
+        created_by INTEGER, created_at TEXT)''',
+], migrations.add_columns('webhooks', 'webhook_id INTEGER'), [
+    '''CREATE INDEX IF NOT EXISTS idx_custom_commands_guild_name ON custom_commands (guild_id, command_name)''',
+    '''CREATE INDEX IF NOT EXISTS idx_auto_responses_guild_trigger ON auto_responses (guild_id, trigger)''',
+    '''CREATE INDEX IF NOT EXISTS idx_webhooks_guild ON webhooks (guild_id, webhook_id)''',
+    '''CREATE INDEX IF NOT EXISTS idx_backups_guild ON backups (guild_id)''',
+])
+
 
 class Advanced(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.custom_commands = {}
         self.webhooks = {}
         self.backup_data = {}
-        # Remove async initialization from __init__
-
-    async def init_database(self):
-        async with aiosqlite.connect('database.db') as db:
-            await db.execute('''CREATE TABLE IF NOT EXISTS custom_commands 
-                               (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                guild_id INTEGER, command_name TEXT, response TEXT,
-                                created_by INTEGER, created_at TEXT)''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS webhooks 
-                               (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                guild_id INTEGER, channel_id INTEGER, webhook_id INTEGER,
-                                name TEXT, created_at TEXT)''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS backups 
-                               (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                guild_id INTEGER, backup_name TEXT, backup_data TEXT,
-                                created_by INTEGER, created_at TEXT)''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS auto_responses 
-                               (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                guild_id INTEGER, trigger TEXT, response TEXT,
-                                created_by INTEGER, created_at TEXT)''')
-            await db.commit()
 
     async def cog_load(self):
-        """Async initialization when cog loads"""
-        await self.init_database()
+        self.bot.pipeline.add_feature('responders', self.load_responders)
+        self.bot.pipeline.add_stage('responders', self.responders_stage, ORDER_RESPONDERS, feature='responders')
+
+    async def cog_unload(self):
+        self.bot.pipeline.remove_stage('responders')
+        self.bot.pipeline.remove_feature('responders')
+
+    async def load_responders(self, guild_id):
+        """Pipeline feature: the guild's custom commands and auto-responses, if any"""
+        async with self.bot.db.read() as db:
+            async with db.execute('''SELECT COALESCE(command_name, name), response
+                                   FROM custom_commands WHERE guild_id = ?''', (guild_id,)) as cursor:
+                commands_map = {name: response for name, response in await cursor.fetchall() if name}
+            async with db.execute('''SELECT trigger, response, chance FROM auto_responses
+                                   WHERE guild_id = ? AND enabled AND substr(trigger, 1, 9) != 'autorole_' ''',
+                                (guild_id,)) as cursor:
+                responses = {trigger.strip().lower(): (response, chance)
+                             for trigger, response, chance in await cursor.fetchall() if trigger}
+        if not commands_map and not responses:
+            return None
+        return {'commands': commands_map, 'responses': responses}
 
     @commands.hybrid_command(name="customcmd", description="Create a custom command.")
     async def create_custom_command(self, ctx, command_name: str, *, response: str):
@@ -52,31 +76,32 @@ class Advanced(commands.Cog):
             return
         
         # Check if command already exists
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             async with db.execute('''SELECT id FROM custom_commands 
                                    WHERE guild_id = ? AND command_name = ?''',
                                 (ctx.guild.id, command_name)) as cursor:
                 existing = await cursor.fetchone()
             
-            if existing:
-                await ctx.send(embed=modern_embed(
-                    title="❌ Command Exists",
-                    description=f"Command `{command_name}` already exists!",
-                    color=discord.Color.red(),
-                    ctx=ctx
-                ))
-                return
-            
-            # Create custom command
-            await db.execute('''INSERT INTO custom_commands 
-                               (guild_id, command_name, response, created_by, created_at)
-                               VALUES (?, ?, ?, ?, ?)''',
-                           (ctx.guild.id, command_name, response, ctx.author.id,
-                            datetime.utcnow().isoformat()))
-            await db.commit()
+            if not existing:
+                # Create custom command
+                await db.execute('''INSERT INTO custom_commands 
+                                   (guild_id, command_name, response, created_by, created_at)
+                                   VALUES (?, ?, ?, ?, ?)''',
+                               (ctx.guild.id, command_name, response, ctx.author.id,
+                                datetime.utcnow().isoformat()))
         
-        # Store in memory for quick access
-        self.custom_commands[f"{ctx.guild.id}_{command_name}"] = response
+        # Replies go out once the write lock is released
+        if existing:
+            await ctx.send(embed=modern_embed(
+                title="❌ Command Exists",
+                description=f"Command `{command_name}` already exists!",
+                color=discord.Color.red(),
+                ctx=ctx
+            ))
+            return
+        
+        # Reload the guild's responders on the next message
+        self.bot.pipeline.invalidate(ctx.guild.id, 'responders')
         
         await ctx.send(embed=modern_embed(
             title="✅ Custom Command Created",
@@ -88,7 +113,7 @@ class Advanced(commands.Cog):
 
     @commands.hybrid_command(name="customcmds", description="List all custom commands.")
     async def list_custom_commands(self, ctx):
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('''SELECT command_name, response, created_at
                                    FROM custom_commands WHERE guild_id = ?''',
                                 (ctx.guild.id,)) as cursor:
@@ -123,19 +148,16 @@ class Advanced(commands.Cog):
 
     @commands.hybrid_command(name="delcmd", description="Delete a custom command.")
     async def delete_custom_command(self, ctx, command_name: str):
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             async with db.execute('''DELETE FROM custom_commands 
                                    WHERE guild_id = ? AND command_name = ?''',
                                 (ctx.guild.id, command_name)) as cursor:
                 deleted = cursor.rowcount
             
-            await db.commit()
         
         if deleted > 0:
-            # Remove from memory
-            key = f"{ctx.guild.id}_{command_name}"
-            if key in self.custom_commands:
-                del self.custom_commands[key]
+            # Reload the guild's responders on the next message
+            self.bot.pipeline.invalidate(ctx.guild.id, 'responders')
             
             await ctx.send(embed=modern_embed(
                 title="✅ Command Deleted",
@@ -169,13 +191,12 @@ class Advanced(commands.Cog):
             webhook = await channel.create_webhook(name=name)
             
             # Store webhook
-            async with aiosqlite.connect('database.db') as db:
+            async with self.bot.db.write() as db:
                 await db.execute('''INSERT INTO webhooks 
                                    (guild_id, channel_id, webhook_id, name, created_at)
                                    VALUES (?, ?, ?, ?, ?)''',
                                (ctx.guild.id, channel.id, webhook.id, name,
                                 datetime.utcnow().isoformat()))
-                await db.commit()
             
             await ctx.send(embed=modern_embed(
                 title="✅ Webhook Created",
@@ -193,7 +214,7 @@ class Advanced(commands.Cog):
 
     @commands.hybrid_command(name="webhooks", description="List all webhooks.")
     async def list_webhooks(self, ctx):
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('''SELECT name, channel_id, webhook_id, created_at
                                    FROM webhooks WHERE guild_id = ?''',
                                 (ctx.guild.id,)) as cursor:
@@ -240,7 +261,7 @@ class Advanced(commands.Cog):
             return
         
         # Check if webhook exists in database
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('''SELECT channel_id, name FROM webhooks 
                                    WHERE guild_id = ? AND webhook_id = ?''',
                                 (ctx.guild.id, webhook_id)) as cursor:
@@ -266,11 +287,10 @@ class Advanced(commands.Cog):
             await webhook.delete()
             
             # Remove from database
-            async with aiosqlite.connect('database.db') as db:
+            async with self.bot.db.write() as db:
                 await db.execute('''DELETE FROM webhooks 
                                    WHERE guild_id = ? AND webhook_id = ?''',
                                (ctx.guild.id, webhook_id))
-                await db.commit()
             
             await ctx.send(embed=modern_embed(
                 title="✅ Webhook Deleted",
@@ -281,11 +301,10 @@ class Advanced(commands.Cog):
             
         except discord.NotFound:
             # Webhook doesn't exist on Discord, just remove from database
-            async with aiosqlite.connect('database.db') as db:
+            async with self.bot.db.write() as db:
                 await db.execute('''DELETE FROM webhooks 
                                    WHERE guild_id = ? AND webhook_id = ?''',
                                (ctx.guild.id, webhook_id))
-                await db.commit()
             
             await ctx.send(embed=modern_embed(
                 title="✅ Webhook Removed",
@@ -354,13 +373,12 @@ class Advanced(commands.Cog):
                 backup_data["roles"].append(role_data)
         
         # Store backup
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''INSERT INTO backups 
                                (guild_id, backup_name, backup_data, created_by, created_at)
                                VALUES (?, ?, ?, ?, ?)''',
                            (ctx.guild.id, backup_name, json.dumps(backup_data),
                             ctx.author.id, datetime.utcnow().isoformat()))
-            await db.commit()
         
         await ctx.send(embed=modern_embed(
             title="✅ Backup Created",
@@ -373,7 +391,7 @@ class Advanced(commands.Cog):
 
     @commands.hybrid_command(name="backups", description="List all backups.")
     async def list_backups(self, ctx):
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('''SELECT backup_name, created_at
                                    FROM backups WHERE guild_id = ?''',
                                 (ctx.guild.id,)) as cursor:
@@ -417,13 +435,12 @@ class Advanced(commands.Cog):
             return
         
         # Store autorole setting
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''INSERT OR REPLACE INTO auto_responses 
                                (guild_id, trigger, response, created_by, created_at)
                                VALUES (?, ?, ?, ?, ?)''',
                            (ctx.guild.id, f"autorole_{trigger}", str(role.id),
                             ctx.author.id, datetime.utcnow().isoformat()))
-            await db.commit()
         
         await ctx.send(embed=modern_embed(
             title="✅ Auto-Role Set",
@@ -444,13 +461,13 @@ class Advanced(commands.Cog):
             return
         
         # Store autoresponse
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''INSERT INTO auto_responses 
                                (guild_id, trigger, response, created_by, created_at)
                                VALUES (?, ?, ?, ?, ?)''',
                            (ctx.guild.id, trigger, response, ctx.author.id,
                             datetime.utcnow().isoformat()))
-            await db.commit()
+        self.bot.pipeline.invalidate(ctx.guild.id, 'responders')
         
         await ctx.send(embed=modern_embed(
             title="✅ Auto-Response Set",
@@ -461,7 +478,7 @@ class Advanced(commands.Cog):
 
     @commands.hybrid_command(name="autoresponses", description="List all auto-responses.")
     async def list_autoresponses(self, ctx):
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('''SELECT trigger, response, created_at
                                    FROM auto_responses WHERE guild_id = ?''',
                                 (ctx.guild.id,)) as cursor:
@@ -579,30 +596,24 @@ class Advanced(commands.Cog):
         
         await ctx.send(embed=embed)
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot:
-            return
+    async def responders_stage(self, ctx):
+        message = ctx.message
+        responders = ctx.features['responders']
         
         # Check for custom commands
-        if message.content.startswith('!'):
-            command_name = message.content[1:].split()[0]
-            key = f"{message.guild.id}_{command_name}"
-            
-            if key in self.custom_commands:
-                response = self.custom_commands[key]
-                await message.channel.send(response)
-                return
+        if ctx.content.startswith('!'):
+            parts = ctx.content[1:].split()
+            if parts and parts[0] in responders['commands']:
+                await message.channel.send(responders['commands'][parts[0]])
+                return True
         
         # Check for auto-responses
-        async with aiosqlite.connect('database.db') as db:
-            async with db.execute('''SELECT response FROM auto_responses 
-                                   WHERE guild_id = ? AND trigger = ?''',
-                                (message.guild.id, message.content.lower())) as cursor:
-                auto_response = await cursor.fetchone()
-            
-            if auto_response:
-                await message.channel.send(auto_response[0])
+        auto_response = responders['responses'].get(ctx.normalized)
+        if auto_response:
+            response, chance = auto_response
+            if chance is None or chance >= 100 or (chance > 0 and chance >= random.randint(1, 100)):
+                await message.channel.send(response)
+                return True
 
 async def setup(bot):
     await bot.add_cog(Advanced(bot)) 
\ No newline at end of file
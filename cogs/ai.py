@@ -1,16 +1,29 @@
 import discord
 from discord.ext import commands
 from bot import modern_embed
-import aiosqlite
 import asyncio
 import random
 import json
 from datetime import datetime
+import migrations
+from bounded import LRU
+
+migrations.register('ai', [
+    '''CREATE TABLE IF NOT EXISTS ai_conversations
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER, guild_id INTEGER, message TEXT,
+        response TEXT, personality TEXT, timestamp TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS ai_images
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER, guild_id INTEGER, prompt TEXT,
+        image_url TEXT, created_at TEXT)''',
+])
+
 
 class AI(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.chat_history = {}
+        self.chat_history = LRU(maxlen=1000)
         self.ai_personalities = {
             "assistant": "You are a helpful AI assistant. Be friendly and informative.",
             "sarcastic": "You are a sarcastic AI. Be witty and slightly mocking.",
@@ -20,22 +33,6 @@ class AI(commands.Cog):
         }
         # Remove async initialization from __init__
 
-    async def init_database(self):
-        async with aiosqlite.connect('database.db') as db:
-            await db.execute('''CREATE TABLE IF NOT EXISTS ai_conversations 
-                               (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                user_id INTEGER, guild_id INTEGER, message TEXT,
-                                response TEXT, personality TEXT, timestamp TEXT)''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS ai_images 
-                               (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                user_id INTEGER, guild_id INTEGER, prompt TEXT,
-                                image_url TEXT, created_at TEXT)''')
-            await db.commit()
-
-    async def cog_load(self):
-        """Async initialization when cog loads"""
-        await self.init_database()
-
     @commands.command(name="chat", description="Chat with AI assistant.")
     async def chat_with_ai(self, ctx, personality: str = "assistant", *, message: str):
         """Chat with AI assistant using different personalities"""
@@ -46,13 +43,12 @@ class AI(commands.Cog):
         response = await self.generate_ai_response(message, personality)
         
         # Store conversation
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''INSERT INTO ai_conversations 
                                (user_id, guild_id, message, response, personality, timestamp)
                                VALUES (?, ?, ?, ?, ?, ?)''',
                            (ctx.author.id, ctx.guild.id, message, response, personality,
                             datetime.utcnow().isoformat()))
-            await db.commit()
         
         embed = modern_embed(
             title=f"🤖 AI Assistant ({personality.title()})",
@@ -134,13 +130,12 @@ class AI(commands.Cog):
         ))
         
         # Store image generation request
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''INSERT INTO ai_images 
                                (user_id, guild_id, prompt, image_url, created_at)
                                VALUES (?, ?, ?, ?, ?)''',
                            (ctx.author.id, ctx.guild.id, prompt, "simulated_url",
                             datetime.utcnow().isoformat()))
-            await db.commit()
 
     @commands.command(name="personality", description="Change AI personality.")
     async def change_personality(self, ctx, personality: str):
@@ -1,181 +1,174 @@
 import discord
 from discord.ext import commands
-from bot import modern_embed
-import aiosqlite
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+from bot import modern_embed, send_pages
 from datetime import datetime, timedelta
 import json
 import io
+import csv
+import gzip
+import tempfile
+import calendar
+import numpy as np
 import asyncio
+import migrations
+from pipeline import ORDER_ANALYTICS
+from counters import range_source, GUILD_WIDE
+from charts import render_trends, render_heatmap
+from cohorts import retention, week_of
+
+migrations.register('analytics', [
+    '''CREATE TABLE IF NOT EXISTS server_analytics
+       (guild_id INTEGER, date TEXT, member_count INTEGER,
+        message_count INTEGER, voice_minutes INTEGER,
+        join_count INTEGER, leave_count INTEGER,
+        command_usage INTEGER, PRIMARY KEY (guild_id, date))''',
+    '''CREATE TABLE IF NOT EXISTS user_activity
+       (user_id INTEGER, guild_id INTEGER, date TEXT,
+        messages INTEGER, voice_minutes INTEGER, commands INTEGER,
+        reactions INTEGER, PRIMARY KEY (user_id, guild_id, date))''',
+    '''CREATE TABLE IF NOT EXISTS channel_stats
+       (channel_id INTEGER, guild_id INTEGER, date TEXT,
+        message_count INTEGER, reaction_count INTEGER,
+        PRIMARY KEY (channel_id, date))''',
+    '''CREATE TABLE IF NOT EXISTS command_stats
+       (command_name TEXT, guild_id INTEGER, date TEXT,
+        usage_count INTEGER, PRIMARY KEY (command_name, guild_id, date))''',
+], [
+    '''CREATE INDEX IF NOT EXISTS idx_user_activity_guild_date ON user_activity (guild_id, date)''',
+    '''CREATE INDEX IF NOT EXISTS idx_channel_stats_guild_date ON channel_stats (guild_id, date)''',
+    '''CREATE INDEX IF NOT EXISTS idx_command_stats_guild_date ON command_stats (guild_id, date)''',
+], [
+    # Retention prunes daily rows by date alone
+    '''CREATE INDEX IF NOT EXISTS idx_user_activity_date ON user_activity (date)''',
+    '''CREATE INDEX IF NOT EXISTS idx_channel_stats_date ON channel_stats (date)''',
+    '''CREATE INDEX IF NOT EXISTS idx_command_stats_date ON command_stats (date)''',
+])
+
+# Built as background report jobs (see reports.py), which flush the counters themselves
+BACKGROUND_REPORTS = {'analytics', 'userstats', 'report'}
+# The engagement report ranks this many users, ten to a page
+ENGAGEMENT_USERS = 30
+ENGAGEMENT_PAGE_SIZE = 10
+
+# Rows fetched per round trip while exporting, so memory stays flat
+EXPORT_CHUNK_ROWS = 1000
+
+EXPORT_TABLES = {
+    'user_activity': (
+        ('user_id', 'date', 'messages', 'voice_minutes', 'commands', 'reactions'),
+        '''SELECT user_id, date, messages, voice_minutes, commands, reactions
+           FROM user_activity WHERE guild_id = ? AND date BETWEEN ? AND ? ORDER BY date''',
+    ),
+    'channel_stats': (
+        ('channel_id', 'date', 'message_count', 'reaction_count'),
+        '''SELECT channel_id, date, message_count, reaction_count
+           FROM channel_stats WHERE guild_id = ? AND date BETWEEN ? AND ? ORDER BY date''',
+    ),
+    'command_stats': (
+        ('command_name', 'date', 'usage_count'),
+        '''SELECT command_name, date, usage_count
+           FROM command_stats WHERE guild_id = ? AND date BETWEEN ? AND ? ORDER BY date''',
+    ),
+}
+
+
+def write_jsonl(stream, columns, rows):
+    stream.write(''.join(json.dumps(dict(zip(columns, row))) + '\n' for row in rows))
+
+
+async def export_table(db, sql, params, columns, fmt, fileobj):
+    """Stream a query into ``fileobj`` as gzipped CSV or JSONL and return the row count
+
+    Rows are fetched in chunks from the cursor and each chunk is formatted and
+    compressed in a worker thread.
+    """
+    stream = gzip.open(fileobj, 'wt', encoding='utf-8', newline='')
+    writer = csv.writer(stream) if fmt == 'csv' else None
+    if writer:
+        await asyncio.to_thread(writer.writerow, columns)
+    total = 0
+    try:
+        async with db.execute(sql, params) as cursor:
+            while True:
+                rows = await cursor.fetchmany(EXPORT_CHUNK_ROWS)
+                if not rows:
+                    break
+                total += len(rows)
+                if writer:
+                    await asyncio.to_thread(writer.writerows, rows)
+                else:
+                    await asyncio.to_thread(write_jsonl, stream, columns, rows)
+    finally:
+        # Closing the gzip stream leaves fileobj open
+        await asyncio.to_thread(stream.close)
+    return total
+
 
 class Analytics(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.activity_trackers = {}
+        # Guilds whose cached members' join dates have been stored this run
+        self.seeded_guilds = set()
 
+    async def cog_load(self):
+        self.bot.pipeline.add_stage('analytics', self.message_stage, ORDER_ANALYTICS)
 
-    async def init_database(self):
-        async with aiosqlite.connect('database.db') as db:
-            await db.execute('''CREATE TABLE IF NOT EXISTS server_analytics 
-                               (guild_id INTEGER, date TEXT, member_count INTEGER,
-                                message_count INTEGER, voice_minutes INTEGER,
-                                join_count INTEGER, leave_count INTEGER,
-                                command_usage INTEGER, PRIMARY KEY (guild_id, date))''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS user_activity 
-                               (user_id INTEGER, guild_id INTEGER, date TEXT,
-                                messages INTEGER, voice_minutes INTEGER, commands INTEGER,
-                                reactions INTEGER, PRIMARY KEY (user_id, guild_id, date))''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS channel_stats 
-                               (channel_id INTEGER, guild_id INTEGER, date TEXT,
-                                message_count INTEGER, reaction_count INTEGER,
-                                PRIMARY KEY (channel_id, date))''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS command_stats 
-                               (command_name TEXT, guild_id INTEGER, date TEXT,
-                                usage_count INTEGER, PRIMARY KEY (command_name, guild_id, date))''')
-            await db.commit()
-
-    async def track_activity(self, guild_id, user_id=None, channel_id=None, command_name=None):
-        """Track various activity metrics"""
-        today = datetime.utcnow().strftime('%Y-%m-%d')
-        
-        async with aiosqlite.connect('database.db') as db:
-            # Update server analytics
-            await db.execute('''INSERT OR REPLACE INTO server_analytics 
-                               (guild_id, date, member_count, message_count, voice_minutes,
-                                join_count, leave_count, command_usage)
-                               VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-                           (guild_id, today, 0, 0, 0, 0, 0, 0))
-            
-            # Update user activity if user_id provided
-            if user_id:
-                await db.execute('''INSERT OR REPLACE INTO user_activity 
-                                   (user_id, guild_id, date, messages, voice_minutes, commands, reactions)
-                                   VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                               (user_id, guild_id, today, 0, 0, 0, 0))
-            
-            # Update channel stats if channel_id provided
-            if channel_id:
-                await db.execute('''INSERT OR REPLACE INTO channel_stats 
-                                   (channel_id, guild_id, date, message_count, reaction_count)
-                                   VALUES (?, ?, ?, ?, ?)''',
-                               (channel_id, guild_id, today, 0, 0))
-            
-            # Update command stats if command_name provided
-            if command_name:
-                await db.execute('''INSERT OR REPLACE INTO command_stats 
-                                   (command_name, guild_id, date, usage_count)
-                                   VALUES (?, ?, ?, ?)''',
-                               (command_name, guild_id, today, 0))
-            
-            await db.commit()
+    async def cog_unload(self):
+        self.bot.pipeline.remove_stage('analytics')
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot or not message.guild:
-            return
-        
-        guild_id = message.guild.id
-        user_id = message.author.id
-        channel_id = message.channel.id
-        
-        # Track message activity
-        await self.track_activity(guild_id, user_id, channel_id)
-        
-        # Update message counts
-        today = datetime.utcnow().strftime('%Y-%m-%d')
-        async with aiosqlite.connect('database.db') as db:
-            # Update server message count
-            await db.execute('''UPDATE server_analytics SET message_count = message_count + 1
-                               WHERE guild_id = ? AND date = ?''', (guild_id, today))
-            
-            # Update user message count
-            await db.execute('''UPDATE user_activity SET messages = messages + 1
-                               WHERE user_id = ? AND guild_id = ? AND date = ?''',
-                           (user_id, guild_id, today))
-            
-            # Update channel message count
-            await db.execute('''UPDATE channel_stats SET message_count = message_count + 1
-                               WHERE channel_id = ? AND date = ?''', (channel_id, today))
-            
-            await db.commit()
+    async def cog_before_invoke(self, ctx):
+        # Reports read the tables, so write out what has been counted so far
+        if ctx.command.qualified_name not in BACKGROUND_REPORTS:
+            await self.bot.counters.flush()
+
+    async def message_stage(self, ctx):
+        message = ctx.message
+        self.bot.counters.message(message.guild.id, message.author.id, message.channel.id,
+                                  message.guild.member_count)
 
     @commands.Cog.listener()
     async def on_command(self, ctx):
         if not ctx.guild:
             return
-        
-        guild_id = ctx.guild.id
-        user_id = ctx.author.id
-        command_name = ctx.command.qualified_name
-        
-        # Track command usage
-        await self.track_activity(guild_id, user_id, command_name=command_name)
-        
-        # Update command counts
-        today = datetime.utcnow().strftime('%Y-%m-%d')
-        async with aiosqlite.connect('database.db') as db:
-            # Update server command count
-            await db.execute('''UPDATE server_analytics SET command_usage = command_usage + 1
-                               WHERE guild_id = ? AND date = ?''', (guild_id, today))
-            
-            # Update user command count
-            await db.execute('''UPDATE user_activity SET commands = commands + 1
-                               WHERE user_id = ? AND guild_id = ? AND date = ?''',
-                           (user_id, guild_id, today))
-            
-            # Update command stats
-            await db.execute('''UPDATE command_stats SET usage_count = usage_count + 1
-                               WHERE command_name = ? AND guild_id = ? AND date = ?''',
-                           (command_name, guild_id, today))
-            
-            await db.commit()
+        self.bot.counters.command(ctx.guild.id, ctx.author.id, ctx.command.qualified_name)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        self.bot.counters.member_joined(member.guild.id, member.id, member.guild.member_count)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        self.bot.counters.member_left(member.guild.id, member.guild.member_count)
+
+    async def active_user_counts(self, guild_id):
+        # Distinct users from the daily HyperLogLog sketches, so the counts are approximate
+        counters = self.bot.counters
+        return (await counters.active_users(guild_id, 1),
+                await counters.active_users(guild_id, 7),
+                await counters.active_users(guild_id, 30))
+
+    def add_active_users(self, embed, active):
+        dau, wau, mau = active
+        embed.add_field(
+            name="👥 Active Users",
+            value=f"**Daily:** ~{dau:,}\n"
+                  f"**Weekly:** ~{wau:,}\n"
+                  f"**Monthly:** ~{mau:,}",
+            inline=True
+        )
 
     @commands.command(name="analytics", description="Show server analytics dashboard.")
     @commands.has_permissions(administrator=True)
     async def analytics_dashboard(self, ctx):
         guild_id = ctx.guild.id
         today = datetime.utcnow().strftime('%Y-%m-%d')
-        
-        # Get current server stats
-        async with aiosqlite.connect('database.db') as db:
-            # Today's stats
-            async with db.execute('''SELECT member_count, message_count, voice_minutes, 
-                                   join_count, leave_count, command_usage
-                                   FROM server_analytics WHERE guild_id = ? AND date = ?''',
-                                (guild_id, today)) as cursor:
-                today_stats = await cursor.fetchone()
-            
-            # Weekly stats
-            week_ago = (datetime.utcnow() - timedelta(days=7)).strftime('%Y-%m-%d')
-            async with db.execute('''SELECT SUM(message_count), SUM(command_usage), 
-                                   SUM(join_count), SUM(leave_count)
-                                   FROM server_analytics 
-                                   WHERE guild_id = ? AND date >= ?''',
-                                (guild_id, week_ago)) as cursor:
-                weekly_stats = await cursor.fetchone()
-            
-            # Top channels
-            async with db.execute('''SELECT channel_id, SUM(message_count) as total_messages
-                                   FROM channel_stats 
-                                   WHERE guild_id = ? AND date >= ?
-                                   GROUP BY channel_id 
-                                   ORDER BY total_messages DESC LIMIT 5''',
-                                (guild_id, week_ago)) as cursor:
-                top_channels = await cursor.fetchall()
-            
-            # Top commands
-            async with db.execute('''SELECT command_name, SUM(usage_count) as total_usage
-                                   FROM command_stats 
-                                   WHERE guild_id = ? AND date >= ?
-                                   GROUP BY command_name 
-                                   ORDER BY total_usage DESC LIMIT 5''',
-                                (guild_id, week_ago)) as cursor:
-                top_commands = await cursor.fetchall()
+        generated, today_stats, weekly_stats, top_channels, top_commands, active = await self.bot.reports.run(
+            (guild_id, 'analytics', today), self.dashboard_data, guild_id, today)
         
         embed = modern_embed(
             title="📊 Server Analytics Dashboard",
-            description=f"**Server:** {ctx.guild.name}\n**Generated:** {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}",
+            description=f"**Server:** {ctx.guild.name}\n**Generated:** {generated}",
             color=discord.Color.blue(),
             ctx=ctx
         )
@@ -201,6 +194,8 @@ class Analytics(commands.Cog):
                 inline=True
             )
         
+        self.add_active_users(embed, active)
+        
         # Server info
         embed.add_field(
             name="🏠 Server Info",
@@ -239,6 +234,45 @@ class Analytics(commands.Cog):
         
         await ctx.send(embed=embed)
 
+    async def dashboard_data(self, guild_id, today):
+        generated = datetime.utcnow().strftime('%Y-%m-%d %H:%M')
+        async with self.bot.db.read() as db:
+            # Today's stats
+            async with db.execute('''SELECT member_count, message_count, voice_minutes, 
+                                   join_count, leave_count, command_usage
+                                   FROM server_analytics WHERE guild_id = ? AND date = ?''',
+                                (guild_id, today)) as cursor:
+                today_stats = await cursor.fetchone()
+            
+            # Weekly stats
+            week_ago = (datetime.utcnow() - timedelta(days=7)).strftime('%Y-%m-%d')
+            source, params = range_source('server_analytics', 'message_count, command_usage, join_count, leave_count',
+                                          week_ago, today, 'guild_id = ?', (guild_id,))
+            async with db.execute(f'''SELECT SUM(message_count), SUM(command_usage), 
+                                   SUM(join_count), SUM(leave_count)
+                                   FROM {source}''', params) as cursor:
+                weekly_stats = await cursor.fetchone()
+            
+            # Top channels
+            source, params = range_source('channel_stats', 'channel_id, message_count',
+                                          week_ago, today, 'guild_id = ?', (guild_id,))
+            async with db.execute(f'''SELECT channel_id, SUM(message_count) as total_messages
+                                   FROM {source}
+                                   GROUP BY channel_id 
+                                   ORDER BY total_messages DESC LIMIT 5''', params) as cursor:
+                top_channels = await cursor.fetchall()
+            
+            # Top commands
+            source, params = range_source('command_stats', 'command_name, usage_count',
+                                          week_ago, today, 'guild_id = ?', (guild_id,))
+            async with db.execute(f'''SELECT command_name, SUM(usage_count) as total_usage
+                                   FROM {source}
+                                   GROUP BY command_name 
+                                   ORDER BY total_usage DESC LIMIT 5''', params) as cursor:
+                top_commands = await cursor.fetchall()
+        
+        return generated, today_stats, weekly_stats, top_channels, top_commands, await self.active_user_counts(guild_id)
+
     @commands.command(name="userstats", description="Show user activity statistics.")
     async def user_stats(self, ctx, user: discord.Member = None):
         if not user:
@@ -246,24 +280,10 @@ class Analytics(commands.Cog):
         
         guild_id = ctx.guild.id
         user_id = user.id
-        week_ago = (datetime.utcnow() - timedelta(days=7)).strftime('%Y-%m-%d')
+        today = datetime.utcnow().strftime('%Y-%m-%d')
         
-        # Get user stats
-        async with aiosqlite.connect('database.db') as db:
-            async with db.execute('''SELECT SUM(messages), SUM(voice_minutes), 
-                                   SUM(commands), SUM(reactions)
-                                   FROM user_activity 
-                                   WHERE user_id = ? AND guild_id = ? AND date >= ?''',
-                                (user_id, guild_id, week_ago)) as cursor:
-                stats = await cursor.fetchone()
-            
-            # Get daily activity for the last 7 days
-            async with db.execute('''SELECT date, messages, commands
-                                   FROM user_activity 
-                                   WHERE user_id = ? AND guild_id = ? AND date >= ?
-                                   ORDER BY date DESC''',
-                                (user_id, guild_id, week_ago)) as cursor:
-                daily_activity = await cursor.fetchall()
+        stats, daily_activity = await self.bot.reports.run(
+            (guild_id, 'userstats', user_id, today), self.user_stats_data, guild_id, user_id, today)
         
         embed = modern_embed(
             title=f"📊 {user.display_name}'s Activity",
@@ -307,6 +327,27 @@ class Analytics(commands.Cog):
         
         await ctx.send(embed=embed)
 
+    async def user_stats_data(self, guild_id, user_id, today):
+        week_ago = (datetime.utcnow() - timedelta(days=7)).strftime('%Y-%m-%d')
+        # Get user stats
+        async with self.bot.db.read() as db:
+            source, params = range_source('user_activity', 'messages, voice_minutes, commands, reactions',
+                                          week_ago, today, 'user_id = ? AND guild_id = ?', (user_id, guild_id))
+            async with db.execute(f'''SELECT SUM(messages), SUM(voice_minutes), 
+                                   SUM(commands), SUM(reactions)
+                                   FROM {source}''', params) as cursor:
+                stats = await cursor.fetchone()
+            
+            # Get daily activity for the last 7 days
+            async with db.execute('''SELECT date, messages, commands
+                                   FROM user_activity 
+                                   WHERE user_id = ? AND guild_id = ? AND date >= ?
+                                   ORDER BY date DESC''',
+                                (user_id, guild_id, week_ago)) as cursor:
+                daily_activity = await cursor.fetchall()
+        
+        return stats, daily_activity
+
     @commands.command(name="trends", description="Show activity trends with graphs.")
     @commands.has_permissions(administrator=True)
     async def activity_trends(self, ctx, days: int = 7):
@@ -317,7 +358,7 @@ class Analytics(commands.Cog):
         start_date = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d')
         
         # Get trend data
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('''SELECT date, message_count, command_usage, join_count, leave_count
                                    FROM server_analytics 
                                    WHERE guild_id = ? AND date >= ?
@@ -334,48 +375,19 @@ class Analytics(commands.Cog):
             ))
             return
         
-        # Create graph
-        plt.figure(figsize=(12, 8))
-        
-        dates = [datetime.strptime(row[0], '%Y-%m-%d') for row in trend_data]
-        messages = [row[1] for row in trend_data]
-        commands = [row[2] for row in trend_data]
-        joins = [row[3] for row in trend_data]
-        leaves = [row[4] for row in trend_data]
-        
-        # Plot messages and commands
-        plt.subplot(2, 1, 1)
-        plt.plot(dates, messages, 'b-', label='Messages', linewidth=2)
-        plt.plot(dates, commands, 'g-', label='Commands', linewidth=2)
-        plt.title(f'Activity Trends - {ctx.guild.name} (Last {days} days)')
-        plt.ylabel('Count')
-        plt.legend()
-        plt.grid(True, alpha=0.3)
-        
-        # Plot joins and leaves
-        plt.subplot(2, 1, 2)
-        plt.plot(dates, joins, 'r-', label='Joins', linewidth=2)
-        plt.plot(dates, leaves, 'orange', label='Leaves', linewidth=2)
-        plt.ylabel('Count')
-        plt.xlabel('Date')
-        plt.legend()
-        plt.grid(True, alpha=0.3)
-        
-        # Format x-axis
-        plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%m-%d'))
-        plt.gca().xaxis.set_major_locator(mdates.DayLocator(interval=max(1, days//7)))
-        plt.xticks(rotation=45)
-        
-        plt.tight_layout()
-        
-        # Save to buffer
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-        buffer.seek(0)
-        plt.close()
+        # Render the graph in the chart workers; the rows themselves version the cache entry
+        title = f'Activity Trends - {ctx.guild.name} (Last {days} days)'
+        series = {
+            'Messages': ([row[1] or 0 for row in trend_data], 'blue', 0),
+            'Commands': ([row[2] or 0 for row in trend_data], 'green', 0),
+            'Joins': ([row[3] or 0 for row in trend_data], 'red', 1),
+            'Leaves': ([row[4] or 0 for row in trend_data], 'orange', 1),
+        }
+        key = ('trends', guild_id, days, hash((title, tuple(trend_data))))
+        png = await self.bot.charts.render(key, render_trends, title, [row[0] for row in trend_data], series)
         
         # Send graph
-        file = discord.File(buffer, filename='activity_trends.png')
+        file = discord.File(io.BytesIO(png), filename='activity_trends.png')
         embed = modern_embed(
             title="📈 Activity Trends",
             description=f"**Server:** {ctx.guild.name}\n**Period:** Last {days} days\n**Generated:** {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}",
@@ -386,47 +398,170 @@ class Analytics(commands.Cog):
         
         await ctx.send(embed=embed, file=file)
 
-    @commands.command(name="report", description="Generate a custom analytics report.")
+    @commands.command(name="heatmap", description="Show message activity by weekday and hour.")
     @commands.has_permissions(administrator=True)
-    async def generate_report(self, ctx, report_type: str = "overview"):
+    async def activity_heatmap(self, ctx, channel: discord.TextChannel = None, weeks: int = 4):
+        weeks = max(1, min(weeks, 52))  # Limit to a year
+        
         guild_id = ctx.guild.id
-        today = datetime.utcnow().strftime('%Y-%m-%d')
-        week_ago = (datetime.utcnow() - timedelta(days=7)).strftime('%Y-%m-%d')
-        month_ago = (datetime.utcnow() - timedelta(days=30)).strftime('%Y-%m-%d')
+        channel_id = channel.id if channel else GUILD_WIDE
+        blobs = await self.bot.counters.heatmap_blobs(guild_id, weeks, channel_id)
         
-        if report_type == "overview":
-            await self.generate_overview_report(ctx, guild_id, today, week_ago, month_ago)
-        elif report_type == "engagement":
-            await self.generate_engagement_report(ctx, guild_id, week_ago)
-        elif report_type == "growth":
-            await self.generate_growth_report(ctx, guild_id, month_ago)
-        else:
+        # Each blob is one week of 168 hourly counters; sum them into a weekday x hour grid
+        grid = np.frombuffer(b''.join(blobs), dtype='<u4').reshape(-1, 7, 24).sum(axis=0, dtype=np.int64)
+        total = int(grid.sum())
+        if not total:
+            await ctx.send(embed=modern_embed(
+                title="❌ No Data",
+                description="No message activity recorded for the specified period.",
+                color=discord.Color.red(),
+                ctx=ctx
+            ))
+            return
+        
+        scope = f"#{channel.name}" if channel else ctx.guild.name
+        title = f'Activity Heatmap - {scope} (Last {weeks} weeks)'
+        key = ('heatmap', guild_id, channel_id, weeks, hash((title, grid.tobytes())))
+        png = await self.bot.charts.render(key, render_heatmap, title, grid.tolist())
+        
+        busiest_day, busiest_hour = np.unravel_index(int(grid.argmax()), grid.shape)
+        quietest_day = int(grid.sum(axis=1).argmin())
+        
+        file = discord.File(io.BytesIO(png), filename='activity_heatmap.png')
+        embed = modern_embed(
+            title="🗓️ Activity Heatmap",
+            description=f"**Scope:** {scope}\n**Period:** Last {weeks} weeks\n**Generated:** {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}",
+            color=discord.Color.blue(),
+            ctx=ctx
+        )
+        embed.add_field(
+            name="📊 Summary",
+            value=f"**Messages:** {total:,}\n"
+                  f"**Busiest Hour:** {calendar.day_name[busiest_day]} {busiest_hour:02d}:00 UTC\n"
+                  f"**Quietest Day:** {calendar.day_name[quietest_day]}",
+            inline=False
+        )
+        embed.set_image(url="attachment://activity_heatmap.png")
+        
+        await ctx.send(embed=embed, file=file)
+
+    @commands.command(name="analyticsexport", description="Export raw analytics data as gzipped CSV or JSONL.")
+    @commands.has_permissions(administrator=True)
+    async def analytics_export(self, ctx, days: int = 30, fmt: str = "csv"):
+        fmt = fmt.lower()
+        if fmt not in ("csv", "jsonl"):
+            await ctx.send(embed=modern_embed(
+                title="❌ Invalid Format",
+                description="Available formats: `csv`, `jsonl`",
+                color=discord.Color.red(),
+                ctx=ctx
+            ))
+            return
+        days = max(1, min(days, 365))
+        
+        end = datetime.utcnow().strftime('%Y-%m-%d')
+        start = (datetime.utcnow() - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+        params = (ctx.guild.id, start, end)
+        
+        # Files are built on disk, one per table
+        exports = []
+        try:
+            async with self.bot.db.read() as db:
+                for table, (columns, sql) in EXPORT_TABLES.items():
+                    handle = tempfile.TemporaryFile()
+                    exports.append((table, handle))
+                    rows = await export_table(db, sql, params, columns, fmt, handle)
+                    exports[-1] = (table, handle, rows)
+            
+            size = sum(handle.tell() for _, handle, _ in exports)
+            if size > ctx.guild.filesize_limit:
+                await ctx.send(embed=modern_embed(
+                    title="❌ Export Too Large",
+                    description=f"The export is {size / 1024 / 1024:.1f} MB, above this server's upload limit. Try fewer days.",
+                    color=discord.Color.red(),
+                    ctx=ctx
+                ))
+                return
+            
+            files = []
+            for table, handle, _ in exports:
+                handle.seek(0)
+                files.append(discord.File(handle, filename=f"{table}_{start}_{end}.{fmt}.gz"))
+            
+            embed = modern_embed(
+                title="📦 Analytics Export",
+                description=f"**Server:** {ctx.guild.name}\n**Period:** {start} to {end}\n**Format:** {fmt.upper()} (gzip)",
+                color=discord.Color.blue(),
+                ctx=ctx
+            )
+            embed.add_field(
+                name="📄 Rows",
+                value="\n".join(f"`{table}`: {rows:,}" for table, _, rows in exports),
+                inline=False
+            )
+            embed.set_footer(text=f"Daily user, channel and command rows are kept for {self.bot.counters.retention_days} days")
+            await ctx.send(embed=embed, files=files)
+        finally:
+            for export in exports:
+                export[1].close()
+
+    @commands.command(name="report", description="Generate a custom analytics report.")
+    @commands.has_permissions(administrator=True)
+    async def generate_report(self, ctx, report_type: str = "overview"):
+        builders = {
+            "overview": self.overview_data,
+            "engagement": self.engagement_data,
+            "growth": self.growth_data,
+        }
+        if report_type not in builders:
             await ctx.send(embed=modern_embed(
                 title="❌ Invalid Report Type",
                 description="Available reports: `overview`, `engagement`, `growth`",
                 color=discord.Color.red(),
                 ctx=ctx
             ))
+            return
+        
+        today = datetime.utcnow().strftime('%Y-%m-%d')
+        if report_type == "growth":
+            # Written here rather than in the builder, which runs on a read-only report connection
+            await self.seed_joins(ctx.guild)
+        data = await self.bot.reports.run((ctx.guild.id, 'report', report_type, today),
+                                          builders[report_type], ctx.guild, today)
+        
+        if report_type == "overview":
+            pages = self.overview_pages(ctx, *data)
+        elif report_type == "engagement":
+            pages = self.engagement_pages(ctx, *data)
+        else:
+            pages = self.growth_pages(ctx, *data)
+        await send_pages(ctx, pages)
 
-    async def generate_overview_report(self, ctx, guild_id, today, week_ago, month_ago):
-        async with aiosqlite.connect('database.db') as db:
+    async def overview_data(self, guild, today):
+        generated = datetime.utcnow().strftime('%Y-%m-%d %H:%M')
+        week_ago = (datetime.utcnow() - timedelta(days=7)).strftime('%Y-%m-%d')
+        month_ago = (datetime.utcnow() - timedelta(days=30)).strftime('%Y-%m-%d')
+        async with self.bot.db.read() as db:
             # Get various stats
-            async with db.execute('''SELECT SUM(message_count), SUM(command_usage), 
+            source, params = range_source('server_analytics', 'message_count, command_usage, join_count, leave_count',
+                                          week_ago, today, 'guild_id = ?', (guild.id,))
+            async with db.execute(f'''SELECT SUM(message_count), SUM(command_usage), 
                                    SUM(join_count), SUM(leave_count)
-                                   FROM server_analytics 
-                                   WHERE guild_id = ? AND date >= ?''',
-                                (guild_id, week_ago)) as cursor:
+                                   FROM {source}''', params) as cursor:
                 weekly_stats = await cursor.fetchone()
             
-            async with db.execute('''SELECT SUM(message_count), SUM(command_usage)
-                                   FROM server_analytics 
-                                   WHERE guild_id = ? AND date >= ?''',
-                                (guild_id, month_ago)) as cursor:
+            source, params = range_source('server_analytics', 'message_count, command_usage',
+                                          month_ago, today, 'guild_id = ?', (guild.id,))
+            async with db.execute(f'''SELECT SUM(message_count), SUM(command_usage)
+                                   FROM {source}''', params) as cursor:
                 monthly_stats = await cursor.fetchone()
         
+        return generated, weekly_stats, monthly_stats
+
+    def overview_pages(self, ctx, generated, weekly_stats, monthly_stats):
         embed = modern_embed(
             title="📋 Server Overview Report",
-            description=f"**Server:** {ctx.guild.name}\n**Generated:** {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}",
+            description=f"**Server:** {ctx.guild.name}\n**Generated:** {generated}",
             color=discord.Color.green(),
             ctx=ctx
         )
@@ -457,51 +592,62 @@ class Analytics(commands.Cog):
                   f"**Verification:** {ctx.guild.verification_level.name}",
             inline=True
         )
-        
-        await ctx.send(embed=embed)
+        return [embed]
 
-    async def generate_engagement_report(self, ctx, guild_id, week_ago):
-        async with aiosqlite.connect('database.db') as db:
+    async def engagement_data(self, guild, today):
+        week_ago = (datetime.utcnow() - timedelta(days=7)).strftime('%Y-%m-%d')
+        async with self.bot.db.read() as db:
             # Get top users by activity
-            async with db.execute('''SELECT user_id, SUM(messages + commands) as total_activity
-                                   FROM user_activity 
-                                   WHERE guild_id = ? AND date >= ?
+            source, params = range_source('user_activity', 'user_id, messages, commands',
+                                          week_ago, today, 'guild_id = ?', (guild.id,))
+            async with db.execute(f'''SELECT user_id, SUM(messages + commands) as total_activity
+                                   FROM {source}
                                    GROUP BY user_id 
-                                   ORDER BY total_activity DESC LIMIT 10''',
-                                (guild_id, week_ago)) as cursor:
+                                   ORDER BY total_activity DESC LIMIT ?''', params + (ENGAGEMENT_USERS,)) as cursor:
                 top_users = await cursor.fetchall()
         
-        embed = modern_embed(
-            title="🎯 Engagement Report",
-            description=f"**Server:** {ctx.guild.name}\n**Period:** Last 7 days",
-            color=discord.Color.purple(),
-            ctx=ctx
-        )
-        
-        if top_users:
-            user_text = []
-            for i, (user_id, activity) in enumerate(top_users, 1):
-                user = ctx.guild.get_member(user_id)
-                if user:
-                    user_text.append(f"{'🥇' if i == 1 else '🥈' if i == 2 else '🥉' if i == 3 else f'#{i}'} {user.display_name}: {activity:,}")
-            
-            embed.add_field(
-                name="👥 Most Active Users",
-                value="\n".join(user_text),
-                inline=False
+        return top_users, await self.active_user_counts(guild.id)
+
+    def engagement_pages(self, ctx, top_users, active):
+        user_text = []
+        for i, (user_id, activity) in enumerate(top_users, 1):
+            user = ctx.guild.get_member(user_id)
+            if user:
+                user_text.append(f"{'🥇' if i == 1 else '🥈' if i == 2 else '🥉' if i == 3 else f'#{i}'} {user.display_name}: {activity:,}")
+        
+        pages = []
+        for start in range(0, max(len(user_text), 1), ENGAGEMENT_PAGE_SIZE):
+            embed = modern_embed(
+                title="🎯 Engagement Report",
+                description=f"**Server:** {ctx.guild.name}\n**Period:** Last 7 days",
+                color=discord.Color.purple(),
+                ctx=ctx
             )
-        
-        await ctx.send(embed=embed)
+            
+            if user_text:
+                embed.add_field(
+                    name="👥 Most Active Users",
+                    value="\n".join(user_text[start:start + ENGAGEMENT_PAGE_SIZE]),
+                    inline=False
+                )
+            
+            self.add_active_users(embed, active)
+            pages.append(embed)
+        return pages
 
-    async def generate_growth_report(self, ctx, guild_id, month_ago):
-        async with aiosqlite.connect('database.db') as db:
+    async def growth_data(self, guild, today):
+        month_ago = (datetime.utcnow() - timedelta(days=30)).strftime('%Y-%m-%d')
+        async with self.bot.db.read() as db:
             # Get growth data
-            async with db.execute('''SELECT SUM(join_count), SUM(leave_count)
-                                   FROM server_analytics 
-                                   WHERE guild_id = ? AND date >= ?''',
-                                (guild_id, month_ago)) as cursor:
+            source, params = range_source('server_analytics', 'join_count, leave_count',
+                                          month_ago, today, 'guild_id = ?', (guild.id,))
+            async with db.execute(f'''SELECT SUM(join_count), SUM(leave_count)
+                                   FROM {source}''', params) as cursor:
                 growth_data = await cursor.fetchone()
         
+        return growth_data, await self.retention_table(guild)
+
+    def growth_pages(self, ctx, growth_data, cohorts):
         embed = modern_embed(
             title="📈 Growth Report",
             description=f"**Server:** {ctx.guild.name}\n**Period:** Last 30 days",
@@ -524,9 +670,43 @@ class Analytics(commands.Cog):
                 inline=True
             )
         
-        await ctx.send(embed=embed)
+        if cohorts:
+            embed.add_field(
+                name="📉 Weekly Retention (share still active k weeks after joining)",
+                value=f"```\n{cohorts}\n```",
+                inline=False
+            )
+        return [embed]
+
+    async def seed_joins(self, guild):
+        """Store the join dates of cached members once per run, for those who joined before tracking started"""
+        if guild.id in self.seeded_guilds:
+            return
+        await self.bot.counters.record_joins(guild.id, [(member.id, member.joined_at.toordinal())
+                                                        for member in guild.members if member.joined_at])
+        self.seeded_guilds.add(guild.id)
+
+    async def retention_table(self, guild, weeks=8):
+        """Text table of the last ``weeks`` join cohorts and their retention curves"""
+        counters = self.bot.counters
+        current_week = week_of(datetime.utcnow().toordinal())
+        first_week = current_week - weeks + 1
+        rows = await counters.cohort_rows(guild.id, first_week * 7 + 1)
+        if not rows:
+            return None
+        
+        members = np.array(rows, dtype=np.int64)
+        sizes, curves = retention(members[:, 0], members[:, 1], first_week, weeks)
+        lines = ["Week    Size " + " ".join(f"{f'W{k}':>4}" for k in range(weeks))]
+        for w in range(weeks):
+            if not sizes[w]:
+                continue
+            start = datetime.fromordinal((first_week + w) * 7 + 1)
+            # Only weeks that have already happened
+            shares = " ".join(f"{curves[w, k] * 100:>3.0f}%" for k in range(weeks - w))
+            lines.append(f"{start.strftime('%m-%d')} {sizes[w]:>6,} {shares}")
+        return "\n".join(lines) if len(lines) > 1 else None
 
 async def setup(bot):
     cog = Analytics(bot)
-    await cog.init_database()
     await bot.add_cog(cog) 
\ No newline at end of file
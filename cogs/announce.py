@@ -2,7 +2,6 @@ import discord
 from discord.ext import commands
 from discord import app_commands, Interaction, ui
 from datetime import datetime
-import aiosqlite
 import asyncio
 from bot import modern_embed
 
@@ -12,7 +11,7 @@ OWNER_ID = 1201050377911554061
 async def is_admin(ctx):
     if ctx.author.id == ctx.guild.owner_id or ctx.author.guild_permissions.administrator:
         return True
-    async with aiosqlite.connect('database.db') as db:
+    async with ctx.bot.db.read() as db:
         async with db.execute('SELECT user_id FROM server_owners WHERE guild_id = ? AND user_id = ?', (ctx.guild.id, ctx.author.id)) as cursor:
             return await cursor.fetchone() is not None
 
@@ -1,11 +1,37 @@
 import discord
 from discord.ext import commands
 from bot import modern_embed
-import aiosqlite
 import json
 import re
 from datetime import datetime, timedelta
 import asyncio
+import migrations
+
+migrations.register('automation', [
+    '''CREATE TABLE IF NOT EXISTS automations
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER, name TEXT, trigger_type TEXT,
+        trigger_condition TEXT, actions TEXT, enabled BOOLEAN DEFAULT TRUE,
+        created_by INTEGER, created_at TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS automation_logs
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        automation_id INTEGER, guild_id INTEGER, user_id INTEGER,
+        trigger_type TEXT, action_result TEXT, timestamp TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS custom_commands
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER, name TEXT, response TEXT,
+        permissions TEXT, cooldown INTEGER DEFAULT 0,
+        created_by INTEGER, created_at TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS auto_responses
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER, trigger TEXT, response TEXT,
+        chance INTEGER DEFAULT 100, enabled BOOLEAN DEFAULT TRUE,
+        created_by INTEGER, created_at TEXT)''',
+], migrations.add_columns('custom_commands', 'name TEXT', 'permissions TEXT', 'cooldown INTEGER DEFAULT 0'),
+   migrations.add_columns('auto_responses', 'chance INTEGER DEFAULT 100', 'enabled BOOLEAN DEFAULT TRUE'), [
+    '''CREATE INDEX IF NOT EXISTS idx_automations_guild_name ON automations (guild_id, name)''',
+])
+
 
 class Automation(commands.Cog):
     def __init__(self, bot):
@@ -13,29 +39,6 @@ class Automation(commands.Cog):
         self.automations = {}
         self.triggers = {}
 
-    async def init_database(self):
-        async with aiosqlite.connect('database.db') as db:
-            await db.execute('''CREATE TABLE IF NOT EXISTS automations 
-                               (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                guild_id INTEGER, name TEXT, trigger_type TEXT,
-                                trigger_condition TEXT, actions TEXT, enabled BOOLEAN DEFAULT TRUE,
-                                created_by INTEGER, created_at TEXT)''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS automation_logs 
-                               (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                automation_id INTEGER, guild_id INTEGER, user_id INTEGER,
-                                trigger_type TEXT, action_result TEXT, timestamp TEXT)''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS custom_commands 
-                               (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                guild_id INTEGER, name TEXT, response TEXT,
-                                permissions TEXT, cooldown INTEGER DEFAULT 0,
-                                created_by INTEGER, created_at TEXT)''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS auto_responses 
-                               (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                guild_id INTEGER, trigger TEXT, response TEXT,
-                                chance INTEGER DEFAULT 100, enabled BOOLEAN DEFAULT TRUE,
-                                created_by INTEGER, created_at TEXT)''')
-            await db.commit()
-
     @commands.hybrid_command(name="automation", description="Create a new automation.")
     async def create_automation(self, ctx, name: str, trigger_type: str, *, trigger_condition: str):
         if not ctx.author.guild_permissions.administrator:
@@ -59,13 +62,12 @@ class Automation(commands.Cog):
             return
         
         # Store automation
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''INSERT INTO automations 
                                (guild_id, name, trigger_type, trigger_condition, actions, created_by, created_at)
                                VALUES (?, ?, ?, ?, ?, ?, ?)''',
                            (ctx.guild.id, name, trigger_type, trigger_condition, "[]",
                             ctx.author.id, datetime.utcnow().isoformat()))
-            await db.commit()
         
         await ctx.send(embed=modern_embed(
             title="✅ Automation Created",
@@ -100,36 +102,37 @@ class Automation(commands.Cog):
             return
         
         # Get automation
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             async with db.execute('''SELECT id, actions FROM automations 
                                    WHERE guild_id = ? AND name = ?''',
                                 (ctx.guild.id, automation_name)) as cursor:
                 automation = await cursor.fetchone()
             
-            if not automation:
-                await ctx.send(embed=modern_embed(
-                    title="❌ Automation Not Found",
-                    description=f"Automation '{automation_name}' not found.",
-                    color=discord.Color.red(),
-                    ctx=ctx
-                ))
-                return
+            if automation:
+                automation_id, current_actions = automation
+                actions = json.loads(current_actions) if current_actions else []
             
-            automation_id, current_actions = automation
-            actions = json.loads(current_actions) if current_actions else []
+                # Add new action
+                new_action = {
+                    "type": action_type,
+                    "data": action_data,
+                    "created_at": datetime.utcnow().isoformat()
+                }
+                actions.append(new_action)
             
-            # Add new action
-            new_action = {
-                "type": action_type,
-                "data": action_data,
-                "created_at": datetime.utcnow().isoformat()
-            }
-            actions.append(new_action)
-            
-            # Update automation
-            await db.execute('''UPDATE automations SET actions = ?
-                               WHERE id = ?''', (json.dumps(actions), automation_id))
-            await db.commit()
+                # Update automation
+                await db.execute('''UPDATE automations SET actions = ?
+                                   WHERE id = ?''', (json.dumps(actions), automation_id))
+        
+        # Replies go out once the write lock is released
+        if not automation:
+            await ctx.send(embed=modern_embed(
+                title="❌ Automation Not Found",
+                description=f"Automation '{automation_name}' not found.",
+                color=discord.Color.red(),
+                ctx=ctx
+            ))
+            return
         
         await ctx.send(embed=modern_embed(
             title="✅ Action Added",
@@ -142,7 +145,7 @@ class Automation(commands.Cog):
 
     @commands.hybrid_command(name="automations", description="List all automations.")
     async def list_automations(self, ctx):
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('''SELECT name, trigger_type, trigger_condition, actions, enabled
                                    FROM automations WHERE guild_id = ? ORDER BY created_at DESC''',
                                 (ctx.guild.id,)) as cursor:
@@ -197,13 +200,12 @@ class Automation(commands.Cog):
             return
         
         # Create workflow automation
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''INSERT INTO automations 
                                (guild_id, name, trigger_type, trigger_condition, actions, created_by, created_at)
                                VALUES (?, ?, ?, ?, ?, ?, ?)''',
                            (ctx.guild.id, f"workflow_{name}", "workflow", description, "[]",
                             ctx.author.id, datetime.utcnow().isoformat()))
-            await db.commit()
         
         await ctx.send(embed=modern_embed(
             title="🔄 Workflow Created",
@@ -239,37 +241,38 @@ class Automation(commands.Cog):
         # Add workflow step
         workflow_automation_name = f"workflow_{workflow_name}"
         
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             async with db.execute('''SELECT id, actions FROM automations 
                                    WHERE guild_id = ? AND name = ?''',
                                 (ctx.guild.id, workflow_automation_name)) as cursor:
                 automation = await cursor.fetchone()
             
-            if not automation:
-                await ctx.send(embed=modern_embed(
-                    title="❌ Workflow Not Found",
-                    description=f"Workflow '{workflow_name}' not found.",
-                    color=discord.Color.red(),
-                    ctx=ctx
-                ))
-                return
-            
-            automation_id, current_actions = automation
-            actions = json.loads(current_actions) if current_actions else []
+            if automation:
+                automation_id, current_actions = automation
+                actions = json.loads(current_actions) if current_actions else []
             
-            # Add new step
-            new_step = {
-                "type": step_type,
-                "data": step_data,
-                "step_number": len(actions) + 1,
-                "created_at": datetime.utcnow().isoformat()
-            }
-            actions.append(new_step)
+                # Add new step
+                new_step = {
+                    "type": step_type,
+                    "data": step_data,
+                    "step_number": len(actions) + 1,
+                    "created_at": datetime.utcnow().isoformat()
+                }
+                actions.append(new_step)
             
-            # Update workflow
-            await db.execute('''UPDATE automations SET actions = ?
-                               WHERE id = ?''', (json.dumps(actions), automation_id))
-            await db.commit()
+                # Update workflow
+                await db.execute('''UPDATE automations SET actions = ?
+                                   WHERE id = ?''', (json.dumps(actions), automation_id))
+        
+        # Replies go out once the write lock is released
+        if not automation:
+            await ctx.send(embed=modern_embed(
+                title="❌ Workflow Not Found",
+                description=f"Workflow '{workflow_name}' not found.",
+                color=discord.Color.red(),
+                ctx=ctx
+            ))
+            return
         
         await ctx.send(embed=modern_embed(
             title="✅ Workflow Step Added",
@@ -281,41 +284,10 @@ class Automation(commands.Cog):
             ctx=ctx
         ))
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot:
-            return
-        
-        # Check for custom commands
-        if message.content.startswith('!'):
-            command_name = message.content[1:].split()[0]
-            
-            async with aiosqlite.connect('database.db') as db:
-                async with db.execute('''SELECT response FROM custom_commands 
-                                       WHERE guild_id = ? AND name = ?''',
-                                    (message.guild.id, command_name)) as cursor:
-                    custom_command = await cursor.fetchone()
-                
-                if custom_command:
-                    await message.channel.send(custom_command[0])
-                    return
-        
-        # Check for auto-responses
-        async with aiosqlite.connect('database.db') as db:
-            async with db.execute('''SELECT response, chance FROM auto_responses 
-                                   WHERE guild_id = ? AND trigger = ? AND enabled = TRUE''',
-                                (message.guild.id, message.content.lower())) as cursor:
-                auto_response = await cursor.fetchone()
-            
-            if auto_response:
-                response, chance = auto_response
-                if chance == 100 or (chance > 0 and chance >= discord.utils.random.randint(1, 100)):
-                    await message.channel.send(response)
-
     @commands.Cog.listener()
     async def on_member_join(self, member):
         # Check for autorole
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('''SELECT response FROM auto_responses 
                                    WHERE guild_id = ? AND trigger = 'autorole_join' AND enabled = TRUE''',
                                 (member.guild.id,)) as cursor:
@@ -332,5 +304,4 @@ class Automation(commands.Cog):
 
 async def setup(bot):
     cog = Automation(bot)
-    await cog.init_database()
     await bot.add_cog(cog) 
\ No newline at end of file
@@ -1,18 +1,39 @@
 import discord
 from discord.ext import commands
 from bot import modern_embed
-import aiosqlite
 import re
-import asyncio
+import time
 from datetime import datetime, timedelta
 import json
 import random
+import migrations
+from pipeline import ORDER_AUTOMOD
+from bounded import TTLMap, TimeRing
+
+migrations.register('automod', [
+    '''CREATE TABLE IF NOT EXISTS automod_config
+       (guild_id INTEGER PRIMARY KEY, enabled BOOLEAN DEFAULT 1,
+        spam_protection BOOLEAN DEFAULT 1, raid_protection BOOLEAN DEFAULT 1,
+        content_filter BOOLEAN DEFAULT 1, verification_enabled BOOLEAN DEFAULT 0,
+        log_channel_id INTEGER, action_level INTEGER DEFAULT 1)''',
+    '''CREATE TABLE IF NOT EXISTS automod_logs
+       (id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER,
+        user_id INTEGER, action TEXT, reason TEXT, timestamp TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS verification_sessions
+       (user_id INTEGER, guild_id INTEGER, code TEXT, expires TEXT,
+        verified BOOLEAN DEFAULT 0, PRIMARY KEY (user_id, guild_id))''',
+], [
+    '''CREATE INDEX IF NOT EXISTS idx_automod_logs_guild_time ON automod_logs (guild_id, timestamp)''',
+])
+
 
 class AutoMod(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.spam_trackers = {}
-        self.raid_protection = {}
+        # (guild_id, user_id) -> spam tracker, dropped after a minute without messages
+        self.spam_trackers = bot.sweeper.track(TTLMap(ttl=60))
+        # guild_id -> {event type: TimeRing}, dropped once a guild goes quiet
+        self.raid_protection = bot.sweeper.track(TTLMap(ttl=300))
         self.verification_sessions = {}
         
         # Content filters
@@ -30,25 +51,22 @@ class AutoMod(commands.Cog):
         }
 
     async def cog_load(self):
-        await self.init_database()
+        self.bot.pipeline.add_feature('automod', self.load_message_config)
+        self.bot.pipeline.add_stage('automod', self.message_stage, ORDER_AUTOMOD, feature='automod')
+        self.bot.timers.register('raid_unlock', self.raid_unlock)
 
-    async def init_database(self):
-        async with aiosqlite.connect('database.db') as db:
-            await db.execute('''CREATE TABLE IF NOT EXISTS automod_config 
-                               (guild_id INTEGER PRIMARY KEY, enabled BOOLEAN DEFAULT 1,
-                                spam_protection BOOLEAN DEFAULT 1, raid_protection BOOLEAN DEFAULT 1,
-                                content_filter BOOLEAN DEFAULT 1, verification_enabled BOOLEAN DEFAULT 0,
-                                log_channel_id INTEGER, action_level INTEGER DEFAULT 1)''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS automod_logs 
-                               (id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER,
-                                user_id INTEGER, action TEXT, reason TEXT, timestamp TEXT)''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS verification_sessions 
-                               (user_id INTEGER, guild_id INTEGER, code TEXT, expires TEXT,
-                                verified BOOLEAN DEFAULT 0, PRIMARY KEY (user_id, guild_id))''')
-            await db.commit()
+    async def cog_unload(self):
+        self.bot.pipeline.remove_stage('automod')
+        self.bot.pipeline.remove_feature('automod')
+        self.bot.timers.unregister('raid_unlock')
+
+    async def load_message_config(self, guild_id):
+        """Pipeline feature: the guild's config, only when automod is enabled"""
+        config = await self.get_automod_config(guild_id)
+        return config if config and config['enabled'] else None
 
     async def get_automod_config(self, guild_id):
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('SELECT * FROM automod_config WHERE guild_id = ?', (guild_id,)) as cursor:
                 result = await cursor.fetchone()
                 if result:
@@ -64,34 +82,32 @@ class AutoMod(commands.Cog):
                 return None
 
     async def log_automod_action(self, guild_id, user_id, action, reason):
-        async with aiosqlite.connect('database.db') as db:
-            await db.execute('''INSERT INTO automod_logs (guild_id, user_id, action, reason, timestamp)
-                               VALUES (?, ?, ?, ?, ?)''',
-                           (guild_id, user_id, action, reason, datetime.utcnow().isoformat()))
-            await db.commit()
+        self.bot.db.defer('''INSERT INTO automod_logs (guild_id, user_id, action, reason, timestamp)
+                            VALUES (?, ?, ?, ?, ?)''',
+                          (guild_id, user_id, action, reason, datetime.utcnow().isoformat()))
 
-    def detect_spam(self, message, guild_id):
+    def detect_spam(self, message, guild_id, content=None, link_count=None):
         """Advanced spam detection using multiple criteria"""
         user_id = message.author.id
-        content = message.content.lower()
+        if content is None:
+            content = message.content.lower()
         
-        if guild_id not in self.spam_trackers:
-            self.spam_trackers[guild_id] = {}
-        
-        if user_id not in self.spam_trackers[guild_id]:
-            self.spam_trackers[guild_id][user_id] = {
+        key = (guild_id, user_id)
+        tracker = self.spam_trackers.get(key)
+        if tracker is None:
+            tracker = {
                 'messages': [],
                 'similar_count': 0,
                 'link_count': 0,
                 'caps_ratio': 0
             }
-        
-        tracker = self.spam_trackers[guild_id][user_id]
-        current_time = datetime.utcnow()
+        # Setting it again keeps an active tracker alive for another minute
+        self.spam_trackers[key] = tracker
+        current_time = time.monotonic()
         
         # Clean old messages (older than 60 seconds)
         tracker['messages'] = [msg for msg in tracker['messages'] 
-                             if current_time - msg['time'] < timedelta(seconds=60)]
+                             if current_time - msg['time'] < 60]
         
         # Add current message
         tracker['messages'].append({
@@ -108,7 +124,8 @@ class AutoMod(commands.Cog):
                 tracker['similar_count'] = 0
         
         # Check for excessive links
-        link_count = len(re.findall(r'https?://\S+', content))
+        if link_count is None:
+            link_count = len(re.findall(r'https?://\S+', content))
         if link_count > 0:
             tracker['link_count'] += link_count
         
@@ -135,42 +152,35 @@ class AutoMod(commands.Cog):
 
     def detect_raid(self, guild_id, event_type, user_id):
         """Detect potential raid activity"""
-        if guild_id not in self.raid_protection:
-            self.raid_protection[guild_id] = {
-                'joins': [],
-                'messages': [],
-                'reactions': []
+        raid_data = self.raid_protection.get(guild_id)
+        if raid_data is None:
+            # Each pattern counts its own events over its own timeframe
+            raid_data = {
+                'join': TimeRing(self.raid_patterns['mass_join']['timeframe']),
+                'message': TimeRing(self.raid_patterns['mass_message']['timeframe']),
+                'reaction': TimeRing(self.raid_patterns['mass_reaction']['timeframe'])
             }
-        
-        current_time = datetime.utcnow()
-        raid_data = self.raid_protection[guild_id]
+        self.raid_protection[guild_id] = raid_data
         
         # Add event to appropriate tracker
-        if event_type == 'join':
-            raid_data['joins'].append({'user_id': user_id, 'time': current_time})
-        elif event_type == 'message':
-            raid_data['messages'].append({'user_id': user_id, 'time': current_time})
-        elif event_type == 'reaction':
-            raid_data['reactions'].append({'user_id': user_id, 'time': current_time})
-        
-        # Clean old events
-        for event_list in raid_data.values():
-            event_list[:] = [event for event in event_list 
-                           if current_time - event['time'] < timedelta(seconds=60)]
+        current_time = time.monotonic()
+        if event_type in raid_data:
+            raid_data[event_type].add(now=current_time)
         
         # Check for raid patterns
-        if len(raid_data['joins']) >= self.raid_patterns['mass_join']['threshold']:
+        if raid_data['join'].count(current_time) >= self.raid_patterns['mass_join']['threshold']:
             return 'mass_join'
-        elif len(raid_data['messages']) >= self.raid_patterns['mass_message']['threshold']:
+        elif raid_data['message'].count(current_time) >= self.raid_patterns['mass_message']['threshold']:
             return 'mass_message'
-        elif len(raid_data['reactions']) >= self.raid_patterns['mass_reaction']['threshold']:
+        elif raid_data['reaction'].count(current_time) >= self.raid_patterns['mass_reaction']['threshold']:
             return 'mass_reaction'
         
         return None
 
-    def content_filter(self, content):
+    def content_filter(self, content, content_lower=None):
         """Advanced content filtering"""
-        content_lower = content.lower()
+        if content_lower is None:
+            content_lower = content.lower()
         
         # Check for banned words
         for category, words in self.banned_words.items():
@@ -190,15 +200,9 @@ class AutoMod(commands.Cog):
         
         return None, None
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot or not message.guild:
-            return
-        
-        config = await self.get_automod_config(message.guild.id)
-        if not config or not config['enabled']:
-            return
-        
+    async def message_stage(self, ctx):
+        message = ctx.message
+        config = ctx.features['automod']
         user_id = message.author.id
         guild_id = message.guild.id
         
@@ -208,16 +212,16 @@ class AutoMod(commands.Cog):
         
         # Content filtering
         if config['content_filter']:
-            filter_result, details = self.content_filter(message.content)
+            filter_result, details = self.content_filter(message.content, ctx.normalized)
             if filter_result:
-                await self.handle_violation(message, filter_result, details)
-                return
+                ctx.deleted = await self.handle_violation(message, filter_result, details, config)
+                return True
         
         # Spam protection
         if config['spam_protection']:
-            if self.detect_spam(message, guild_id):
-                await self.handle_violation(message, 'spam', 'Repeated messages/links')
-                return
+            if self.detect_spam(message, guild_id, ctx.normalized, len(ctx.urls)):
+                ctx.deleted = await self.handle_violation(message, 'spam', 'Repeated messages/links', config)
+                return True
         
         # Raid detection
         if config['raid_protection']:
@@ -235,9 +239,10 @@ class AutoMod(commands.Cog):
         if raid_type:
             await self.handle_raid(member.guild.id, raid_type)
 
-    async def handle_violation(self, message, violation_type, details):
-        """Handle automod violations"""
-        config = await self.get_automod_config(message.guild.id)
+    async def handle_violation(self, message, violation_type, details, config=None):
+        """Handle automod violations, returns True if the message was deleted"""
+        if config is None:
+            config = await self.get_automod_config(message.guild.id)
         action_level = config.get('action_level', 1)
         
         # Log the violation
@@ -254,6 +259,7 @@ class AutoMod(commands.Cog):
             )
             await message.channel.send(embed=embed, delete_after=10)
             await message.delete()
+            return True
         
         elif action_level == 2:  # Timeout
             try:
@@ -267,6 +273,7 @@ class AutoMod(commands.Cog):
                 )
                 await message.channel.send(embed=embed)
                 await message.delete()
+                return True
             except:
                 pass
         
@@ -283,6 +290,7 @@ class AutoMod(commands.Cog):
                 await message.channel.send(embed=embed)
             except:
                 pass
+        return False
 
     async def handle_raid(self, guild_id, raid_type):
         """Handle raid detection"""
@@ -313,13 +321,21 @@ class AutoMod(commands.Cog):
                     await log_channel.send(embed=embed)
             
             # Unlock after 5 minutes
-            await asyncio.sleep(300)
-            for channel in guild.text_channels:
-                await channel.set_permissions(guild.default_role, send_messages=None)
+            await self.bot.timers.schedule('raid_unlock', datetime.utcnow() + timedelta(seconds=300),
+                                           {'guild_id': guild_id})
             
         except Exception as e:
             print(f"Error handling raid: {e}")
 
+    async def raid_unlock(self, payload):
+        """Timer handler: lift the raid lockdown"""
+        guild = self.bot.get_guild(payload['guild_id'])
+        if not guild:
+            # Raised so the timer is kept and retried rather than dropped
+            raise LookupError(f"Guild {payload['guild_id']} is not cached")
+        for channel in guild.text_channels:
+            await channel.set_permissions(guild.default_role, send_messages=None)
+
     @commands.hybrid_command(name="automodconfig", description="Configure AutoMod settings.")
     @commands.has_permissions(administrator=True)
     async def automod_config(self, ctx):
@@ -354,12 +370,12 @@ class AutoMod(commands.Cog):
     @commands.hybrid_command(name="automod_setup", description="Setup AutoMod for this server.")
     @commands.has_permissions(administrator=True)
     async def automod_setup(self, ctx):
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''INSERT OR REPLACE INTO automod_config 
                                (guild_id, enabled, spam_protection, raid_protection, 
                                 content_filter, verification_enabled, action_level)
                                VALUES (?, 1, 1, 1, 1, 0, 1)''', (ctx.guild.id,))
-            await db.commit()
+        self.bot.pipeline.invalidate(ctx.guild.id, 'automod')
         
         embed = modern_embed(
             title="✅ AutoMod Setup Complete",
@@ -378,10 +394,10 @@ class AutoMod(commands.Cog):
     @commands.hybrid_command(name="verification", description="Setup verification system.")
     @commands.has_permissions(administrator=True)
     async def verification_setup(self, ctx, channel: discord.TextChannel):
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''UPDATE automod_config SET verification_enabled = 1 
                                WHERE guild_id = ?''', (ctx.guild.id,))
-            await db.commit()
+        self.bot.pipeline.invalidate(ctx.guild.id, 'automod')
         
         embed = modern_embed(
             title="✅ Verification Setup",
@@ -408,13 +424,12 @@ class AutoMod(commands.Cog):
         code = ''.join(random.choices('0123456789', k=6))
         
         # Store verification session
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''INSERT OR REPLACE INTO verification_sessions 
                                (user_id, guild_id, code, expires, verified)
                                VALUES (?, ?, ?, ?, 0)''',
                            (ctx.author.id, ctx.guild.id, code, 
                             (datetime.utcnow() + timedelta(minutes=5)).isoformat()))
-            await db.commit()
         
         embed = modern_embed(
             title="🔐 Verification Required",
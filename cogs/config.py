@@ -1,6 +1,5 @@
 import discord
 from discord.ext import commands
-import aiosqlite
 from .utility import styled_embed
 from bot import modern_embed
 from discord import ui, Interaction
@@ -39,9 +38,7 @@ class Config(commands.Cog):
     @commands.command(description="Set the invite log channel.")
     @commands.has_permissions(administrator=True)
     async def setinvitelog(self, ctx, channel: discord.TextChannel):
-        async with aiosqlite.connect('database.db') as db:
-            await db.execute('REPLACE INTO bot_config (key, value) VALUES (?, ?)', (f'invite_log_channel_{ctx.guild.id}', str(channel.id)))
-            await db.commit()
+        await self.bot.settings.set(ctx.guild.id, invite_log_channel=channel.id)
         await ctx.send(embed=styled_embed(
             title="Invite Log Channel Set",
             description=f"Invite join events will be announced in {channel.mention}.",
@@ -53,9 +50,7 @@ class Config(commands.Cog):
     @commands.command(description="Set the leave log channel.")
     @commands.has_permissions(administrator=True)
     async def setleavelog(self, ctx, channel: discord.TextChannel):
-        async with aiosqlite.connect('database.db') as db:
-            await db.execute('REPLACE INTO bot_config (key, value) VALUES (?, ?)', (f'leave_log_channel_{ctx.guild.id}', str(channel.id)))
-            await db.commit()
+        await self.bot.settings.set(ctx.guild.id, leave_log_channel=channel.id)
         await ctx.send(embed=styled_embed(
             title="Leave Log Channel Set",
             description=f"Member leave events will be announced in {channel.mention}.",
@@ -67,9 +62,7 @@ class Config(commands.Cog):
     @commands.command(description="Set the drag command channel.")
     @commands.has_permissions(administrator=True)
     async def setdragchannel(self, ctx, channel: discord.TextChannel):
-        async with aiosqlite.connect('database.db') as db:
-            await db.execute('REPLACE INTO bot_config (key, value) VALUES (?, ?)', (f'drag_channel_{ctx.guild.id}', str(channel.id)))
-            await db.commit()
+        await self.bot.settings.set(ctx.guild.id, drag_channel=channel.id)
         await ctx.send(embed=styled_embed(
             title="Drag Command Channel Set",
             description=f"Drag command can now only be used in {channel.mention}.",
@@ -81,21 +74,20 @@ class Config(commands.Cog):
     @commands.command(description="Show all log channels set for this server.")
     async def logchannellist(self, ctx):
         keys = [
-            (f'invite_log_channel_{ctx.guild.id}', 'Invite Log'),
-            (f'leave_log_channel_{ctx.guild.id}', 'Leave Log'),
-            (f'drag_channel_{ctx.guild.id}', 'Drag Command'),
+            ('invite_log_channel', 'Invite Log'),
+            ('leave_log_channel', 'Leave Log'),
+            ('drag_channel', 'Drag Command'),
         ]
         desc = ""
-        async with aiosqlite.connect('database.db') as db:
-            for key, label in keys:
-                row = await db.execute('SELECT value FROM bot_config WHERE key = ?', (key,))
-                result = await row.fetchone()
-                if result:
-                    channel = ctx.guild.get_channel(int(result[0]))
-                    mention = channel.mention if channel else f'<#{result[0]}>'
-                    desc += f'**{label}:** {mention}\n'
-                else:
-                    desc += f'**{label}:** Not set\n'
+        settings = await self.bot.settings.get(ctx.guild.id)
+        for field, label in keys:
+            channel_id = getattr(settings, field)
+            if channel_id:
+                channel = ctx.guild.get_channel(channel_id)
+                mention = channel.mention if channel else f'<#{channel_id}>'
+                desc += f'**{label}:** {mention}\n'
+            else:
+                desc += f'**{label}:** Not set\n'
         embed = styled_embed(
             title="Log Channel List",
             description=desc,
@@ -166,29 +158,22 @@ class Config(commands.Cog):
                     continue
         
         # Setup database configuration
-        async with aiosqlite.connect('database.db') as db:
-            # Create bot_config table if not exists
-            await db.execute('''CREATE TABLE IF NOT EXISTS bot_config 
-                               (key TEXT PRIMARY KEY, value TEXT)''')
-            
-            # Set up channel configurations
-            configs = [
-                (f'invite_log_channel_{ctx.guild.id}', 'bot-logs'),
-                (f'leave_log_channel_{ctx.guild.id}', 'bot-logs'),
-                (f'verification_channel_{ctx.guild.id}', 'verification'),
-                (f'welcome_channel_{ctx.guild.id}', 'welcome'),
-                (f'announcements_channel_{ctx.guild.id}', 'announcements'),
-                (f'database_stats_channel_{ctx.guild.id}', 'database-stats'),
-                (f'bot_config_channel_{ctx.guild.id}', 'bot-config')
-            ]
-            
-            for key, channel_name in configs:
-                channel = discord.utils.get(ctx.guild.channels, name=channel_name)
-                if channel:
-                    await db.execute('REPLACE INTO bot_config (key, value) VALUES (?, ?)', 
-                                   (key, str(channel.id)))
-            
-            await db.commit()
+        configs = [
+            ('invite_log_channel', 'bot-logs'),
+            ('leave_log_channel', 'bot-logs'),
+            ('verification_channel', 'verification'),
+            ('welcome_channel', 'welcome'),
+            ('announcements_channel', 'announcements'),
+            ('database_stats_channel', 'database-stats'),
+            ('bot_config_channel', 'bot-config')
+        ]
+        
+        values = {}
+        for field, channel_name in configs:
+            channel = discord.utils.get(ctx.guild.channels, name=channel_name)
+            if channel:
+                values[field] = channel.id
+        await self.bot.settings.set(ctx.guild.id, **values)
         
         # Create comprehensive embed
         embed = modern_embed(
@@ -246,45 +231,30 @@ class Config(commands.Cog):
     async def databasestatus(self, ctx):
         """Show database status and data distribution"""
         
-        async with aiosqlite.connect('database.db') as db:
-            # Get table counts
-            tables = [
-                'noprefix_users', 'server_owners', 'invite_tracker', 'bot_config',
-                'user_levels', 'guild_level_config', 'automod_config', 'automod_logs',
-                'verification_sessions', 'server_analytics', 'user_activity',
-                'channel_stats', 'command_stats', 'events', 'event_reminders',
-                'game_coins', 'game_stats'
-            ]
-            
-            table_counts = {}
-            for table in tables:
-                try:
-                    async with db.execute(f'SELECT COUNT(*) FROM {table}') as cursor:
-                        result = await cursor.fetchone()
-                        table_counts[table] = result[0] if result else 0
-                except:
-                    table_counts[table] = 0
-            
-            # Get channel configurations
-            configs = [
-                (f'invite_log_channel_{ctx.guild.id}', 'Invite Log'),
-                (f'leave_log_channel_{ctx.guild.id}', 'Leave Log'),
-                (f'verification_channel_{ctx.guild.id}', 'Verification'),
-                (f'welcome_channel_{ctx.guild.id}', 'Welcome'),
-                (f'announcements_channel_{ctx.guild.id}', 'Announcements'),
-                (f'database_stats_channel_{ctx.guild.id}', 'Database Stats'),
-                (f'bot_config_channel_{ctx.guild.id}', 'Bot Config')
-            ]
-            
-            channel_status = {}
-            for key, label in configs:
-                async with db.execute('SELECT value FROM bot_config WHERE key = ?', (key,)) as cursor:
-                    result = await cursor.fetchone()
-                    if result:
-                        channel = ctx.guild.get_channel(int(result[0]))
-                        channel_status[label] = channel.mention if channel else f"<#{result[0]}>"
-                    else:
-                        channel_status[label] = "❌ Not set"
+        # The counts scan every table, so they come from a background report job;
+        # they cover the whole database, so one result is shared by every guild
+        table_counts = await self.bot.reports.run((None, 'databasestatus'), self.table_counts)
+        
+        # Get channel configurations
+        configs = [
+            ('invite_log_channel', 'Invite Log'),
+            ('leave_log_channel', 'Leave Log'),
+            ('verification_channel', 'Verification'),
+            ('welcome_channel', 'Welcome'),
+            ('announcements_channel', 'Announcements'),
+            ('database_stats_channel', 'Database Stats'),
+            ('bot_config_channel', 'Bot Config')
+        ]
+        
+        settings = await self.bot.settings.get(ctx.guild.id)
+        channel_status = {}
+        for field, label in configs:
+            channel_id = getattr(settings, field)
+            if channel_id:
+                channel = ctx.guild.get_channel(channel_id)
+                channel_status[label] = channel.mention if channel else f"<#{channel_id}>"
+            else:
+                channel_status[label] = "❌ Not set"
         
         embed = modern_embed(
             title="📊 Hybrid Database Status",
@@ -336,7 +306,37 @@ class Config(commands.Cog):
             inline=False
         )
         
+        # Runtime stats of the bot's services
+        for title, stats in self.bot.status_sources.items():
+            embed.add_field(
+                name=title,
+                value="\n".join(f"• **{key.replace('_', ' ').capitalize()}:** {value:,}"
+                                 for key, value in stats().items()),
+                inline=False
+            )
+        
         await ctx.send(embed=embed)
 
+    async def table_counts(self):
+        # Get table counts
+        tables = [
+            'noprefix_users', 'server_owners', 'invite_tracker', 'bot_config', 'guild_settings',
+            'user_levels', 'guild_level_config', 'automod_config', 'automod_logs',
+            'verification_sessions', 'server_analytics', 'user_activity',
+            'channel_stats', 'command_stats', 'events', 'event_reminders',
+            'game_coins', 'game_stats'
+        ]
+        
+        table_counts = {}
+        async with self.bot.db.read() as db:
+            for table in tables:
+                try:
+                    async with db.execute(f'SELECT COUNT(*) FROM {table}') as cursor:
+                        result = await cursor.fetchone()
+                        table_counts[table] = result[0] if result else 0
+                except:
+                    table_counts[table] = 0
+        return table_counts
+
 async def setup(bot):
     await bot.add_cog(Config(bot)) 
\ No newline at end of file
@@ -1,9 +1,10 @@
 import discord
 from discord.ext import commands
-from bot import modern_embed
+from bot import modern_embed, send_pages
 import random
 import asyncio
 from datetime import datetime, timedelta
+from leaderboards import GLOBAL, TOP_SIZE, PAGE_SIZE, around_text
 
 class Economy(commands.Cog):
     def __init__(self, bot):
@@ -25,6 +26,8 @@ class Economy(commands.Cog):
         if user_id not in self.balances:
             self.balances[user_id] = 0
         self.balances[user_id] += amount
+        # Balances are only in memory, so the board starts empty with them
+        self.bot.leaderboards.set('economy', GLOBAL, user_id, self.balances[user_id])
         return self.balances[user_id]
 
     @commands.command(name="balance", description="Check your balance.")
@@ -249,7 +252,8 @@ class Economy(commands.Cog):
 
     @commands.hybrid_command(name="economyleaderboard", description="View the richest users.")
     async def leaderboard(self, ctx):
-        if not self.balances:
+        board = self.bot.leaderboards.board('economy')
+        if not len(board):
             await ctx.send(embed=modern_embed(
                 title="📊 Leaderboard",
                 description="No users have any coins yet!",
@@ -259,23 +263,33 @@ class Economy(commands.Cog):
             ))
             return
         
-        sorted_users = sorted(self.balances.items(), key=lambda x: x[1], reverse=True)[:10]
+        sorted_users = board.page(0, TOP_SIZE)
+        rank, nearby = board.around(ctx.author.id)
         
-        leaderboard_text = ""
-        for i, (user_id, balance) in enumerate(sorted_users, 1):
-            user = self.bot.get_user(user_id)
-            username = user.display_name if user else f"User {user_id}"
-            medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
-            leaderboard_text += f"{medal} **{username}** - {balance:,} coins\n"
-        
-        embed = modern_embed(
-            title="📊 Richest Users",
-            description=leaderboard_text,
-            color=discord.Color.gold(),
-            ctx=ctx,
-            emoji="📊"
-        )
-        await ctx.send(embed=embed)
+        pages = []
+        for start in range(0, len(sorted_users), PAGE_SIZE):
+            leaderboard_text = ""
+            for i, (user_id, balance) in enumerate(sorted_users[start:start + PAGE_SIZE], start + 1):
+                user = self.bot.get_user(user_id)
+                username = user.display_name if user else f"User {user_id}"
+                medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
+                leaderboard_text += f"{medal} **{username}** - {balance:,} coins\n"
+            
+            embed = modern_embed(
+                title="📊 Richest Users",
+                description=leaderboard_text,
+                color=discord.Color.gold(),
+                ctx=ctx,
+                emoji="📊"
+            )
+            if rank is not None:
+                embed.add_field(
+                    name=f"📍 Your Rank: #{rank + 1} of {len(board)}",
+                    value=around_text(self.bot.get_user, ctx.author.id, nearby, "coins"),
+                    inline=False
+                )
+            pages.append(embed)
+        await send_pages(ctx, pages)
 
     @commands.hybrid_command(name="giveeconomy", description="Give coins to another user.")
     async def give(self, ctx, user: discord.Member, amount: int):
@@ -1,37 +1,42 @@
 import discord
 from discord.ext import commands
 from bot import modern_embed
-import aiosqlite
 import random
 import asyncio
 import json
 from datetime import datetime, timedelta
+import migrations
+from bounded import TTLMap
+from leaderboards import around_text
+
+migrations.register('entertainment', [
+    '''CREATE TABLE IF NOT EXISTS story_progress
+       (user_id INTEGER PRIMARY KEY, guild_id INTEGER,
+        chapter INTEGER DEFAULT 1, progress INTEGER DEFAULT 0,
+        choices TEXT, created_at TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS daily_challenges
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER, guild_id INTEGER, challenge_type TEXT,
+        completed BOOLEAN DEFAULT FALSE, completed_at TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS entertainment_stats
+       (user_id INTEGER PRIMARY KEY, guild_id INTEGER,
+        games_won INTEGER DEFAULT 0, stories_completed INTEGER DEFAULT 0,
+        challenges_completed INTEGER DEFAULT 0, total_score INTEGER DEFAULT 0)''',
+], migrations.add_columns('daily_challenges', 'created_at TEXT'), [
+    '''CREATE INDEX IF NOT EXISTS idx_daily_challenges_user ON daily_challenges (user_id, guild_id, completed)''',
+])
+
 
 class Entertainment(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.active_games = {}
-        self.story_progress = {}
-        self.daily_challenges = {}
+        self.active_games = bot.sweeper.track(TTLMap(ttl=3600))
+        # (guild_id, user_id) -> chapter awaiting a choice; abandoned stories lapse after an hour
+        self.story_progress = bot.sweeper.track(TTLMap(ttl=3600))
+        self.daily_challenges = bot.sweeper.track(TTLMap(ttl=86400))
 
     async def cog_load(self):
-        await self.init_database()
-
-    async def init_database(self):
-        async with aiosqlite.connect('database.db') as db:
-            await db.execute('''CREATE TABLE IF NOT EXISTS story_progress 
-                               (user_id INTEGER PRIMARY KEY, guild_id INTEGER,
-                                chapter INTEGER DEFAULT 1, progress INTEGER DEFAULT 0,
-                                choices TEXT, created_at TEXT)''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS daily_challenges 
-                               (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                user_id INTEGER, guild_id INTEGER, challenge_type TEXT,
-                                completed BOOLEAN DEFAULT FALSE, completed_at TEXT)''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS entertainment_stats 
-                               (user_id INTEGER PRIMARY KEY, guild_id INTEGER,
-                                games_won INTEGER DEFAULT 0, stories_completed INTEGER DEFAULT 0,
-                                challenges_completed INTEGER DEFAULT 0, total_score INTEGER DEFAULT 0)''')
-            await db.commit()
+        await self.bot.leaderboards.load('entertainment', 'SELECT guild_id, user_id, total_score FROM entertainment_stats')
 
     @commands.hybrid_command(name="minigame", description="Play a mini-game.")
     async def play_minigame(self, ctx, game_type: str = "random"):
@@ -316,7 +321,7 @@ class Entertainment(commands.Cog):
         }
         
         # Get user's story progress
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('''SELECT chapter, progress FROM story_progress 
                                    WHERE user_id = ? AND guild_id = ?''',
                                 (ctx.author.id, ctx.guild.id)) as cursor:
@@ -326,13 +331,12 @@ class Entertainment(commands.Cog):
             # Start new story
             chapter = 1
             progress_val = 0
-            async with aiosqlite.connect('database.db') as db:
+            async with self.bot.db.write() as db:
                 await db.execute('''INSERT INTO story_progress 
                                    (user_id, guild_id, chapter, progress, created_at)
                                    VALUES (?, ?, ?, ?, ?)''',
                                (ctx.author.id, ctx.guild.id, chapter, progress_val,
                                 datetime.utcnow().isoformat()))
-                await db.commit()
         else:
             chapter, progress_val = progress
         
@@ -359,7 +363,7 @@ class Entertainment(commands.Cog):
             await ctx.send(embed=embed)
             
             # Store current chapter for interaction
-            self.story_progress[ctx.author.id] = {
+            self.story_progress[ctx.guild.id, ctx.author.id] = {
                 'chapter': chapter,
                 'choices': current_chapter['choices'],
                 'outcomes': current_chapter['outcomes']
@@ -374,7 +378,8 @@ class Entertainment(commands.Cog):
 
     @commands.hybrid_command(name="storychoice", description="Make a choice in your story.")
     async def make_story_choice(self, ctx, choice_number: int):
-        if ctx.author.id not in self.story_progress:
+        story_data = self.story_progress.get((ctx.guild.id, ctx.author.id))
+        if story_data is None:
             await ctx.send(embed=modern_embed(
                 title="❌ No Active Story",
                 description="You don't have an active story. Use `/story` to start one!",
@@ -383,7 +388,6 @@ class Entertainment(commands.Cog):
             ))
             return
         
-        story_data = self.story_progress[ctx.author.id]
         choices = story_data['choices']
         outcomes = story_data['outcomes']
         
@@ -408,14 +412,13 @@ class Entertainment(commands.Cog):
         await ctx.send(embed=embed)
         
         # Update story progress
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''UPDATE story_progress SET chapter = chapter + 1, progress = progress + 1
                                WHERE user_id = ? AND guild_id = ?''',
                            (ctx.author.id, ctx.guild.id))
-            await db.commit()
         
         # Remove from active stories
-        del self.story_progress[ctx.author.id]
+        self.story_progress.pop((ctx.guild.id, ctx.author.id))
         
         await self.update_stats(ctx.author.id, ctx.guild.id, "stories_completed")
 
@@ -437,29 +440,30 @@ class Entertainment(commands.Cog):
         challenge = random.choice(challenges)
         
         # Check if user already has a daily challenge
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             async with db.execute('''SELECT challenge_type FROM daily_challenges 
                                    WHERE user_id = ? AND guild_id = ? AND completed = FALSE''',
                                 (ctx.author.id, ctx.guild.id)) as cursor:
                 existing = await cursor.fetchone()
             
-            if existing:
-                await ctx.send(embed=modern_embed(
-                    title="📅 Daily Challenge",
-                    description=f"Your current challenge: **{existing[0]}**\n\n"
-                               f"Complete it to get a new one!",
-                    color=discord.Color.blue(),
-                    ctx=ctx
-                ))
-                return
-            
-            # Create new daily challenge
-            await db.execute('''INSERT INTO daily_challenges 
-                               (user_id, guild_id, challenge_type, created_at)
-                               VALUES (?, ?, ?, ?)''',
-                           (ctx.author.id, ctx.guild.id, challenge,
-                            datetime.utcnow().isoformat()))
-            await db.commit()
+            if not existing:
+                # Create new daily challenge
+                await db.execute('''INSERT INTO daily_challenges 
+                                   (user_id, guild_id, challenge_type, created_at)
+                                   VALUES (?, ?, ?, ?)''',
+                               (ctx.author.id, ctx.guild.id, challenge,
+                                datetime.utcnow().isoformat()))
+        
+        # Replies go out once the write lock is released
+        if existing:
+            await ctx.send(embed=modern_embed(
+                title="📅 Daily Challenge",
+                description=f"Your current challenge: **{existing[0]}**\n\n"
+                           f"Complete it to get a new one!",
+                color=discord.Color.blue(),
+                ctx=ctx
+            ))
+            return
         
         embed = modern_embed(
             title="📅 Daily Challenge",
@@ -472,26 +476,27 @@ class Entertainment(commands.Cog):
 
     @commands.hybrid_command(name="completechallenge", description="Mark your daily challenge as complete.")
     async def complete_challenge(self, ctx):
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             async with db.execute('''SELECT challenge_type FROM daily_challenges 
                                    WHERE user_id = ? AND guild_id = ? AND completed = FALSE''',
                                 (ctx.author.id, ctx.guild.id)) as cursor:
                 challenge = await cursor.fetchone()
             
-            if not challenge:
-                await ctx.send(embed=modern_embed(
-                    title="❌ No Active Challenge",
-                    description="You don't have an active daily challenge.",
-                    color=discord.Color.red(),
-                    ctx=ctx
-                ))
-                return
-            
-            # Mark challenge as complete
-            await db.execute('''UPDATE daily_challenges SET completed = TRUE, completed_at = ?
-                               WHERE user_id = ? AND guild_id = ? AND completed = FALSE''',
-                           (datetime.utcnow().isoformat(), ctx.author.id, ctx.guild.id))
-            await db.commit()
+            if challenge:
+                # Mark challenge as complete
+                await db.execute('''UPDATE daily_challenges SET completed = TRUE, completed_at = ?
+                                   WHERE user_id = ? AND guild_id = ? AND completed = FALSE''',
+                               (datetime.utcnow().isoformat(), ctx.author.id, ctx.guild.id))
+        
+        # Replies go out once the write lock is released
+        if not challenge:
+            await ctx.send(embed=modern_embed(
+                title="❌ No Active Challenge",
+                description="You don't have an active daily challenge.",
+                color=discord.Color.red(),
+                ctx=ctx
+            ))
+            return
         
         await ctx.send(embed=modern_embed(
             title="🎉 Challenge Complete!",
@@ -504,7 +509,7 @@ class Entertainment(commands.Cog):
         await self.update_stats(ctx.author.id, ctx.guild.id, "challenges_completed")
 
     async def update_stats(self, user_id: int, guild_id: int, stat_type: str):
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''INSERT OR REPLACE INTO entertainment_stats 
                                (user_id, guild_id, games_won, stories_completed, challenges_completed, total_score)
                                VALUES (?, ?, 
@@ -516,14 +521,14 @@ class Entertainment(commands.Cog):
                             user_id, guild_id, 1 if stat_type == "stories_completed" else 0,
                             user_id, guild_id, 1 if stat_type == "challenges_completed" else 0,
                             user_id, guild_id))
-            await db.commit()
+        self.bot.leaderboards.add('entertainment', guild_id, user_id, 10)
 
     @commands.hybrid_command(name="entertainmentstats", description="View your entertainment statistics.")
     async def entertainment_stats(self, ctx, user: discord.Member = None):
         if not user:
             user = ctx.author
         
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('''SELECT games_won, stories_completed, challenges_completed, total_score
                                    FROM entertainment_stats WHERE user_id = ? AND guild_id = ?''',
                                 (user.id, ctx.guild.id)) as cursor:
@@ -566,6 +571,15 @@ class Entertainment(commands.Cog):
             inline=True
         )
         
+        board = self.bot.leaderboards.board('entertainment', ctx.guild.id)
+        rank, nearby = board.around(user.id)
+        if rank is not None:
+            embed.add_field(
+                name=f"📍 Server Rank: #{rank + 1} of {len(board)}",
+                value=around_text(ctx.guild.get_member, user.id, nearby, "points"),
+                inline=False
+            )
+        
         await ctx.send(embed=embed)
 
 async def setup(bot):
@@ -1,42 +1,86 @@
 import discord
 from discord.ext import commands
 from bot import modern_embed
-import aiosqlite
 from datetime import datetime, timedelta
 import json
 import asyncio
+import heapq
 import random
+import time
+import migrations
+from timers import MAX_SLEEP, to_timestamp
+
+migrations.register('events', [
+    '''CREATE TABLE IF NOT EXISTS events
+       (event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER, title TEXT, description TEXT,
+        start_time TEXT, end_time TEXT, channel_id INTEGER,
+        max_participants INTEGER, created_by INTEGER,
+        status TEXT DEFAULT 'upcoming', participants TEXT DEFAULT '[]')''',
+    '''CREATE TABLE IF NOT EXISTS event_reminders
+       (event_id INTEGER, user_id INTEGER, reminder_time TEXT,
+        PRIMARY KEY (event_id, user_id))''',
+], [
+    '''CREATE INDEX IF NOT EXISTS idx_events_due ON events (status, start_time)''',
+    '''CREATE INDEX IF NOT EXISTS idx_events_guild_upcoming ON events (guild_id, status, start_time)''',
+    '''CREATE INDEX IF NOT EXISTS idx_event_reminders_time ON event_reminders (reminder_time)''',
+])
+
 
 class Events(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.active_events = {}
         self.event_reminders = {}
-        # Remove async initialization from __init__
-
-    async def init_database(self):
-        async with aiosqlite.connect('database.db') as db:
-            await db.execute('''CREATE TABLE IF NOT EXISTS events 
-                               (event_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                guild_id INTEGER, title TEXT, description TEXT,
-                                start_time TEXT, end_time TEXT, channel_id INTEGER,
-                                max_participants INTEGER, created_by INTEGER,
-                                status TEXT DEFAULT 'upcoming', participants TEXT DEFAULT '[]')''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS event_reminders 
-                               (event_id INTEGER, user_id INTEGER, reminder_time TEXT,
-                                PRIMARY KEY (event_id, user_id))''')
-            await db.commit()
+        # Due-index: upcoming event id -> start timestamp, and a heap of
+        # (due, event_id, kind) deadlines that are dropped lazily once stale
+        self.upcoming = {}
+        self._deadlines = []
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._closing = False
 
     async def cog_load(self):
-        """Async initialization when cog loads"""
-        await self.init_database()
-        # Start background task after a short delay to ensure bot is ready
-        asyncio.create_task(self.delayed_start())
+        """Load upcoming starts and reminders once and start the sleeper"""
+        rows = await self.bot.db.fetchall(
+            "SELECT event_id, start_time FROM events WHERE status = 'upcoming'")
+        for event_id, start_time in rows:
+            self.track_event(event_id, datetime.fromisoformat(start_time))
+        for event_id, reminder_time in await self.bot.db.fetchall(
+                'SELECT event_id, reminder_time FROM event_reminders'):
+            self.track_reminder(event_id, datetime.fromisoformat(reminder_time))
+        self._task = asyncio.create_task(self.check_event_status())
+
+    async def cog_unload(self):
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+    def _push(self, entry):
+        heapq.heappush(self._deadlines, entry)
+        # Only a new earliest deadline needs the sleeper to wake up
+        if self._deadlines[0] == entry:
+            self._wakeup.set()
 
-    async def delayed_start(self):
-        """Start background tasks after a delay"""
-        await asyncio.sleep(5)  # Wait 5 seconds for bot to be fully ready
-        asyncio.create_task(self.check_event_status())
+    def track_event(self, event_id, start_time):
+        due = to_timestamp(start_time)
+        self.upcoming[event_id] = due
+        self._push((due, event_id, 'start'))
+
+    def track_reminder(self, event_id, reminder_time):
+        self._push((to_timestamp(reminder_time), event_id, 'reminder'))
+
+    def untrack_event(self, event_id):
+        # Its heap entries go stale and are skipped when they come due
+        self.upcoming.pop(event_id, None)
+
+    def _is_live(self, entry):
+        due, event_id, kind = entry
+        if kind == 'start':
+            return self.upcoming.get(event_id) == due
+        return event_id in self.upcoming
 
     @commands.command(name="event", description="Create a new event.")
     @commands.has_permissions(manage_events=True)
@@ -81,7 +125,7 @@ class Events(commands.Cog):
             return
 
         # Create event in database
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''INSERT INTO events 
                                (guild_id, title, description, start_time, end_time,
                                 channel_id, max_participants, created_by, participants)
@@ -89,11 +133,11 @@ class Events(commands.Cog):
                            (ctx.guild.id, title, description, start_datetime.isoformat(),
                             end_datetime.isoformat(), ctx.channel.id, max_participants,
                             ctx.author.id, json.dumps([])))
-            await db.commit()
             
             # Get the event ID
             async with db.execute('SELECT last_insert_rowid()') as cursor:
                 event_id = (await cursor.fetchone())[0]
+        self.track_event(event_id, start_datetime)
 
         # Create event embed
         embed = modern_embed(
@@ -127,7 +171,7 @@ class Events(commands.Cog):
     @commands.command(name="events", description="List all upcoming events.")
     async def list_events(self, ctx):
         """List all upcoming events"""
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('''SELECT event_id, title, description, start_time, 
                                    end_time, max_participants, participants, created_by
                                    FROM events 
@@ -171,7 +215,7 @@ class Events(commands.Cog):
     @commands.command(name="joinevent", description="Join an event.")
     async def join_event(self, ctx, event_id: int):
         """Join an event by ID"""
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             # Get event details
             async with db.execute('''SELECT title, max_participants, participants, created_by
                                    FROM events WHERE event_id = ? AND guild_id = ? AND status = 'upcoming' ''',
@@ -179,52 +223,50 @@ class Events(commands.Cog):
                 event = await cursor.fetchone()
             
             if not event:
-                await ctx.send(embed=modern_embed(
+                embed = modern_embed(
                     title="❌ Event Not Found",
                     description="Event not found or has already ended.",
                     color=discord.Color.red(),
                     ctx=ctx
-                ))
-                return
-            
-            title, max_participants, participants_json, created_by = event
-            participants = json.loads(participants_json)
-            
-            if ctx.author.id in participants:
-                await ctx.send(embed=modern_embed(
-                    title="❌ Already Joined",
-                    description="You are already registered for this event.",
-                    color=discord.Color.red(),
-                    ctx=ctx
-                ))
-                return
-            
-            if max_participants > 0 and len(participants) >= max_participants:
-                await ctx.send(embed=modern_embed(
-                    title="❌ Event Full",
-                    description="This event has reached its maximum capacity.",
-                    color=discord.Color.red(),
-                    ctx=ctx
-                ))
-                return
-            
-            # Add participant
-            participants.append(ctx.author.id)
-            await db.execute('UPDATE events SET participants = ? WHERE event_id = ?',
-                           (json.dumps(participants), event_id))
-            await db.commit()
-            
-            await ctx.send(embed=modern_embed(
-                title="✅ Joined Event",
-                description=f"You have successfully joined **{title}**!",
-                color=discord.Color.green(),
-                ctx=ctx
-            ))
+                )
+            else:
+                title, max_participants, participants_json, created_by = event
+                participants = json.loads(participants_json)
+                
+                if ctx.author.id in participants:
+                    embed = modern_embed(
+                        title="❌ Already Joined",
+                        description="You are already registered for this event.",
+                        color=discord.Color.red(),
+                        ctx=ctx
+                    )
+                elif max_participants > 0 and len(participants) >= max_participants:
+                    embed = modern_embed(
+                        title="❌ Event Full",
+                        description="This event has reached its maximum capacity.",
+                        color=discord.Color.red(),
+                        ctx=ctx
+                    )
+                else:
+                    # Add participant
+                    participants.append(ctx.author.id)
+                    await db.execute('UPDATE events SET participants = ? WHERE event_id = ?',
+                                   (json.dumps(participants), event_id))
+                    
+                    embed = modern_embed(
+                        title="✅ Joined Event",
+                        description=f"You have successfully joined **{title}**!",
+                        color=discord.Color.green(),
+                        ctx=ctx
+                    )
+        
+        # Sent once the write lock is released
+        await ctx.send(embed=embed)
 
     @commands.command(name="leaveevent", description="Leave an event.")
     async def leave_event(self, ctx, event_id: int):
         """Leave an event by ID"""
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             # Get event details
             async with db.execute('''SELECT title, participants
                                    FROM events WHERE event_id = ? AND guild_id = ? AND status = 'upcoming' ''',
@@ -232,43 +274,43 @@ class Events(commands.Cog):
                 event = await cursor.fetchone()
             
             if not event:
-                await ctx.send(embed=modern_embed(
+                embed = modern_embed(
                     title="❌ Event Not Found",
                     description="Event not found or has already ended.",
                     color=discord.Color.red(),
                     ctx=ctx
-                ))
-                return
-            
-            title, participants_json = event
-            participants = json.loads(participants_json)
-            
-            if ctx.author.id not in participants:
-                await ctx.send(embed=modern_embed(
-                    title="❌ Not Registered",
-                    description="You are not registered for this event.",
-                    color=discord.Color.red(),
-                    ctx=ctx
-                ))
-                return
-            
-            # Remove participant
-            participants.remove(ctx.author.id)
-            await db.execute('UPDATE events SET participants = ? WHERE event_id = ?',
-                           (json.dumps(participants), event_id))
-            await db.commit()
-            
-            await ctx.send(embed=modern_embed(
-                title="✅ Left Event",
-                description=f"You have left **{title}**.",
-                color=discord.Color.orange(),
-                ctx=ctx
-            ))
+                )
+            else:
+                title, participants_json = event
+                participants = json.loads(participants_json)
+                
+                if ctx.author.id not in participants:
+                    embed = modern_embed(
+                        title="❌ Not Registered",
+                        description="You are not registered for this event.",
+                        color=discord.Color.red(),
+                        ctx=ctx
+                    )
+                else:
+                    # Remove participant
+                    participants.remove(ctx.author.id)
+                    await db.execute('UPDATE events SET participants = ? WHERE event_id = ?',
+                                   (json.dumps(participants), event_id))
+                    
+                    embed = modern_embed(
+                        title="✅ Left Event",
+                        description=f"You have left **{title}**.",
+                        color=discord.Color.orange(),
+                        ctx=ctx
+                    )
+        
+        # Sent once the write lock is released
+        await ctx.send(embed=embed)
 
     @commands.command(name="eventreminder", description="Set a reminder for an event.")
     async def set_event_reminder(self, ctx, event_id: int, minutes: int = 30):
         """Set a reminder for an event"""
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             # Check if event exists
             async with db.execute('''SELECT title, start_time
                                    FROM events WHERE event_id = ? AND guild_id = ? AND status = 'upcoming' ''',
@@ -276,162 +318,205 @@ class Events(commands.Cog):
                 event = await cursor.fetchone()
             
             if not event:
-                await ctx.send(embed=modern_embed(
+                embed = modern_embed(
                     title="❌ Event Not Found",
                     description="Event not found or has already ended.",
                     color=discord.Color.red(),
                     ctx=ctx
-                ))
-                return
-            
-            title, start_time = event
-            start_dt = datetime.fromisoformat(start_time)
-            reminder_time = start_dt - timedelta(minutes=minutes)
-            
-            if reminder_time <= datetime.utcnow():
-                await ctx.send(embed=modern_embed(
-                    title="❌ Invalid Reminder Time",
-                    description="The reminder time has already passed.",
-                    color=discord.Color.red(),
-                    ctx=ctx
-                ))
-                return
-            
-            # Save reminder
-            await db.execute('''INSERT OR REPLACE INTO event_reminders 
-                               (event_id, user_id, reminder_time) VALUES (?, ?, ?)''',
-                           (event_id, ctx.author.id, reminder_time.isoformat()))
-            await db.commit()
-            
-            await ctx.send(embed=modern_embed(
-                title="⏰ Reminder Set",
-                description=f"Reminder set for **{title}** {minutes} minutes before start.",
-                color=discord.Color.green(),
-                ctx=ctx
-            ))
+                )
+            else:
+                title, start_time = event
+                start_dt = datetime.fromisoformat(start_time)
+                reminder_time = start_dt - timedelta(minutes=minutes)
+                
+                if reminder_time <= datetime.utcnow():
+                    embed = modern_embed(
+                        title="❌ Invalid Reminder Time",
+                        description="The reminder time has already passed.",
+                        color=discord.Color.red(),
+                        ctx=ctx
+                    )
+                else:
+                    # Save reminder
+                    await db.execute('''INSERT OR REPLACE INTO event_reminders 
+                                       (event_id, user_id, reminder_time) VALUES (?, ?, ?)''',
+                                   (event_id, ctx.author.id, reminder_time.isoformat()))
+                    self.track_reminder(event_id, reminder_time)
+                    
+                    embed = modern_embed(
+                        title="⏰ Reminder Set",
+                        description=f"Reminder set for **{title}** {minutes} minutes before start.",
+                        color=discord.Color.green(),
+                        ctx=ctx
+                    )
+        
+        # Sent once the write lock is released
+        await ctx.send(embed=embed)
 
     @commands.command(name="cancelevent", description="Cancel an event.")
     @commands.has_permissions(manage_events=True)
     async def cancel_event(self, ctx, event_id: int):
         """Cancel an event (admin only)"""
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             # Get event details
             async with db.execute('''SELECT title, created_by, participants
                                    FROM events WHERE event_id = ? AND guild_id = ? AND status = 'upcoming' ''',
                                (event_id, ctx.guild.id)) as cursor:
                 event = await cursor.fetchone()
             
-            if not event:
-                await ctx.send(embed=modern_embed(
-                    title="❌ Event Not Found",
-                    description="Event not found or has already ended.",
-                    color=discord.Color.red(),
-                    ctx=ctx
-                ))
-                return
-            
-            title, created_by, participants_json = event
-            participants = json.loads(participants_json)
-            
-            # Check permissions
-            if ctx.author.id != created_by and not ctx.author.guild_permissions.administrator:
-                await ctx.send(embed=modern_embed(
-                    title="❌ Permission Denied",
-                    description="Only the event creator or administrators can cancel events.",
-                    color=discord.Color.red(),
-                    ctx=ctx
-                ))
-                return
-            
-            # Cancel event
-            await db.execute('UPDATE events SET status = ? WHERE event_id = ?',
-                           ('cancelled', event_id))
-            await db.commit()
-            
-            # Notify participants
-            if participants:
-                participant_mentions = [f"<@{user_id}>" for user_id in participants]
-                await ctx.send(embed=modern_embed(
-                    title="❌ Event Cancelled",
-                    description=f"**{title}** has been cancelled.\n\n**Participants:** {' '.join(participant_mentions)}",
-                    color=discord.Color.red(),
-                    ctx=ctx
-                ))
-            else:
-                await ctx.send(embed=modern_embed(
-                    title="❌ Event Cancelled",
-                    description=f"**{title}** has been cancelled.",
-                    color=discord.Color.red(),
-                    ctx=ctx
-                ))
+            # Only the event creator or administrators can cancel events
+            allowed = event is not None and (ctx.author.id == event[1] or ctx.author.guild_permissions.administrator)
+            if allowed:
+                # Cancel event
+                await db.execute('UPDATE events SET status = ? WHERE event_id = ?',
+                               ('cancelled', event_id))
+        
+        # Replies go out once the write lock is released
+        if not event:
+            await ctx.send(embed=modern_embed(
+                title="❌ Event Not Found",
+                description="Event not found or has already ended.",
+                color=discord.Color.red(),
+                ctx=ctx
+            ))
+            return
+        
+        title, created_by, participants_json = event
+        participants = json.loads(participants_json)
+        
+        # Check permissions
+        if not allowed:
+            await ctx.send(embed=modern_embed(
+                title="❌ Permission Denied",
+                description="Only the event creator or administrators can cancel events.",
+                color=discord.Color.red(),
+                ctx=ctx
+            ))
+            return
+        
+        self.untrack_event(event_id)
+        
+        # Notify participants
+        if participants:
+            participant_mentions = [f"<@{user_id}>" for user_id in participants]
+            await ctx.send(embed=modern_embed(
+                title="❌ Event Cancelled",
+                description=f"**{title}** has been cancelled.\n\n**Participants:** {' '.join(participant_mentions)}",
+                color=discord.Color.red(),
+                ctx=ctx
+            ))
+        else:
+            await ctx.send(embed=modern_embed(
+                title="❌ Event Cancelled",
+                description=f"**{title}** has been cancelled.",
+                color=discord.Color.red(),
+                ctx=ctx
+            ))
 
     async def check_event_status(self):
-        """Background task to check event status and send reminders"""
-        while True:
+        """Sleep until the next start or reminder is due, then handle everything due"""
+        await self.bot.wait_until_ready()
+        while not self._closing:
+            delay = MAX_SLEEP
+            if self._deadlines:
+                delay = min(max(self._deadlines[0][0] - time.time(), 0), MAX_SLEEP)
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+            if self._closing:
+                break
+            now = time.time()
+            due = False
+            while self._deadlines and self._deadlines[0][0] <= now:
+                due = self._is_live(heapq.heappop(self._deadlines)) or due
+            if not due:
+                continue
             try:
-                async with aiosqlite.connect('database.db') as db:
-                    # Check for events that have started
-                    now = datetime.utcnow()
-                    async with db.execute('''SELECT event_id, title, channel_id, participants
-                                           FROM events 
-                                           WHERE status = 'upcoming' AND start_time <= ?''',
-                                       (now.isoformat(),)) as cursor:
-                        started_events = await cursor.fetchall()
-                    
-                    for event_id, title, channel_id, participants_json in started_events:
-                        participants = json.loads(participants_json)
-                        channel = self.bot.get_channel(channel_id)
-                        
-                        if channel:
-                            participant_mentions = [f"<@{user_id}>" for user_id in participants]
-                            embed = modern_embed(
-                                title="🎉 Event Starting!",
-                                description=f"**{title}** is starting now!",
-                                color=discord.Color.green(),
-                                ctx=None
-                            )
-                            if participant_mentions:
-                                embed.add_field(
-                                    name="👥 Participants",
-                                    value=" ".join(participant_mentions),
-                                    inline=False
-                                )
-                            await channel.send(embed=embed)
-                        
-                        # Mark event as active
-                        await db.execute('UPDATE events SET status = ? WHERE event_id = ?',
-                                       ('active', event_id))
-                    
-                    # Check for reminders
-                    async with db.execute('''SELECT er.event_id, er.user_id, e.title
-                                           FROM event_reminders er
-                                           JOIN events e ON er.event_id = e.event_id
-                                           WHERE er.reminder_time <= ? AND e.status = 'upcoming' ''',
-                                       (now.isoformat(),)) as cursor:
-                        reminders = await cursor.fetchall()
-                    
-                    for event_id, user_id, title in reminders:
-                        user = self.bot.get_user(user_id)
-                        # Find the event's channel
-                        async with db.execute('SELECT channel_id FROM events WHERE event_id = ?', (event_id,)) as ch_cursor:
-                            ch_row = await ch_cursor.fetchone()
-                        channel = self.bot.get_channel(ch_row[0]) if ch_row else None
-                        if channel:
-                            await channel.send(embed=modern_embed(
-                                title="⏰ Event Reminder",
-                                description=f"<@{user_id}> **{title}** is starting soon!",
-                                color=discord.Color.blue(),
-                                ctx=None
-                            ))
-                        # Remove reminder
-                        await db.execute('DELETE FROM event_reminders WHERE event_id = ? AND user_id = ?', (event_id, user_id))
-                    
-                    await db.commit()
-                    
+                await self.dispatch_due()
             except Exception as e:
                 print(f"Error in event status check: {e}")
+
+    async def dispatch_due(self):
+        """Announce started events and send due reminders, batched per channel"""
+        now = datetime.utcnow().isoformat()
+        started_events = await self.bot.db.fetchall('''SELECT event_id, title, channel_id, participants
+                                                      FROM events 
+                                                      WHERE status = 'upcoming' AND start_time <= ?''',
+                                                  (now,))
+        reminders = await self.bot.db.fetchall('''SELECT er.event_id, er.user_id, e.title, e.channel_id
+                                                FROM event_reminders er
+                                                JOIN events e ON er.event_id = e.event_id
+                                                WHERE er.reminder_time <= ? AND e.status = 'upcoming' ''',
+                                            (now,))
+
+        started = set()
+        for event_id, title, channel_id, participants_json in started_events:
+            started.add(event_id)
+            self.untrack_event(event_id)
+            participants = json.loads(participants_json)
+            channel = self.bot.get_channel(channel_id)
             
-            await asyncio.sleep(60)  # Check every minute
+            if channel:
+                participant_mentions = [f"<@{user_id}>" for user_id in participants]
+                embed = modern_embed(
+                    title="🎉 Event Starting!",
+                    description=f"**{title}** is starting now!",
+                    color=discord.Color.green(),
+                    ctx=None
+                )
+                if participant_mentions:
+                    embed.add_field(
+                        name="👥 Participants",
+                        value=" ".join(participant_mentions),
+                        inline=False
+                    )
+                try:
+                    await channel.send(embed=embed)
+                except discord.HTTPException as e:
+                    print(f"Error announcing event {event_id}: {e}")
+
+        # channel id -> {(event id, title): [user ids]}; events starting now skip their reminders
+        by_channel = {}
+        for event_id, user_id, title, channel_id in reminders:
+            if event_id not in started:
+                by_channel.setdefault(channel_id, {}).setdefault((event_id, title), []).append(user_id)
+        for channel_id, events in by_channel.items():
+            channel = self.bot.get_channel(channel_id)
+            if not channel:
+                continue
+            lines = [f"{' '.join(f'<@{user_id}>' for user_id in user_ids)} **{title}** is starting soon!"
+                     for (_, title), user_ids in events.items()]
+            for description in chunk_lines(lines):
+                try:
+                    await channel.send(embed=modern_embed(
+                        title="⏰ Event Reminder",
+                        description=description,
+                        color=discord.Color.blue(),
+                        ctx=None
+                    ))
+                except discord.HTTPException as e:
+                    print(f"Error sending event reminders to {channel_id}: {e}")
+
+        async with self.bot.db.write() as db:
+            await db.executemany('UPDATE events SET status = ? WHERE event_id = ?',
+                                 [('active', event_id) for event_id in started])
+            # Also clears reminders left behind by cancelled events
+            await db.execute('DELETE FROM event_reminders WHERE reminder_time <= ?', (now,))
+
+
+def chunk_lines(lines, limit=4000):
+    """Join lines into embed descriptions no longer than ``limit``"""
+    chunk = ''
+    for line in lines:
+        if chunk and len(chunk) + len(line) + 1 > limit:
+            yield chunk
+            chunk = ''
+        chunk = f"{chunk}\n{line}" if chunk else line
+    if chunk:
+        yield chunk
 
 class EventView(discord.ui.View):
     def __init__(self, bot, event_id, creator_id):
@@ -443,7 +528,7 @@ class EventView(discord.ui.View):
     @discord.ui.button(label="Join Event", style=discord.ButtonStyle.green, emoji="✅")
     async def join_event(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Join the event via button"""
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             # Get event details
             async with db.execute('''SELECT title, max_participants, participants
                                    FROM events WHERE event_id = ? AND status = 'upcoming' ''',
@@ -451,32 +536,29 @@ class EventView(discord.ui.View):
                 event = await cursor.fetchone()
             
             if not event:
-                await interaction.response.send_message("Event not found or has ended.", ephemeral=True)
-                return
-            
-            title, max_participants, participants_json = event
-            participants = json.loads(participants_json)
-            
-            if interaction.user.id in participants:
-                await interaction.response.send_message("You are already registered for this event.", ephemeral=True)
-                return
-            
-            if max_participants > 0 and len(participants) >= max_participants:
-                await interaction.response.send_message("This event has reached its maximum capacity.", ephemeral=True)
-                return
-            
-            # Add participant
-            participants.append(interaction.user.id)
-            await db.execute('UPDATE events SET participants = ? WHERE event_id = ?',
-                           (json.dumps(participants), self.event_id))
-            await db.commit()
-            
-            await interaction.response.send_message(f"You have joined **{title}**!", ephemeral=True)
+                reply = "Event not found or has ended."
+            else:
+                title, max_participants, participants_json = event
+                participants = json.loads(participants_json)
+                
+                if interaction.user.id in participants:
+                    reply = "You are already registered for this event."
+                elif max_participants > 0 and len(participants) >= max_participants:
+                    reply = "This event has reached its maximum capacity."
+                else:
+                    # Add participant
+                    participants.append(interaction.user.id)
+                    await db.execute('UPDATE events SET participants = ? WHERE event_id = ?',
+                                   (json.dumps(participants), self.event_id))
+                    reply = f"You have joined **{title}**!"
+        
+        # Sent once the write lock is released
+        await interaction.response.send_message(reply, ephemeral=True)
 
     @discord.ui.button(label="Leave Event", style=discord.ButtonStyle.red, emoji="❌")
     async def leave_event(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Leave the event via button"""
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             # Get event details
             async with db.execute('''SELECT title, participants
                                    FROM events WHERE event_id = ? AND status = 'upcoming' ''',
@@ -484,23 +566,22 @@ class EventView(discord.ui.View):
                 event = await cursor.fetchone()
             
             if not event:
-                await interaction.response.send_message("Event not found or has ended.", ephemeral=True)
-                return
-            
-            title, participants_json = event
-            participants = json.loads(participants_json)
-            
-            if interaction.user.id not in participants:
-                await interaction.response.send_message("You are not registered for this event.", ephemeral=True)
-                return
-            
-            # Remove participant
-            participants.remove(interaction.user.id)
-            await db.execute('UPDATE events SET participants = ? WHERE event_id = ?',
-                           (json.dumps(participants), self.event_id))
-            await db.commit()
-            
-            await interaction.response.send_message(f"You have left **{title}**.", ephemeral=True)
+                reply = "Event not found or has ended."
+            else:
+                title, participants_json = event
+                participants = json.loads(participants_json)
+                
+                if interaction.user.id not in participants:
+                    reply = "You are not registered for this event."
+                else:
+                    # Remove participant
+                    participants.remove(interaction.user.id)
+                    await db.execute('UPDATE events SET participants = ? WHERE event_id = ?',
+                                   (json.dumps(participants), self.event_id))
+                    reply = f"You have left **{title}**."
+        
+        # Sent once the write lock is released
+        await interaction.response.send_message(reply, ephemeral=True)
 
     @discord.ui.button(label="Cancel Event", style=discord.ButtonStyle.gray, emoji="🚫")
     async def cancel_event(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -509,31 +590,34 @@ class EventView(discord.ui.View):
             await interaction.response.send_message("Only the event creator or administrators can cancel events.", ephemeral=True)
             return
         
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             # Get event details
             async with db.execute('''SELECT title, participants
                                    FROM events WHERE event_id = ? AND status = 'upcoming' ''',
                                (self.event_id,)) as cursor:
                 event = await cursor.fetchone()
             
-            if not event:
-                await interaction.response.send_message("Event not found or has ended.", ephemeral=True)
-                return
-            
-            title, participants_json = event
-            participants = json.loads(participants_json)
-            
-            # Cancel event
-            await db.execute('UPDATE events SET status = ? WHERE event_id = ?',
-                           ('cancelled', self.event_id))
-            await db.commit()
-            
-            # Disable all buttons
-            for child in self.children:
-                child.disabled = True
-            
-            await interaction.response.edit_message(view=self)
-            await interaction.followup.send(f"**{title}** has been cancelled.", ephemeral=True)
+            if event:
+                # Cancel event
+                await db.execute('UPDATE events SET status = ? WHERE event_id = ?',
+                               ('cancelled', self.event_id))
+        
+        # Replies go out once the write lock is released
+        if not event:
+            await interaction.response.send_message("Event not found or has ended.", ephemeral=True)
+            return
+        
+        title, participants_json = event
+        cog = self.bot.get_cog('Events')
+        if cog:
+            cog.untrack_event(self.event_id)
+        
+        # Disable all buttons
+        for child in self.children:
+            child.disabled = True
+        
+        await interaction.response.edit_message(view=self)
+        await interaction.followup.send(f"**{title}** has been cancelled.", ephemeral=True)
 
 async def setup(bot):
     await bot.add_cog(Events(bot)) 
\ No newline at end of file
@@ -3,8 +3,10 @@ from discord.ext import commands
 from discord import ui
 import random
 import asyncio
-import aiosqlite
-from bot import modern_embed
+from bot import modern_embed, send_pages
+import migrations
+from bounded import TTLMap
+from leaderboards import GLOBAL, TOP_SIZE, PAGE_SIZE, around_text
 
 class TicTacToeButton(ui.Button):
     def __init__(self, x, y, parent):
@@ -193,10 +195,22 @@ class ConnectFourView(ui.View):
     def is_full(self):
         return all(cell != " " for row in self.board for cell in row)
 
+migrations.register('game', [
+    '''CREATE TABLE IF NOT EXISTS game_coins
+       (user_id INTEGER PRIMARY KEY, coins INTEGER DEFAULT 1000)''',
+    '''CREATE TABLE IF NOT EXISTS game_stats
+       (user_id INTEGER PRIMARY KEY, games_played INTEGER DEFAULT 0,
+        games_won INTEGER DEFAULT 0, total_earnings INTEGER DEFAULT 0)''',
+], migrations.add_columns('game_stats', 'games_played INTEGER DEFAULT 0',
+                          'games_won INTEGER DEFAULT 0', 'total_earnings INTEGER DEFAULT 0'), [
+    '''CREATE INDEX IF NOT EXISTS idx_game_coins_coins ON game_coins (coins)''',
+])
+
+
 class Game(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.active_games = {}
+        self.active_games = bot.sweeper.track(TTLMap(ttl=3600))
         self.game_themes = {
             "classic": {"primary": discord.Color.blurple(), "secondary": discord.Color.dark_theme()},
             "neon": {"primary": discord.Color.purple(), "secondary": discord.Color.dark_purple()},
@@ -223,46 +237,38 @@ class Game(commands.Cog):
         self.hangman_words = ["python", "discord", "modern", "elite", "hangman", "bot", "cog", "command", "gaming", "interactive"]
         self.stats = {}
 
-    async def init_database(self):
-        async with aiosqlite.connect('database.db') as db:
-            await db.execute('''CREATE TABLE IF NOT EXISTS game_coins 
-                               (user_id INTEGER PRIMARY KEY, coins INTEGER DEFAULT 1000)''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS game_stats 
-                               (user_id INTEGER PRIMARY KEY, games_played INTEGER DEFAULT 0,
-                                games_won INTEGER DEFAULT 0, total_earnings INTEGER DEFAULT 0)''')
-            await db.commit()
-
     async def cog_load(self):
-        """Async initialization when cog loads"""
-        await self.init_database()
+        # Coins are global, so the board is too
+        await self.bot.leaderboards.load('game_coins', 'SELECT 0, user_id, coins FROM game_coins')
 
     async def get_coins(self, user_id):
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('SELECT coins FROM game_coins WHERE user_id = ?', (user_id,)) as cursor:
                 result = await cursor.fetchone()
                 return result[0] if result else 0
 
     async def add_coins(self, user_id, amount):
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''INSERT OR REPLACE INTO game_coins (user_id, coins) 
                                VALUES (?, COALESCE((SELECT coins FROM game_coins WHERE user_id = ?), 0) + ?)''', 
                            (user_id, user_id, amount))
-            await db.commit()
+        self.bot.leaderboards.add('game_coins', GLOBAL, user_id, amount)
 
     async def remove_coins(self, user_id, amount):
-        async with aiosqlite.connect('database.db') as db:
-            await db.execute('''UPDATE game_coins SET coins = coins - ? WHERE user_id = ? AND coins >= ?''', 
-                           (amount, user_id, amount))
-            await db.commit()
+        async with self.bot.db.write() as db:
+            cursor = await db.execute('''UPDATE game_coins SET coins = coins - ? WHERE user_id = ? AND coins >= ?''', 
+                                      (amount, user_id, amount))
+        if cursor.rowcount:
+            self.bot.leaderboards.add('game_coins', GLOBAL, user_id, -amount)
 
     async def update_stats(self, user_id, won=False):
-        async with aiosqlite.connect('database.db') as db:
-            await db.execute('''INSERT OR REPLACE INTO game_stats (user_id, games_played, games_won, total_earnings) 
-                               VALUES (?, COALESCE((SELECT games_played FROM game_stats WHERE user_id = ?), 0) + 1, 
-                                       COALESCE((SELECT games_won FROM game_stats WHERE user_id = ?), 0) + ?,
-                                       COALESCE((SELECT total_earnings FROM game_stats WHERE user_id = ?), 0) + ?)''', 
-                           (user_id, user_id, 1 if won else 0, user_id, user_id, 50 if won else 0))
-            await db.commit()
+        self.bot.db.defer('''INSERT INTO game_stats (user_id, games_played, games_won, total_earnings)
+                            VALUES (?, 1, ?, ?)
+                            ON CONFLICT(user_id) DO UPDATE SET
+                                games_played = games_played + 1,
+                                games_won = games_won + excluded.games_won,
+                                total_earnings = total_earnings + excluded.total_earnings''',
+                          (user_id, 1 if won else 0, 50 if won else 0))
 
     @commands.command(name="tictactoe", description="Play Tic-Tac-Toe with another user.")
     async def tictactoe(self, ctx, opponent: discord.Member, theme: str = "classic"):
@@ -542,10 +548,11 @@ class Game(commands.Cog):
     # BETTING GAMES
 
     async def remove_coins(self, user_id, amount):
-        async with aiosqlite.connect('database.db') as db:
-            await db.execute('''UPDATE game_coins SET coins = coins - ? WHERE user_id = ? AND coins >= ?''', 
-                           (amount, user_id, amount))
-            await db.commit()
+        async with self.bot.db.write() as db:
+            cursor = await db.execute('''UPDATE game_coins SET coins = coins - ? WHERE user_id = ? AND coins >= ?''', 
+                                      (amount, user_id, amount))
+        if cursor.rowcount:
+            self.bot.leaderboards.add('game_coins', GLOBAL, user_id, -amount)
 
     @commands.command(name="betcoinflip", description="Bet on coin flip (2x payout).")
     async def betcoinflip(self, ctx, bet: int, choice: str = "heads"):
@@ -845,10 +852,8 @@ class Game(commands.Cog):
 
     @commands.command(name="gameleaderboard", description="Show global game leaderboard.")
     async def leaderboard(self, ctx):
-        async with aiosqlite.connect('database.db') as db:
-            async with db.execute('''SELECT user_id, coins FROM game_coins 
-                                   ORDER BY coins DESC LIMIT 10''') as cursor:
-                results = await cursor.fetchall()
+        board = self.bot.leaderboards.board('game_coins')
+        results = board.page(0, TOP_SIZE)
         
         if not results:
             await ctx.send(embed=modern_embed(
@@ -859,27 +864,37 @@ class Game(commands.Cog):
             ))
             return
         
-        leaderboard_text = ""
-        for i, (user_id, coins) in enumerate(results, 1):
-            user = self.bot.get_user(user_id)
-            username = user.display_name if user else f"User {user_id}"
-            medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
-            leaderboard_text += f"{medal} **{username}** - {coins:,} coins\n"
-        
-        embed = modern_embed(
-            title="🏆 Global Game Leaderboard",
-            description=leaderboard_text,
-            color=discord.Color.gold(),
-            ctx=ctx
-        )
-        await ctx.send(embed=embed)
+        rank, nearby = board.around(ctx.author.id)
+        pages = []
+        for start in range(0, len(results), PAGE_SIZE):
+            leaderboard_text = ""
+            for i, (user_id, coins) in enumerate(results[start:start + PAGE_SIZE], start + 1):
+                user = self.bot.get_user(user_id)
+                username = user.display_name if user else f"User {user_id}"
+                medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
+                leaderboard_text += f"{medal} **{username}** - {coins:,} coins\n"
+            
+            embed = modern_embed(
+                title="🏆 Global Game Leaderboard",
+                description=leaderboard_text,
+                color=discord.Color.gold(),
+                ctx=ctx
+            )
+            if rank is not None:
+                embed.add_field(
+                    name=f"📍 Your Rank: #{rank + 1} of {len(board)}",
+                    value=around_text(self.bot.get_user, ctx.author.id, nearby, "coins"),
+                    inline=False
+                )
+            pages.append(embed)
+        await send_pages(ctx, pages)
 
     @commands.command(name="stats", description="Show your game statistics.")
     async def stats(self, ctx, member: discord.Member = None):
         member = member or ctx.author
         coins = await self.get_coins(member.id)
         
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('SELECT games_played, games_won, total_earnings FROM game_stats WHERE user_id = ?', (member.id,)) as cursor:
                 result = await cursor.fetchone()
         
@@ -996,9 +1011,9 @@ class Game(commands.Cog):
         old_balance = await self.get_coins(user.id)
         
         # Set the exact amount
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''INSERT OR REPLACE INTO game_coins (user_id, coins) VALUES (?, ?)''', (user.id, amount))
-            await db.commit()
+        self.bot.leaderboards.set('game_coins', GLOBAL, user.id, amount)
         
         embed = modern_embed(
             title="💰 Balance Set",
@@ -1023,9 +1038,9 @@ class Game(commands.Cog):
         old_balance = await self.get_coins(user.id)
         
         # Reset to 0
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''INSERT OR REPLACE INTO game_coins (user_id, coins) VALUES (?, 0)''', (user.id,))
-            await db.commit()
+        self.bot.leaderboards.set('game_coins', GLOBAL, user.id, 0)
         
         embed = modern_embed(
             title="💰 Balance Reset",
@@ -1412,5 +1427,4 @@ class Game(commands.Cog):
 
 async def setup(bot):
     cog = Game(bot)
-    await cog.init_database()
     await bot.add_cog(cog) 
\ No newline at end of file
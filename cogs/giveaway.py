@@ -33,7 +33,7 @@ def parse_duration_with_gmt(duration_str):
         tz = IST  # Default to IST (GMT+5:30)
     return seconds, tz
 
-async def run_giveaway(ctx_or_channel, duration_str, prize, winners_str, host_user):
+async def run_giveaway(bot, ctx_or_channel, duration_str, prize, winners_str, host_user):
     seconds, tz = parse_duration_with_gmt(duration_str)
     if seconds == 0:
         send = getattr(ctx_or_channel, 'send', None) or getattr(ctx_or_channel, 'channel', ctx_or_channel).send
@@ -63,8 +63,19 @@ async def run_giveaway(ctx_or_channel, duration_str, prize, winners_str, host_us
     channel = getattr(ctx_or_channel, 'channel', ctx_or_channel)
     msg = await channel.send(embed=embed)
     await msg.add_reaction("🎉")
-    await asyncio.sleep(seconds)
-    msg = await channel.fetch_message(msg.id)
+    # The draw is a stored timer so it still happens after a restart
+    await bot.timers.schedule('giveaway_end', now + timedelta(seconds=seconds), {
+        'channel_id': channel.id, 'message_id': msg.id, 'prize': prize, 'winners': num_winners
+    })
+
+async def end_giveaway(bot, payload):
+    channel = bot.get_channel(payload['channel_id'])
+    if channel is None:
+        # Raised so the timer is kept and retried rather than dropped
+        raise LookupError(f"Channel {payload['channel_id']} is not cached")
+    prize = payload['prize']
+    num_winners = payload['winners']
+    msg = await channel.fetch_message(payload['message_id'])
     users = [user async for user in msg.reactions[0].users() if not user.bot]
     if not users:
         await channel.send("No valid entries. Giveaway cancelled.")
@@ -88,7 +99,7 @@ class GiveawayModal(ui.Modal, title="🎉 Start a Giveaway!"):
 
     async def on_submit(self, interaction: Interaction):
         await interaction.response.send_message("🎉 Giveaway started!", ephemeral=True)
-        await run_giveaway(interaction.channel, self.duration.value, self.prize.value, self.winners.value, interaction.user)
+        await run_giveaway(self.bot, interaction.channel, self.duration.value, self.prize.value, self.winners.value, interaction.user)
 
 def is_admin(ctx):
     return ctx.author.id == ctx.guild.owner_id or ctx.author.guild_permissions.administrator
@@ -97,6 +108,15 @@ class Giveaway(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    async def cog_load(self):
+        self.bot.timers.register('giveaway_end', self.end_giveaway)
+
+    async def cog_unload(self):
+        self.bot.timers.unregister('giveaway_end')
+
+    async def end_giveaway(self, payload):
+        await end_giveaway(self.bot, payload)
+
     @commands.hybrid_command(name="giveaway", description="Start a giveaway (admin/owner only).")
     @commands.check(is_admin)
     async def giveaway(self, ctx):
@@ -125,7 +145,7 @@ class Giveaway(commands.Cog):
                 await ctx.send("❌ Invalid format. Use: `<duration> | <prize> | <number of winners>`")
                 return
             duration_str, prize, winners_str = parts
-            await run_giveaway(ctx, duration_str, prize, winners_str, ctx.author)
+            await run_giveaway(self.bot, ctx, duration_str, prize, winners_str, ctx.author)
 
 async def setup(bot):
     await bot.add_cog(Giveaway(bot)) 
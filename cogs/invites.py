@@ -1,23 +1,30 @@
 import discord
 from discord.ext import commands
 from datetime import datetime
-import aiosqlite
 from .utility import styled_embed, OWNER_ID
+from bot import send_pages
+from leaderboards import TOP_SIZE, PAGE_SIZE, around_text
 
 class Invites(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    async def cog_load(self):
+        await self.bot.leaderboards.load('invites', 'SELECT guild_id, user_id, invites FROM invite_tracker')
+
     @commands.hybrid_command(description="Show how many users a member has invited.")
     async def invites(self, ctx, member: discord.Member = None):
         member = member or ctx.author
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             row = await db.execute('SELECT invites FROM invite_tracker WHERE user_id = ? AND guild_id = ?', (member.id, ctx.guild.id))
             result = await row.fetchone()
         count = result[0] if result else 0
+        board = self.bot.leaderboards.board('invites', ctx.guild.id)
+        rank = board.rank(member.id)
+        standing = f"\nThey rank **#{rank + 1}** of {len(board)} inviters." if rank is not None else ""
         embed = styled_embed(
             title="Invite Tracker",
-            description=f"{member.mention} has invited **{count}** member(s) to this server!",
+            description=f"{member.mention} has invited **{count}** member(s) to this server!{standing}",
             color=discord.Color.blurple(),
             ctx=ctx,
             emoji="🔗"
@@ -26,9 +33,8 @@ class Invites(commands.Cog):
 
     @commands.hybrid_command(description="Show the top inviters in this server.")
     async def inviteleaderboard(self, ctx):
-        async with aiosqlite.connect('database.db') as db:
-            rows = await db.execute('SELECT user_id, invites FROM invite_tracker WHERE guild_id = ? ORDER BY invites DESC LIMIT 10', (ctx.guild.id,))
-            results = await rows.fetchall()
+        board = self.bot.leaderboards.board('invites', ctx.guild.id)
+        results = board.page(0, TOP_SIZE)
         if not results:
             await ctx.send(embed=styled_embed(
                 title="Invite Leaderboard",
@@ -38,19 +44,29 @@ class Invites(commands.Cog):
                 emoji="🏆"
             ), reference=ctx.message if hasattr(ctx, 'message') else None, mention_author=True)
             return
-        desc = ""
-        for i, (user_id, invites) in enumerate(results, 1):
-            member = ctx.guild.get_member(user_id)
-            name = member.mention if member else f"<@{user_id}>"
-            desc += f"**{i}.** {name} — `{invites}` invites\n"
-        embed = styled_embed(
-            title="Invite Leaderboard",
-            description=desc,
-            color=discord.Color.blurple(),
-            ctx=ctx,
-            emoji="🏆"
-        )
-        await ctx.send(embed=embed, reference=ctx.message if hasattr(ctx, 'message') else None, mention_author=True)
+        rank, nearby = board.around(ctx.author.id)
+        pages = []
+        for start in range(0, len(results), PAGE_SIZE):
+            desc = ""
+            for i, (user_id, invites) in enumerate(results[start:start + PAGE_SIZE], start + 1):
+                member = ctx.guild.get_member(user_id)
+                name = member.mention if member else f"<@{user_id}>"
+                desc += f"**{i}.** {name} — `{invites}` invites\n"
+            embed = styled_embed(
+                title="Invite Leaderboard",
+                description=desc,
+                color=discord.Color.blurple(),
+                ctx=ctx,
+                emoji="🏆"
+            )
+            if rank is not None:
+                embed.add_field(
+                    name=f"📍 Your Rank: #{rank + 1} of {len(board)}",
+                    value=around_text(ctx.guild.get_member, ctx.author.id, nearby, "invites"),
+                    inline=False
+                )
+            pages.append(embed)
+        await send_pages(ctx, pages)
 
     @commands.hybrid_command(description="Show in how many servers a member has invited the bot.")
     async def botinviteservers(self, ctx, member: discord.Member = None):
@@ -58,7 +74,7 @@ class Invites(commands.Cog):
             invite_counts = {}
             for guild in ctx.bot.guilds:
                 if guild.member_count >= 100:
-                    async with aiosqlite.connect('database.db') as db:
+                    async with self.bot.db.read() as db:
                         rows = await db.execute('SELECT user_id, invites FROM invite_tracker WHERE guild_id = ?', (guild.id,))
                         results = await rows.fetchall()
                     for user_id, invites in results:
@@ -92,7 +108,7 @@ class Invites(commands.Cog):
         count = 0
         for guild in ctx.bot.guilds:
             if guild.member_count >= 100:
-                async with aiosqlite.connect('database.db') as db:
+                async with self.bot.db.read() as db:
                     row = await db.execute('SELECT invites FROM invite_tracker WHERE user_id = ? AND guild_id = ?', (member.id, guild.id))
                     result = await row.fetchone()
                 if result and result[0] > 0:
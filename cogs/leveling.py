@@ -1,26 +1,82 @@
 import discord
 from discord.ext import commands
-from bot import modern_embed
-import aiosqlite
+from bot import modern_embed, send_pages
 import random
 import asyncio
-from datetime import datetime, timedelta
+import io
 import json
+from datetime import datetime, timedelta
+import numpy as np
+import migrations
+from pipeline import ORDER_LEVELING
+from levels import LevelRecord, LevelCurve, DEFAULT_CURVE
+from bounded import TTLMap
+from leaderboards import TOP_SIZE, PAGE_SIZE, around_text
+from achievements import Achievement, AchievementRules
+from rankcards import render_rank_card
+
+# (id, bit, LevelRecord counter, threshold, name, description, xp, icon)
+# Bits are stored in user_levels.achievement_bits, so only ever add rows
+ACHIEVEMENT_TABLE = (
+    ('first_message', 0, 'messages', 1, "First Steps", "Send your first message", 50, "👋"),
+    ('level_10', 1, 'level', 10, "Rising Star", "Reach level 10", 100, "⭐"),
+    ('level_25', 2, 'level', 25, "Veteran", "Reach level 25", 250, "🎖️"),
+    ('level_50', 3, 'level', 50, "Legend", "Reach level 50", 500, "👑"),
+    ('daily_streak_7', 4, 'daily_streak', 7, "Dedicated", "7-day daily streak", 200, "🔥"),
+    ('voice_hour', 5, 'voice_time', 3600, "Voice Master", "Spend 1 hour in voice", 150, "🎤"),
+    ('invite_5', 6, 'invites', 5, "Recruiter", "Invite 5 people", 300, "📢"),
+    ('reaction_100', 7, 'reactions', 100, "Reactive", "Use 100 reactions", 100, "😄"),
+)
+
+ACHIEVEMENTS = AchievementRules(Achievement(*row) for row in ACHIEVEMENT_TABLE)
+
+
+async def achievement_bits_from_json(db):
+    # Achievements used to be a JSON list of ids in user_levels.achievements
+    masks = {row[0]: 1 << row[1] for row in ACHIEVEMENT_TABLE}
+    async with db.execute('SELECT user_id, guild_id, achievements FROM user_levels') as cursor:
+        rows = await cursor.fetchall()
+    updates = []
+    for user_id, guild_id, ids in rows:
+        bits = 0
+        for achievement_id in json.loads(ids or '[]'):
+            bits |= masks.get(achievement_id, 0)
+        if bits:
+            updates.append((bits, user_id, guild_id))
+    await db.executemany('UPDATE user_levels SET achievement_bits = ? WHERE user_id = ? AND guild_id = ?', updates)
+
+migrations.register('leveling', [
+    '''CREATE TABLE IF NOT EXISTS user_levels
+       (user_id INTEGER, guild_id INTEGER, xp INTEGER DEFAULT 0,
+        level INTEGER DEFAULT 0, total_xp INTEGER DEFAULT 0,
+        daily_streak INTEGER DEFAULT 0, last_daily TEXT,
+        voice_time INTEGER DEFAULT 0, invites INTEGER DEFAULT 0,
+        reactions INTEGER DEFAULT 0, achievements TEXT DEFAULT '[]',
+        skill_points INTEGER DEFAULT 0, skills TEXT DEFAULT '{}',
+        PRIMARY KEY (user_id, guild_id))''',
+    '''CREATE TABLE IF NOT EXISTS guild_level_config
+       (guild_id INTEGER PRIMARY KEY, xp_channel_id INTEGER,
+        level_up_messages BOOLEAN DEFAULT 1, xp_rate FLOAT DEFAULT 1.0)''',
+], [
+    '''CREATE INDEX IF NOT EXISTS idx_user_levels_rank ON user_levels (guild_id, level DESC, xp DESC, user_id, total_xp)''',
+], migrations.add_columns('guild_level_config', 'curve_step INTEGER DEFAULT 100', 'curve_exponent FLOAT DEFAULT 2.0'),
+   migrations.add_columns('user_levels', 'messages INTEGER DEFAULT 0', 'achievement_bits INTEGER DEFAULT 0'),
+   achievement_bits_from_json)
+
+# XP per minute in voice (outside the AFK channel), scaled by the server's XP rate
+VOICE_XP_PER_MINUTE = 5
+
+# Bands the level distribution is reported in after a recompute
+LEVEL_BANDS = (0, 5, 10, 25, 50, 100)
+
 
 class Leveling(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.xp_cooldowns = {}
-        self.achievements = {
-            "first_message": {"name": "First Steps", "description": "Send your first message", "xp": 50, "icon": "👋"},
-            "level_10": {"name": "Rising Star", "description": "Reach level 10", "xp": 100, "icon": "⭐"},
-            "level_25": {"name": "Veteran", "description": "Reach level 25", "xp": 250, "icon": "🎖️"},
-            "level_50": {"name": "Legend", "description": "Reach level 50", "xp": 500, "icon": "👑"},
-            "daily_streak_7": {"name": "Dedicated", "description": "7-day daily streak", "xp": 200, "icon": "🔥"},
-            "voice_hour": {"name": "Voice Master", "description": "Spend 1 hour in voice", "xp": 150, "icon": "🎤"},
-            "invite_5": {"name": "Recruiter", "description": "Invite 5 people", "xp": 300, "icon": "📢"},
-            "reaction_100": {"name": "Reactive", "description": "Use 100 reactions", "xp": 100, "icon": "😄"}
-        }
+        # (guild_id, user_id) of members who earned XP in the last minute
+        self.xp_cooldowns = bot.sweeper.track(TTLMap(ttl=60))
+        # guild_id -> (xp_rate, LevelCurve) for guilds that changed the defaults
+        self.level_configs = {}
         self.skill_trees = {
             "communication": {
                 "name": "Communication",
@@ -40,176 +96,158 @@ class Leveling(commands.Cog):
             }
         }
 
-
-    async def init_database(self):
-        async with aiosqlite.connect('database.db') as db:
-            await db.execute('''CREATE TABLE IF NOT EXISTS user_levels 
-                               (user_id INTEGER, guild_id INTEGER, xp INTEGER DEFAULT 0, 
-                                level INTEGER DEFAULT 0, total_xp INTEGER DEFAULT 0,
-                                daily_streak INTEGER DEFAULT 0, last_daily TEXT,
-                                voice_time INTEGER DEFAULT 0, invites INTEGER DEFAULT 0,
-                                reactions INTEGER DEFAULT 0, achievements TEXT DEFAULT '[]',
-                                skill_points INTEGER DEFAULT 0, skills TEXT DEFAULT '{}',
-                                PRIMARY KEY (user_id, guild_id))''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS guild_level_config 
-                               (guild_id INTEGER PRIMARY KEY, xp_channel_id INTEGER,
-                                level_up_messages BOOLEAN DEFAULT 1, xp_rate FLOAT DEFAULT 1.0)''')
-            await db.commit()
-
-    async def get_user_data(self, user_id, guild_id):
-        async with aiosqlite.connect('database.db') as db:
-            async with db.execute('''SELECT xp, level, total_xp, daily_streak, last_daily,
-                                   voice_time, invites, reactions, achievements, skill_points, skills
-                                   FROM user_levels WHERE user_id = ? AND guild_id = ?''', 
-                                (user_id, guild_id)) as cursor:
-                result = await cursor.fetchone()
-                if result:
-                    return {
-                        'xp': result[0], 'level': result[1], 'total_xp': result[2],
-                        'daily_streak': result[3], 'last_daily': result[4],
-                        'voice_time': result[5], 'invites': result[6], 'reactions': result[7],
-                        'achievements': json.loads(result[8]), 'skill_points': result[9],
-                        'skills': json.loads(result[10])
-                    }
-                return None
-
-    async def update_user_data(self, user_id, guild_id, **kwargs):
-        async with aiosqlite.connect('database.db') as db:
-            if await self.get_user_data(user_id, guild_id):
-                set_clause = ', '.join([f'{k} = ?' for k in kwargs.keys()])
-                await db.execute(f'UPDATE user_levels SET {set_clause} WHERE user_id = ? AND guild_id = ?',
-                               (*kwargs.values(), user_id, guild_id))
-            else:
-                await db.execute('''INSERT INTO user_levels (user_id, guild_id, xp, level, total_xp,
-                                   daily_streak, last_daily, voice_time, invites, reactions, 
-                                   achievements, skill_points, skills)
-                                   VALUES (?, ?, 0, 0, 0, 0, ?, 0, 0, 0, '[]', 0, '{}')''',
-                               (user_id, guild_id, datetime.utcnow().isoformat()))
-            await db.commit()
-
-    def calculate_level(self, xp):
-        return int((xp ** 0.5) / 10)
-
-    def calculate_xp_for_level(self, level):
-        return int((level * 10) ** 2)
-
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot or not message.guild:
-            return
-
+    async def cog_load(self):
+        self.bot.pipeline.add_stage('leveling', self.message_stage, ORDER_LEVELING)
+        self.bot.voice.subscribe('leveling', self.voice_stage)
+        # XP still waiting in the engine belongs in the board
+        await self.bot.levels.flush()
+        await self.bot.leaderboards.load('levels', 'SELECT guild_id, user_id, xp FROM user_levels')
+        rows = await self.bot.db.fetchall('SELECT guild_id, xp_rate, curve_step, curve_exponent FROM guild_level_config')
+        for guild_id, xp_rate, step, exponent in rows:
+            self.set_level_config(guild_id, xp_rate, step, exponent)
+
+    async def cog_unload(self):
+        self.bot.pipeline.remove_stage('leveling')
+        self.bot.voice.unsubscribe('leveling')
+
+    def save(self, record):
+        # Written with the XP engine's next batch; the board moves now
+        self.bot.levels.mark(record)
+        self.bot.leaderboards.set('levels', record.guild_id, record.user_id, record.xp)
+
+    def set_level_config(self, guild_id, xp_rate, step, exponent):
+        xp_rate = 1.0 if xp_rate is None else xp_rate
+        step = step or DEFAULT_CURVE.step
+        exponent = exponent or DEFAULT_CURVE.exponent
+        if (step, exponent) == (DEFAULT_CURVE.step, DEFAULT_CURVE.exponent):
+            curve = DEFAULT_CURVE
+        else:
+            curve = LevelCurve(step, exponent)
+        self.level_configs[guild_id] = (xp_rate, curve)
+
+    def level_config(self, guild_id):
+        return self.level_configs.get(guild_id, (1.0, DEFAULT_CURVE))
+
+    def grant_xp(self, record, amount, curve):
+        """Add XP, move the level with it and return the levels gained"""
+        old_level = record.level
+        record.xp += amount
+        record.total_xp += amount
+        record.level = curve.level(record.xp)
+        record.skill_points += record.level - old_level
+        return record.level - old_level
+
+    async def message_stage(self, ctx):
+        message = ctx.message
         user_id = message.author.id
         guild_id = message.guild.id
         
         # XP cooldown (1 minute)
-        cooldown_key = f"{user_id}_{guild_id}"
+        cooldown_key = (guild_id, user_id)
         if cooldown_key in self.xp_cooldowns:
-            if datetime.utcnow() - self.xp_cooldowns[cooldown_key] < timedelta(minutes=1):
-                return
+            return
         
-        self.xp_cooldowns[cooldown_key] = datetime.utcnow()
+        self.xp_cooldowns[cooldown_key] = True
         
-        # Get user data
-        user_data = await self.get_user_data(user_id, guild_id)
-        if not user_data:
-            user_data = {
-                'xp': 0, 'level': 0, 'total_xp': 0, 'daily_streak': 0,
-                'last_daily': datetime.utcnow().isoformat(), 'voice_time': 0,
-                'invites': 0, 'reactions': 0, 'achievements': [],
-                'skill_points': 0, 'skills': {}
-            }
+        # Members who chatted recently are already in memory
+        record = await self.bot.levels.fetch(guild_id, user_id)
+        xp_rate, curve = self.level_config(guild_id)
 
         # Calculate XP gain
         base_xp = random.randint(15, 25)
         
         # Skill bonuses
-        communication_level = user_data['skills'].get('eloquence', 0)
+        communication_level = record.skills.get('eloquence', 0)
         base_xp += communication_level * 2
+        base_xp = max(1, round(base_xp * xp_rate))
 
         # Update XP
-        new_xp = user_data['xp'] + base_xp
-        new_total_xp = user_data['total_xp'] + base_xp
-        old_level = user_data['level']
-        new_level = self.calculate_level(new_xp)
-
-        # Check for level up
-        level_up = new_level > old_level
-        skill_points_gained = new_level - old_level
+        record.messages += 1
+        skill_points_gained = self.grant_xp(record, base_xp, curve)
+        level_up = skill_points_gained > 0
 
-        # Update data
-        await self.update_user_data(user_id, guild_id,
-                                  xp=new_xp, level=new_level, total_xp=new_total_xp,
-                                  skill_points=user_data['skill_points'] + skill_points_gained)
+        unlocked = self.unlock(record, ('messages', 'level'))
+        self.save(record)
 
         # Level up message
         if level_up:
             embed = modern_embed(
                 title="🎉 Level Up!",
-                description=f"**{message.author.display_name}** reached level **{new_level}**!\n"
-                           f"🎯 **XP:** {new_xp:,} | **Total:** {new_total_xp:,}\n"
+                description=f"**{message.author.display_name}** reached level **{record.level}**!\n"
+                           f"🎯 **XP:** {record.xp:,} | **Total:** {record.total_xp:,}\n"
                            f"⭐ **Skill Points:** +{skill_points_gained}",
                 color=discord.Color.gold(),
                 ctx=message
             )
             await message.channel.send(embed=embed)
 
-        # Check achievements
-        await self.check_achievements(user_id, guild_id, user_data)
+        await self.announce_achievements(message.channel, record, unlocked)
 
-    async def check_achievements(self, user_id, guild_id, user_data):
-        new_achievements = []
-        
-        # First message achievement
-        if "first_message" not in user_data['achievements']:
-            new_achievements.append("first_message")
-
-        # Level achievements
-        if user_data['level'] >= 10 and "level_10" not in user_data['achievements']:
-            new_achievements.append("level_10")
-        if user_data['level'] >= 25 and "level_25" not in user_data['achievements']:
-            new_achievements.append("level_25")
-        if user_data['level'] >= 50 and "level_50" not in user_data['achievements']:
-            new_achievements.append("level_50")
-
-        # Award achievements
-        if new_achievements:
-            total_xp_gained = 0
-            achievement_text = []
-            
-            for achievement_id in new_achievements:
-                achievement = self.achievements[achievement_id]
-                total_xp_gained += achievement['xp']
-                achievement_text.append(f"{achievement['icon']} **{achievement['name']}** - {achievement['description']}")
-
-            # Update achievements and XP
-            all_achievements = user_data['achievements'] + new_achievements
-            new_xp = user_data['xp'] + total_xp_gained
-            new_total_xp = user_data['total_xp'] + total_xp_gained
-            
-            await self.update_user_data(user_id, guild_id,
-                                      xp=new_xp, total_xp=new_total_xp,
-                                      achievements=json.dumps(all_achievements))
+    async def voice_stage(self, credits):
+        # Whole minutes from bot.voice, batched per interval
+        for guild_id, user_id, minutes in credits:
+            record = await self.bot.levels.fetch(guild_id, user_id)
+            xp_rate, curve = self.level_config(guild_id)
+            record.voice_time += minutes * 60
+            self.grant_xp(record, max(1, round(minutes * VOICE_XP_PER_MINUTE * xp_rate)), curve)
+            self.unlock(record, ('voice_time', 'level'))
+            self.save(record)
 
-            # Send achievement notification
-            embed = modern_embed(
-                title="🏆 Achievement Unlocked!",
-                description=f"**Achievements:**\n" + "\n".join(achievement_text) + f"\n\n💰 **XP Gained:** +{total_xp_gained}",
-                color=discord.Color.gold(),
-                ctx=None
-            )
-            # Instead of DM, send to a channel if possible
-            if hasattr(self, 'last_xp_channel') and self.last_xp_channel:
-                try:
-                    await self.last_xp_channel.send(embed=embed)
-                except:
-                    pass
+    def unlock(self, record, counters):
+        """Unlock what the given counters now reach, returning the new achievements
+
+        Only rules on those counters are looked at. The caller saves the record.
+        """
+        unlocked = []
+        for counter in counters:
+            unlocked += ACHIEVEMENTS.reached(record.achievement_bits, counter, getattr(record, counter))
+        for achievement in unlocked:
+            record.achievement_bits |= achievement.mask
+            record.xp += achievement.xp
+            record.total_xp += achievement.xp
+        return unlocked
+
+    async def add_to_counter(self, guild_id, user_id, counter, amount, channel=None):
+        """Add to a member's counter, such as reactions, and award what it unlocks"""
+        record = await self.bot.levels.fetch(guild_id, user_id)
+        setattr(record, counter, getattr(record, counter) + amount)
+        unlocked = self.unlock(record, (counter,))
+        self.save(record)
+        await self.announce_achievements(channel, record, unlocked)
+
+    async def announce_achievements(self, channel, record, unlocked):
+        if not unlocked or channel is None:
+            return
+        achievement_text = [f"{achievement.icon} **{achievement.name}** - {achievement.description}" for achievement in unlocked]
+        embed = modern_embed(
+            title="🏆 Achievement Unlocked!",
+            description=f"<@{record.user_id}>\n**Achievements:**\n" + "\n".join(achievement_text)
+                        + f"\n\n💰 **XP Gained:** +{sum(achievement.xp for achievement in unlocked)}",
+            color=discord.Color.gold(),
+            ctx=None
+        )
+        try:
+            await channel.send(embed=embed)
+        except discord.HTTPException:
+            pass
+
+    @commands.Cog.listener()
+    async def on_reaction_add(self, reaction, user):
+        if user.bot or not reaction.message.guild:
+            return
+        await self.add_to_counter(reaction.message.guild.id, user.id, 'reactions', 1, reaction.message.channel)
+
+    @commands.Cog.listener()
+    async def on_member_invited(self, member, inviter):
+        if inviter and not inviter.bot:
+            await self.add_to_counter(member.guild.id, inviter.id, 'invites', 1)
 
     @commands.hybrid_command(name="level", description="Show your or another user's level.")
     async def level(self, ctx, user: discord.Member = None):
         if not user:
             user = ctx.author
 
-        user_data = await self.get_user_data(user.id, ctx.guild.id)
+        user_data = await self.bot.levels.get(ctx.guild.id, user.id)
         if not user_data:
             await ctx.send(embed=modern_embed(
                 title="❌ No Data",
@@ -220,45 +258,72 @@ class Leveling(commands.Cog):
             return
 
         # Calculate progress to next level
-        current_level_xp = self.calculate_xp_for_level(user_data['level'])
-        next_level_xp = self.calculate_xp_for_level(user_data['level'] + 1)
-        progress = (user_data['xp'] - current_level_xp) / (next_level_xp - current_level_xp) * 100
+        curve = self.level_config(ctx.guild.id)[1]
+        current_level_xp = curve.xp_for(user_data.level)
+        next_level_xp = curve.xp_for(user_data.level + 1)
+        progress = (user_data.xp - current_level_xp) / max(next_level_xp - current_level_xp, 1) * 100
 
         # Create progress bar
         bar_length = 20
         filled_length = int(bar_length * progress / 100)
         progress_bar = "█" * filled_length + "░" * (bar_length - filled_length)
+        board = self.bot.leaderboards.board('levels', ctx.guild.id)
+        rank = board.rank(user.id)
 
         embed = modern_embed(
             title=f"📊 {user.display_name}'s Level",
-            description=f"**Level:** {user_data['level']}\n"
-                       f"**XP:** {user_data['xp']:,} / {next_level_xp:,}\n"
-                       f"**Total XP:** {user_data['total_xp']:,}\n"
+            description=f"**Level:** {user_data.level}\n"
+                       f"**Rank:** {f'#{rank + 1} of {len(board)}' if rank is not None else 'Unranked'}\n"
+                       f"**XP:** {user_data.xp:,} / {next_level_xp:,}\n"
+                       f"**Total XP:** {user_data.total_xp:,}\n"
                        f"**Progress:** {progress:.1f}%\n"
                        f"**Progress Bar:** `{progress_bar}`\n\n"
                        f"**Stats:**\n"
-                       f"🎤 **Voice Time:** {user_data['voice_time'] // 3600}h {(user_data['voice_time'] % 3600) // 60}m\n"
-                       f"📢 **Invites:** {user_data['invites']}\n"
-                       f"😄 **Reactions:** {user_data['reactions']}\n"
-                       f"🔥 **Daily Streak:** {user_data['daily_streak']} days\n"
-                       f"⭐ **Skill Points:** {user_data['skill_points']}\n"
-                       f"🏆 **Achievements:** {len(user_data['achievements'])}/{len(self.achievements)}",
+                       f"🎤 **Voice Time:** {user_data.voice_time // 3600}h {(user_data.voice_time % 3600) // 60}m\n"
+                       f"📢 **Invites:** {user_data.invites}\n"
+                       f"😄 **Reactions:** {user_data.reactions}\n"
+                       f"🔥 **Daily Streak:** {user_data.daily_streak} days\n"
+                       f"⭐ **Skill Points:** {user_data.skill_points}\n"
+                       f"🏆 **Achievements:** {ACHIEVEMENTS.count(user_data.achievement_bits)}/{len(ACHIEVEMENTS)}",
             color=user.color if user.color != discord.Color.default() else discord.Color.blurple(),
             ctx=ctx,
             thumbnail=user.avatar.url if user.avatar else None
         )
         await ctx.send(embed=embed)
 
+    @commands.hybrid_command(name="rankcard", description="Show your or another user's rank card.")
+    async def rankcard(self, ctx, user: discord.Member = None):
+        if not user:
+            user = ctx.author
+
+        user_data = await self.bot.levels.get(ctx.guild.id, user.id)
+        if not user_data:
+            await ctx.send(embed=modern_embed(
+                title="❌ No Data",
+                description="This user hasn't earned any XP yet.",
+                color=discord.Color.red(),
+                ctx=ctx
+            ))
+            return
+
+        board = self.bot.leaderboards.board('levels', ctx.guild.id)
+        rank = board.rank(user.id)
+        curve = self.level_config(ctx.guild.id)[1]
+        color = user.color.to_rgb() if user.color != discord.Color.default() else discord.Color.blurple().to_rgb()
+        avatar = await self.bot.avatars.fetch(user.display_avatar)
+        # Everything drawn is in the key, so a card is rendered again only when it would look different
+        key = ('rankcard', ctx.guild.id, user.id, user.display_name, user.display_avatar.key,
+               user_data.xp, user_data.level, rank, color, curve.step, curve.exponent)
+        png = await self.bot.cards.render(key, render_rank_card, avatar, user.display_name, user_data.level,
+                                          rank, user_data.xp, curve.xp_for(user_data.level),
+                                          curve.xp_for(user_data.level + 1), color)
+        await ctx.send(file=discord.File(io.BytesIO(png), filename='rankcard.png'))
+
     @commands.hybrid_command(name="levelleaderboard", description="Show the server's level leaderboard.")
     async def leaderboard(self, ctx):
-        async with aiosqlite.connect('database.db') as db:
-            async with db.execute('''SELECT user_id, xp, level, total_xp 
-                                   FROM user_levels WHERE guild_id = ? 
-                                   ORDER BY level DESC, xp DESC LIMIT 10''', 
-                                (ctx.guild.id,)) as cursor:
-                results = await cursor.fetchall()
-
-        if not results:
+        board = self.bot.leaderboards.board('levels', ctx.guild.id)
+        top = board.page(0, TOP_SIZE)
+        if not top:
             await ctx.send(embed=modern_embed(
                 title="❌ No Data",
                 description="No one has earned XP yet.",
@@ -267,30 +332,39 @@ class Leveling(commands.Cog):
             ))
             return
 
-        embed = modern_embed(
-            title="🏆 Level Leaderboard",
-            description="Top 10 members by level",
-            color=discord.Color.gold(),
-            ctx=ctx
-        )
-
-        for i, (user_id, xp, level, total_xp) in enumerate(results, 1):
-            user = ctx.guild.get_member(user_id)
-            if user:
+        rank, nearby = board.around(ctx.author.id)
+        pages = []
+        for start in range(0, len(top), PAGE_SIZE):
+            embed = modern_embed(
+                title="🏆 Level Leaderboard",
+                description=f"Top {len(top)} members by XP",
+                color=discord.Color.gold(),
+                ctx=ctx
+            )
+            for i, (user_id, xp) in enumerate(top[start:start + PAGE_SIZE], start + 1):
+                user = ctx.guild.get_member(user_id)
+                record = await self.bot.levels.get(ctx.guild.id, user_id)
+                if user and record:
+                    embed.add_field(
+                        name=f"{'🥇' if i == 1 else '🥈' if i == 2 else '🥉' if i == 3 else f'#{i}'} {user.display_name}",
+                        value=f"**Level:** {record.level} | **XP:** {xp:,} | **Total:** {record.total_xp:,}",
+                        inline=False
+                    )
+            if rank is not None:
                 embed.add_field(
-                    name=f"{'🥇' if i == 1 else '🥈' if i == 2 else '🥉' if i == 3 else f'#{i}'} {user.display_name}",
-                    value=f"**Level:** {level} | **XP:** {xp:,} | **Total:** {total_xp:,}",
+                    name=f"📍 Your Rank: #{rank + 1} of {len(board)}",
+                    value=around_text(ctx.guild.get_member, ctx.author.id, nearby, "XP"),
                     inline=False
                 )
-
-        await ctx.send(embed=embed)
+            pages.append(embed)
+        await send_pages(ctx, pages)
 
     @commands.hybrid_command(name="achievements", description="Show your achievements.")
     async def achievements(self, ctx, user: discord.Member = None):
         if not user:
             user = ctx.author
 
-        user_data = await self.get_user_data(user.id, ctx.guild.id)
+        user_data = await self.bot.levels.get(ctx.guild.id, user.id)
         if not user_data:
             await ctx.send(embed=modern_embed(
                 title="❌ No Data",
@@ -302,7 +376,7 @@ class Leveling(commands.Cog):
 
         embed = modern_embed(
             title=f"🏆 {user.display_name}'s Achievements",
-            description=f"**Progress:** {len(user_data['achievements'])}/{len(self.achievements)} achievements unlocked",
+            description=f"**Progress:** {ACHIEVEMENTS.count(user_data.achievement_bits)}/{len(ACHIEVEMENTS)} achievements unlocked",
             color=discord.Color.gold(),
             ctx=ctx,
             thumbnail=user.avatar.url if user.avatar else None
@@ -310,18 +384,17 @@ class Leveling(commands.Cog):
 
         # Show unlocked achievements
         unlocked = []
-        for achievement_id in user_data['achievements']:
-            achievement = self.achievements[achievement_id]
-            unlocked.append(f"{achievement['icon']} **{achievement['name']}** - {achievement['description']} (+{achievement['xp']} XP)")
+        for achievement in ACHIEVEMENTS.unlocked(user_data.achievement_bits):
+            unlocked.append(f"{achievement.icon} **{achievement.name}** - {achievement.description} (+{achievement.xp} XP)")
 
         if unlocked:
             embed.add_field(name="✅ Unlocked", value="\n".join(unlocked), inline=False)
 
         # Show locked achievements
         locked = []
-        for achievement_id, achievement in self.achievements.items():
-            if achievement_id not in user_data['achievements']:
-                locked.append(f"🔒 **{achievement['name']}** - {achievement['description']}")
+        for achievement in ACHIEVEMENTS:
+            if not user_data.achievement_bits & achievement.mask:
+                locked.append(f"🔒 **{achievement.name}** - {achievement.description}")
 
         if locked:
             embed.add_field(name="🔒 Locked", value="\n".join(locked), inline=False)
@@ -330,7 +403,7 @@ class Leveling(commands.Cog):
 
     @commands.hybrid_command(name="skills", description="Show and manage your skill tree.")
     async def skills(self, ctx):
-        user_data = await self.get_user_data(ctx.author.id, ctx.guild.id)
+        user_data = await self.bot.levels.get(ctx.guild.id, ctx.author.id)
         if not user_data:
             await ctx.send(embed=modern_embed(
                 title="❌ No Data",
@@ -342,7 +415,7 @@ class Leveling(commands.Cog):
 
         embed = modern_embed(
             title="🌳 Skill Tree",
-            description=f"**Available Skill Points:** {user_data['skill_points']}\n\n"
+            description=f"**Available Skill Points:** {user_data.skill_points}\n\n"
                        f"Use `/skillup <tree> <skill>` to upgrade skills!",
             color=discord.Color.green(),
             ctx=ctx
@@ -351,7 +424,7 @@ class Leveling(commands.Cog):
         for tree_id, tree in self.skill_trees.items():
             tree_text = []
             for skill_id, skill in tree['skills'].items():
-                current_level = user_data['skills'].get(skill_id, 0)
+                current_level = user_data.skills.get(skill_id, 0)
                 tree_text.append(f"**{skill['name']}** (Lv. {current_level}/{skill['max_level']}) - {skill['effect']}")
             
             embed.add_field(
@@ -364,7 +437,7 @@ class Leveling(commands.Cog):
 
     @commands.hybrid_command(name="skillup", description="Upgrade a skill.")
     async def skillup(self, ctx, tree: str, skill: str):
-        user_data = await self.get_user_data(ctx.author.id, ctx.guild.id)
+        user_data = await self.bot.levels.get(ctx.guild.id, ctx.author.id)
         if not user_data:
             await ctx.send(embed=modern_embed(
                 title="❌ No Data",
@@ -393,7 +466,7 @@ class Leveling(commands.Cog):
             return
 
         skill_info = self.skill_trees[tree]['skills'][skill]
-        current_level = user_data['skills'].get(skill, 0)
+        current_level = user_data.skills.get(skill, 0)
 
         if current_level >= skill_info['max_level']:
             await ctx.send(embed=modern_embed(
@@ -404,7 +477,7 @@ class Leveling(commands.Cog):
             ))
             return
 
-        if user_data['skill_points'] < skill_info['cost']:
+        if user_data.skill_points < skill_info['cost']:
             await ctx.send(embed=modern_embed(
                 title="❌ Insufficient Points",
                 description=f"You need {skill_info['cost']} skill points to upgrade {skill_info['name']}.",
@@ -414,18 +487,16 @@ class Leveling(commands.Cog):
             return
 
         # Upgrade skill
-        user_data['skills'][skill] = current_level + 1
-        user_data['skill_points'] -= skill_info['cost']
+        user_data.skills[skill] = current_level + 1
+        user_data.skill_points -= skill_info['cost']
 
-        await self.update_user_data(ctx.author.id, ctx.guild.id,
-                                  skill_points=user_data['skill_points'],
-                                  skills=json.dumps(user_data['skills']))
+        self.save(user_data)
 
         embed = modern_embed(
             title="⭐ Skill Upgraded!",
             description=f"**{skill_info['name']}** upgraded to level **{current_level + 1}**!\n"
                        f"**Effect:** {skill_info['effect']}\n"
-                       f"**Remaining Points:** {user_data['skill_points']}",
+                       f"**Remaining Points:** {user_data.skill_points}",
             color=discord.Color.green(),
             ctx=ctx
         )
@@ -433,17 +504,12 @@ class Leveling(commands.Cog):
 
     @commands.hybrid_command(name="dailylevel", description="Claim your daily XP bonus.")
     async def daily(self, ctx):
-        user_data = await self.get_user_data(ctx.author.id, ctx.guild.id)
+        user_data = await self.bot.levels.get(ctx.guild.id, ctx.author.id)
         if not user_data:
-            user_data = {
-                'daily_streak': 0, 'last_daily': datetime.utcnow().isoformat(),
-                'xp': 0, 'level': 0, 'total_xp': 0, 'voice_time': 0,
-                'invites': 0, 'reactions': 0, 'achievements': [],
-                'skill_points': 0, 'skills': {}
-            }
+            user_data = LevelRecord(ctx.author.id, ctx.guild.id)
 
         # Check if already claimed today
-        last_daily = datetime.fromisoformat(user_data['last_daily'])
+        last_daily = datetime.fromisoformat(user_data.last_daily)
         if datetime.utcnow() - last_daily < timedelta(days=1):
             time_left = timedelta(days=1) - (datetime.utcnow() - last_daily)
             hours, remainder = divmod(time_left.seconds, 3600)
@@ -460,7 +526,7 @@ class Leveling(commands.Cog):
         # Calculate streak and bonus
         days_since_last = (datetime.utcnow() - last_daily).days
         if days_since_last == 1:
-            new_streak = user_data['daily_streak'] + 1
+            new_streak = user_data.daily_streak + 1
         else:
             new_streak = 1
 
@@ -470,13 +536,12 @@ class Leveling(commands.Cog):
         total_bonus = base_bonus + streak_bonus
 
         # Update data
-        new_xp = user_data['xp'] + total_bonus
-        new_total_xp = user_data['total_xp'] + total_bonus
-
-        await self.update_user_data(ctx.author.id, ctx.guild.id,
-                                  xp=new_xp, total_xp=new_total_xp,
-                                  daily_streak=new_streak,
-                                  last_daily=datetime.utcnow().isoformat())
+        user_data.xp += total_bonus
+        user_data.total_xp += total_bonus
+        user_data.daily_streak = new_streak
+        user_data.last_daily = datetime.utcnow().isoformat()
+        unlocked = self.unlock(user_data, ('daily_streak',))
+        self.save(user_data)
 
         embed = modern_embed(
             title="💰 Daily Bonus Claimed!",
@@ -489,8 +554,97 @@ class Leveling(commands.Cog):
             ctx=ctx
         )
         await ctx.send(embed=embed)
+        await self.announce_achievements(ctx.channel, user_data, unlocked)
+
+    @commands.hybrid_command(name="levelconfig", description="Set the server's XP rate and level curve.")
+    @commands.has_permissions(administrator=True)
+    async def levelconfig(self, ctx, xp_rate: float = None, step: int = None, exponent: float = None):
+        current_rate, curve = self.level_config(ctx.guild.id)
+        if xp_rate is None and step is None and exponent is None:
+            await ctx.send(embed=modern_embed(
+                title="⚙️ Level Settings",
+                description=f"**XP Rate:** {current_rate:g}x\n"
+                           f"**Level Curve:** {curve.step} × level^{curve.exponent:g} XP\n"
+                           f"**Level 10:** {curve.xp_for(10):,} XP | **Level 50:** {curve.xp_for(50):,} XP",
+                color=discord.Color.blurple(),
+                ctx=ctx
+            ))
+            return
+
+        xp_rate = current_rate if xp_rate is None else xp_rate
+        step = curve.step if step is None else step
+        exponent = curve.exponent if exponent is None else exponent
+        if not (0 < xp_rate <= 10 and 1 <= step <= 10000 and 1 <= exponent <= 4):
+            await ctx.send(embed=modern_embed(
+                title="❌ Invalid Settings",
+                description="XP rate must be above 0 and at most 10, step between 1 and 10000 and exponent between 1 and 4.",
+                color=discord.Color.red(),
+                ctx=ctx
+            ))
+            return
+
+        await self.bot.db.execute('''INSERT INTO guild_level_config (guild_id, xp_rate, curve_step, curve_exponent)
+                                     VALUES (?, ?, ?, ?)
+                                     ON CONFLICT(guild_id) DO UPDATE SET xp_rate = excluded.xp_rate,
+                                         curve_step = excluded.curve_step, curve_exponent = excluded.curve_exponent''',
+                                  (ctx.guild.id, xp_rate, step, exponent))
+        self.set_level_config(ctx.guild.id, xp_rate, step, exponent)
+
+        if (step, exponent) != (curve.step, curve.exponent):
+            # Existing members move to the new curve straight away
+            await self.recompute_levels(ctx)
+            return
+        await ctx.send(embed=modern_embed(
+            title="✅ Level Settings Updated",
+            description=f"Messages now earn **{xp_rate:g}x** XP.",
+            color=discord.Color.green(),
+            ctx=ctx
+        ))
+
+    @commands.hybrid_command(name="recomputelevels", description="Recalculate every member's level from their XP.")
+    @commands.has_permissions(administrator=True)
+    async def recomputelevels(self, ctx):
+        await self.recompute_levels(ctx)
+
+    async def recompute_levels(self, ctx):
+        curve = self.level_config(ctx.guild.id)[1]
+
+        def derive(xp, level, skill_points):
+            new_level = curve.levels(xp)
+            # A level gained or lost is a skill point gained or lost, down to zero
+            return new_level, np.maximum(skill_points + new_level - level, 0)
+
+        old_levels, new_levels = await self.bot.levels.recompute(ctx.guild.id, derive)
+        if not len(new_levels):
+            await ctx.send(embed=modern_embed(
+                title="❌ No Data",
+                description="No one has earned XP yet.",
+                color=discord.Color.red(),
+                ctx=ctx
+            ))
+            return
+
+        raised = int(np.count_nonzero(new_levels > old_levels))
+        lowered = int(np.count_nonzero(new_levels < old_levels))
+        bands = np.bincount(np.searchsorted(LEVEL_BANDS, new_levels, side='right') - 1, minlength=len(LEVEL_BANDS))
+        distribution = []
+        for index, count in enumerate(bands.tolist()):
+            low = LEVEL_BANDS[index]
+            label = f"{low}-{LEVEL_BANDS[index + 1] - 1}" if index + 1 < len(LEVEL_BANDS) else f"{low}+"
+            share = count / len(new_levels) * 100
+            distribution.append(f"`{label:>6}` {'█' * round(share / 5)} {count:,} ({share:.1f}%)")
+
+        embed = modern_embed(
+            title="🔄 Levels Recomputed",
+            description=f"**Members:** {len(new_levels):,}\n"
+                       f"**Levelled up:** {raised:,} | **Levelled down:** {lowered:,}\n"
+                       f"**Median Level:** {int(np.median(new_levels))} | **Highest:** {int(new_levels.max())}",
+            color=discord.Color.green(),
+            ctx=ctx
+        )
+        embed.add_field(name="📊 Level Distribution", value="\n".join(distribution), inline=False)
+        await ctx.send(embed=embed)
 
 async def setup(bot):
     cog = Leveling(bot)
-    await cog.init_database()
     await bot.add_cog(cog) 
\ No newline at end of file
@@ -2,7 +2,10 @@ import discord
 from discord.ext import commands, tasks
 from datetime import datetime, timedelta
 import re
+from collections import deque
 from bot import modern_embed
+from pipeline import ORDER_MODERATION
+from bounded import TTLMap
 
 class TimeoutModal(discord.ui.Modal, title="Timeout User"):
     time = discord.ui.TextInput(label="Duration (e.g. 10m, 2h, 7d)", placeholder="e.g. 10m", required=True)
@@ -63,35 +66,48 @@ class Moderation(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.automod_enabled = {}
-        self.last_messages = {}
+        # (guild_id, user_id) -> last five messages, forgotten after five quiet minutes
+        self.last_messages = bot.sweeper.track(TTLMap(ttl=300))
+
+    async def cog_load(self):
+        self.bot.pipeline.add_feature('antispam', self.load_antispam)
+        self.bot.pipeline.add_stage('antispam', self.antispam_stage, ORDER_MODERATION, feature='antispam')
+        self.bot.timers.register('tempban_unban', self.tempban_unban)
+
+    async def cog_unload(self):
+        self.bot.pipeline.remove_stage('antispam')
+        self.bot.pipeline.remove_feature('antispam')
+        self.bot.timers.unregister('tempban_unban')
+
+    async def load_antispam(self, guild_id):
+        return self.automod_enabled.get(guild_id, False)
 
     @commands.command(description="Enable anti-spam automod for this server.")
     @commands.has_permissions(administrator=True)
     async def automodenable(self, ctx):
         self.automod_enabled[ctx.guild.id] = True
+        self.bot.pipeline.invalidate(ctx.guild.id, 'antispam')
         await ctx.send(f"Automod enabled for this server! Spammers will be timed out for 7 days.")
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot or not message.guild:
-            return
+    async def antispam_stage(self, ctx):
+        message = ctx.message
         guild_id = message.guild.id
-        if not getattr(self, 'automod_enabled', {}).get(guild_id):
-            return
-        user_msgs = self.last_messages.setdefault(guild_id, {}).setdefault(message.author.id, [])
+        key = (guild_id, message.author.id)
+        user_msgs = self.last_messages.get(key)
+        if user_msgs is None:
+            user_msgs = deque(maxlen=5)
+        self.last_messages[key] = user_msgs
         user_msgs.append(message.content)
-        if len(user_msgs) > 5:
-            user_msgs.pop(0)
         if len(user_msgs) == 5:
             if all(m == user_msgs[0] for m in user_msgs):
                 await self.timeout_action(message, reason="Spam: repeated messages")
-                return
+                return True
             if all(re.fullmatch(r'\W+', m) for m in user_msgs):
                 await self.timeout_action(message, reason="Spam: repeated emojis")
-                return
+                return True
             if all(self.bot.user in m.mentions if hasattr(m, 'mentions') else False for m in user_msgs):
                 await self.timeout_action(message, reason="Spam: repeated bot tags")
-                return
+                return True
 
     async def timeout_action(self, message, reason):
         try:
@@ -245,10 +261,22 @@ class Moderation(commands.Cog):
                 color=discord.Color.orange(),
                 ctx=ctx
             ))
-            # In a real bot, schedule unban after duration
+            await self.bot.timers.schedule('tempban_unban', datetime.utcnow() + timedelta(seconds=seconds),
+                                           {'guild_id': ctx.guild.id, 'user_id': member.id})
         except Exception as e:
             await ctx.send(embed=modern_embed(title="❌ Error", description=f"Failed to tempban {member.mention}: {e}", color=discord.Color.red(), ctx=ctx))
 
+    async def tempban_unban(self, payload):
+        """Timer handler: lift a tempban once it expires"""
+        guild = self.bot.get_guild(payload['guild_id'])
+        if not guild:
+            # Raised so the timer is kept and retried rather than dropped
+            raise LookupError(f"Guild {payload['guild_id']} is not cached")
+        try:
+            await guild.unban(discord.Object(id=payload['user_id']), reason="Tempban expired")
+        except discord.NotFound:
+            pass
+
     @commands.hybrid_command(name="softban", description="Softban a user (ban then unban to delete messages).")
     @commands.has_permissions(ban_members=True)
     async def softban(self, ctx, member: discord.Member, *, reason: str = "No reason provided"):
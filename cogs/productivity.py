@@ -1,11 +1,43 @@
 import discord
 from discord.ext import commands
 from bot import modern_embed
-import aiosqlite
 import asyncio
 import json
 from datetime import datetime, timedelta
 import re
+import migrations
+
+migrations.register('productivity', [
+    '''CREATE TABLE IF NOT EXISTS reminders
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER, guild_id INTEGER, message TEXT,
+        reminder_time TEXT, created_at TEXT, channel_id INTEGER)''',
+    '''CREATE TABLE IF NOT EXISTS tasks
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER, guild_id INTEGER, title TEXT,
+        description TEXT, due_date TEXT, priority TEXT,
+        completed BOOLEAN DEFAULT FALSE, created_at TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS notes
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER, guild_id INTEGER, title TEXT,
+        content TEXT, created_at TEXT, updated_at TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS productivity_stats
+       (user_id INTEGER PRIMARY KEY, guild_id INTEGER,
+        tasks_completed INTEGER DEFAULT 0, reminders_set INTEGER DEFAULT 0,
+        notes_created INTEGER DEFAULT 0, total_time_saved INTEGER DEFAULT 0)''',
+], [
+    '''CREATE INDEX IF NOT EXISTS idx_reminders_time ON reminders (reminder_time)''',
+    '''CREATE INDEX IF NOT EXISTS idx_reminders_user_time ON reminders (user_id, guild_id, reminder_time)''',
+    '''CREATE INDEX IF NOT EXISTS idx_tasks_user ON tasks (user_id, guild_id)''',
+    '''CREATE INDEX IF NOT EXISTS idx_notes_user_updated ON notes (user_id, guild_id, updated_at)''',
+], [
+    # Reminders pending from before the timer service are handed over to it
+    '''INSERT INTO timers (kind, due, payload, created_at)
+       SELECT 'reminder', CAST(strftime('%s', reminder_time) AS REAL),
+              '{"reminder_id": ' || id || '}', created_at
+       FROM reminders WHERE reminder_time > strftime('%Y-%m-%dT%H:%M:%S', 'now')''',
+])
+
 
 class Productivity(commands.Cog):
     def __init__(self, bot):
@@ -13,30 +45,11 @@ class Productivity(commands.Cog):
         self.reminders = {}
         self.tasks = {}
 
-    async def init_database(self):
-        async with aiosqlite.connect('database.db') as db:
-            await db.execute('''CREATE TABLE IF NOT EXISTS reminders 
-                               (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                user_id INTEGER, guild_id INTEGER, message TEXT,
-                                reminder_time TEXT, created_at TEXT, channel_id INTEGER)''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS tasks 
-                               (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                user_id INTEGER, guild_id INTEGER, title TEXT,
-                                description TEXT, due_date TEXT, priority TEXT,
-                                completed BOOLEAN DEFAULT FALSE, created_at TEXT)''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS notes 
-                               (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                user_id INTEGER, guild_id INTEGER, title TEXT,
-                                content TEXT, created_at TEXT, updated_at TEXT)''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS productivity_stats 
-                               (user_id INTEGER PRIMARY KEY, guild_id INTEGER,
-                                tasks_completed INTEGER DEFAULT 0, reminders_set INTEGER DEFAULT 0,
-                                notes_created INTEGER DEFAULT 0, total_time_saved INTEGER DEFAULT 0)''')
-            await db.commit()
-
     async def cog_load(self):
-        """Async initialization when cog loads"""
-        await self.init_database()
+        self.bot.timers.register('reminder', self.send_reminder)
+
+    async def cog_unload(self):
+        self.bot.timers.unregister('reminder')
 
     @commands.command(name="remind", description="Set a reminder.")
     async def set_reminder(self, ctx, time: str, *, message: str):
@@ -53,13 +66,13 @@ class Productivity(commands.Cog):
             return
         
         # Store reminder
-        async with aiosqlite.connect('database.db') as db:
-            await db.execute('''INSERT INTO reminders 
+        async with self.bot.db.write() as db:
+            cursor = await db.execute('''INSERT INTO reminders 
                                (user_id, guild_id, message, reminder_time, created_at, channel_id)
                                VALUES (?, ?, ?, ?, ?, ?)''',
                            (ctx.author.id, ctx.guild.id, message, reminder_time.isoformat(),
                             datetime.utcnow().isoformat(), ctx.channel.id))
-            await db.commit()
+            reminder_id = cursor.lastrowid
         
         await ctx.send(embed=modern_embed(
             title="⏰ Reminder Set",
@@ -71,7 +84,7 @@ class Productivity(commands.Cog):
         ))
         
         # Schedule reminder
-        await self.schedule_reminder(ctx.author.id, ctx.guild.id, ctx.channel.id, message, reminder_time)
+        await self.bot.timers.schedule('reminder', reminder_time, {'reminder_id': reminder_id})
 
     async def parse_time(self, time_str: str) -> datetime:
         """Parse time string into datetime"""
@@ -111,27 +124,29 @@ class Productivity(commands.Cog):
         except:
             return None
 
-    async def schedule_reminder(self, user_id: int, guild_id: int, channel_id: int, message: str, reminder_time: datetime):
-        """Schedule a reminder"""
-        delay = (reminder_time - datetime.utcnow()).total_seconds()
-        
-        if delay > 0:
-            await asyncio.sleep(delay)
-            
-            # Send reminder
-            channel = self.bot.get_channel(channel_id)
-            if channel:
-                user = self.bot.get_user(user_id)
-                await channel.send(embed=modern_embed(
-                    title="⏰ Reminder",
-                    description=f"{user.mention}\n\n**{message}**",
-                    color=discord.Color.blue(),
-                    ctx=None
-                ))
+    async def send_reminder(self, payload):
+        """Timer handler: deliver a reminder when it comes due"""
+        row = await self.bot.db.fetchone('SELECT user_id, channel_id, message FROM reminders WHERE id = ?',
+                                         (payload['reminder_id'],))
+        if not row:
+            return
+        user_id, channel_id, message = row
+        
+        # Send reminder
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            # Raised so the timer is kept and retried rather than dropped
+            raise LookupError(f"Channel {channel_id} is not cached")
+        await channel.send(embed=modern_embed(
+            title="⏰ Reminder",
+            description=f"<@{user_id}>\n\n**{message}**",
+            color=discord.Color.blue(),
+            ctx=None
+        ))
 
     @commands.command(name="reminders", description="List your active reminders.")
     async def list_reminders(self, ctx):
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('''SELECT message, reminder_time, created_at
                                    FROM reminders WHERE user_id = ? AND guild_id = ?
                                    AND reminder_time > ? ORDER BY reminder_time''',
@@ -192,14 +207,13 @@ class Productivity(commands.Cog):
                 return
         
         # Store task
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''INSERT INTO tasks 
                                (user_id, guild_id, title, description, due_date, priority, created_at)
                                VALUES (?, ?, ?, ?, ?, ?, ?)''',
                            (ctx.author.id, ctx.guild.id, title, description,
                             due_datetime.isoformat() if due_datetime else None,
                             priority, datetime.utcnow().isoformat()))
-            await db.commit()
         
         embed = modern_embed(
             title="✅ Task Created",
@@ -237,7 +251,7 @@ class Productivity(commands.Cog):
         if filter_type == "overdue":
             params.append(datetime.utcnow().isoformat())
         
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             query = f'''SELECT title, description, due_date, priority, completed, created_at
                        FROM tasks WHERE user_id = ? AND guild_id = ? {condition}
                        ORDER BY due_date ASC, priority DESC'''
@@ -285,25 +299,26 @@ class Productivity(commands.Cog):
 
     @commands.command(name="complete", description="Mark a task as complete.")
     async def complete_task(self, ctx, task_id: int):
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             async with db.execute('''SELECT title FROM tasks 
                                    WHERE id = ? AND user_id = ? AND guild_id = ?''',
                                 (task_id, ctx.author.id, ctx.guild.id)) as cursor:
                 task = await cursor.fetchone()
             
-            if not task:
-                await ctx.send(embed=modern_embed(
-                    title="❌ Task Not Found",
-                    description="Task not found or you don't have permission to complete it.",
-                    color=discord.Color.red(),
-                    ctx=ctx
-                ))
-                return
-            
-            await db.execute('''UPDATE tasks SET completed = TRUE
-                               WHERE id = ? AND user_id = ? AND guild_id = ?''',
-                           (task_id, ctx.author.id, ctx.guild.id))
-            await db.commit()
+            if task:
+                await db.execute('''UPDATE tasks SET completed = TRUE
+                                   WHERE id = ? AND user_id = ? AND guild_id = ?''',
+                               (task_id, ctx.author.id, ctx.guild.id))
+        
+        # Replies go out once the write lock is released
+        if not task:
+            await ctx.send(embed=modern_embed(
+                title="❌ Task Not Found",
+                description="Task not found or you don't have permission to complete it.",
+                color=discord.Color.red(),
+                ctx=ctx
+            ))
+            return
         
         await ctx.send(embed=modern_embed(
             title="✅ Task Completed",
@@ -314,13 +329,12 @@ class Productivity(commands.Cog):
 
     @commands.command(name="note", description="Create a note.")
     async def create_note(self, ctx, title: str, *, content: str):
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''INSERT INTO notes 
                                (user_id, guild_id, title, content, created_at, updated_at)
                                VALUES (?, ?, ?, ?, ?, ?)''',
                            (ctx.author.id, ctx.guild.id, title, content,
                             datetime.utcnow().isoformat(), datetime.utcnow().isoformat()))
-            await db.commit()
         
         await ctx.send(embed=modern_embed(
             title="📝 Note Created",
@@ -331,7 +345,7 @@ class Productivity(commands.Cog):
 
     @commands.command(name="notes", description="List your notes.")
     async def list_notes(self, ctx):
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('''SELECT title, content, created_at, updated_at
                                    FROM notes WHERE user_id = ? AND guild_id = ?
                                    ORDER BY updated_at DESC''',
@@ -462,7 +476,7 @@ class Productivity(commands.Cog):
         if not user:
             user = ctx.author
         
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('''SELECT tasks_completed, reminders_set, notes_created, total_time_saved
                                    FROM productivity_stats WHERE user_id = ? AND guild_id = ?''',
                                 (user.id, ctx.guild.id)) as cursor:
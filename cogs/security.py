@@ -1,12 +1,41 @@
 import discord
 from discord.ext import commands
 from bot import modern_embed
-import aiosqlite
 import hashlib
 import secrets
 import json
 from datetime import datetime, timedelta
 import asyncio
+import migrations
+from pipeline import ORDER_SECURITY
+
+migrations.register('security', [
+    '''CREATE TABLE IF NOT EXISTS security_2fa
+       (user_id INTEGER PRIMARY KEY, guild_id INTEGER,
+        secret_key TEXT, enabled BOOLEAN DEFAULT FALSE,
+        backup_codes TEXT, created_at TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS audit_logs
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER, user_id INTEGER, action TEXT,
+        target_id INTEGER, details TEXT, timestamp TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS security_settings
+       (guild_id INTEGER PRIMARY KEY,
+        raid_protection BOOLEAN DEFAULT TRUE,
+        spam_protection BOOLEAN DEFAULT TRUE,
+        link_protection BOOLEAN DEFAULT FALSE,
+        invite_protection BOOLEAN DEFAULT TRUE,
+        whitelist_enabled BOOLEAN DEFAULT FALSE,
+        whitelist_users TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS security_incidents
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER, incident_type TEXT,
+        user_id INTEGER, details TEXT, resolved BOOLEAN DEFAULT FALSE,
+        created_at TEXT, resolved_at TEXT)''',
+], [
+    '''CREATE INDEX IF NOT EXISTS idx_audit_logs_guild_time ON audit_logs (guild_id, timestamp)''',
+    '''CREATE INDEX IF NOT EXISTS idx_security_incidents_guild_time ON security_incidents (guild_id, created_at)''',
+])
+
 
 class Security(commands.Cog):
     def __init__(self, bot):
@@ -14,30 +43,13 @@ class Security(commands.Cog):
         self.security_sessions = {}
         self.audit_logs = []
 
-    async def init_database(self):
-        async with aiosqlite.connect('database.db') as db:
-            await db.execute('''CREATE TABLE IF NOT EXISTS security_2fa 
-                               (user_id INTEGER PRIMARY KEY, guild_id INTEGER,
-                                secret_key TEXT, enabled BOOLEAN DEFAULT FALSE,
-                                backup_codes TEXT, created_at TEXT)''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS audit_logs 
-                               (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                guild_id INTEGER, user_id INTEGER, action TEXT,
-                                target_id INTEGER, details TEXT, timestamp TEXT)''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS security_settings 
-                               (guild_id INTEGER PRIMARY KEY, 
-                                raid_protection BOOLEAN DEFAULT TRUE,
-                                spam_protection BOOLEAN DEFAULT TRUE,
-                                link_protection BOOLEAN DEFAULT FALSE,
-                                invite_protection BOOLEAN DEFAULT TRUE,
-                                whitelist_enabled BOOLEAN DEFAULT FALSE,
-                                whitelist_users TEXT)''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS security_incidents 
-                               (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                guild_id INTEGER, incident_type TEXT,
-                                user_id INTEGER, details TEXT, resolved BOOLEAN DEFAULT FALSE,
-                                created_at TEXT, resolved_at TEXT)''')
-            await db.commit()
+    async def cog_load(self):
+        self.bot.pipeline.add_feature('security', self.load_message_settings)
+        self.bot.pipeline.add_stage('security', self.message_stage, ORDER_SECURITY, feature='security')
+
+    async def cog_unload(self):
+        self.bot.pipeline.remove_stage('security')
+        self.bot.pipeline.remove_feature('security')
 
     @commands.hybrid_command(name="2fa", description="Set up two-factor authentication.")
     async def setup_2fa(self, ctx):
@@ -46,13 +58,12 @@ class Security(commands.Cog):
         backup_codes = [secrets.token_hex(4) for _ in range(5)]
         
         # Store 2FA data
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''INSERT OR REPLACE INTO security_2fa 
                                (user_id, guild_id, secret_key, backup_codes, created_at)
                                VALUES (?, ?, ?, ?, ?)''',
                            (ctx.author.id, ctx.guild.id, secret_key, json.dumps(backup_codes),
                             datetime.utcnow().isoformat()))
-            await db.commit()
         
         embed = modern_embed(
             title="🔐 2FA Setup",
@@ -67,11 +78,10 @@ class Security(commands.Cog):
 
     @commands.hybrid_command(name="2fa_enable", description="Enable two-factor authentication.")
     async def enable_2fa(self, ctx):
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''UPDATE security_2fa SET enabled = TRUE
                                WHERE user_id = ? AND guild_id = ?''',
                            (ctx.author.id, ctx.guild.id))
-            await db.commit()
         
         await ctx.send(embed=modern_embed(
             title="✅ 2FA Enabled",
@@ -82,11 +92,10 @@ class Security(commands.Cog):
 
     @commands.hybrid_command(name="2fa_disable", description="Disable two-factor authentication.")
     async def disable_2fa(self, ctx):
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''UPDATE security_2fa SET enabled = FALSE
                                WHERE user_id = ? AND guild_id = ?''',
                            (ctx.author.id, ctx.guild.id))
-            await db.commit()
         
         await ctx.send(embed=modern_embed(
             title="❌ 2FA Disabled",
@@ -120,11 +129,11 @@ class Security(commands.Cog):
         
         bool_value = value.lower() in ["true", "yes", "on", "1"]
         
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''INSERT OR REPLACE INTO security_settings 
                                (guild_id, {}) VALUES (?, ?)'''.format(setting),
                            (ctx.guild.id, bool_value))
-            await db.commit()
+        self.bot.pipeline.invalidate(ctx.guild.id, 'security')
         
         await ctx.send(embed=modern_embed(
             title="✅ Security Updated",
@@ -135,7 +144,7 @@ class Security(commands.Cog):
 
     @commands.hybrid_command(name="security_status", description="View current security settings.")
     async def security_status(self, ctx):
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('''SELECT raid_protection, spam_protection, link_protection,
                                    invite_protection, whitelist_enabled
                                    FROM security_settings WHERE guild_id = ?''',
@@ -177,7 +186,7 @@ class Security(commands.Cog):
             ))
             return
         
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('''SELECT user_id, action, target_id, details, timestamp
                                    FROM audit_logs WHERE guild_id = ?
                                    ORDER BY timestamp DESC LIMIT ?''',
@@ -228,7 +237,8 @@ class Security(commands.Cog):
             ))
             return
         
-        async with aiosqlite.connect('database.db') as db:
+        embed = None
+        async with self.bot.db.write() as db:
             if action == "add":
                 # Get current whitelist
                 async with db.execute('''SELECT whitelist_users FROM security_settings 
@@ -243,21 +253,21 @@ class Security(commands.Cog):
                                        (guild_id, whitelist_enabled, whitelist_users)
                                        VALUES (?, TRUE, ?)''',
                                    (ctx.guild.id, json.dumps(current_whitelist)))
-                    await db.commit()
+                    self.bot.pipeline.invalidate(ctx.guild.id, 'security')
                     
-                    await ctx.send(embed=modern_embed(
+                    embed = modern_embed(
                         title="✅ User Whitelisted",
                         description=f"{user.mention} has been added to the security whitelist.",
                         color=discord.Color.green(),
                         ctx=ctx
-                    ))
+                    )
                 else:
-                    await ctx.send(embed=modern_embed(
+                    embed = modern_embed(
                         title="❌ Already Whitelisted",
                         description=f"{user.mention} is already on the whitelist.",
                         color=discord.Color.red(),
                         ctx=ctx
-                    ))
+                    )
             
             elif action == "remove":
                 # Get current whitelist
@@ -273,21 +283,25 @@ class Security(commands.Cog):
                                        (guild_id, whitelist_enabled, whitelist_users)
                                        VALUES (?, TRUE, ?)''',
                                    (ctx.guild.id, json.dumps(current_whitelist)))
-                    await db.commit()
+                    self.bot.pipeline.invalidate(ctx.guild.id, 'security')
                     
-                    await ctx.send(embed=modern_embed(
+                    embed = modern_embed(
                         title="❌ User Removed",
                         description=f"{user.mention} has been removed from the security whitelist.",
                         color=discord.Color.red(),
                         ctx=ctx
-                    ))
+                    )
                 else:
-                    await ctx.send(embed=modern_embed(
+                    embed = modern_embed(
                         title="❌ Not Whitelisted",
                         description=f"{user.mention} is not on the whitelist.",
                         color=discord.Color.red(),
                         ctx=ctx
-                    ))
+                    )
+        
+        # Sent once the write lock is released
+        if embed:
+            await ctx.send(embed=embed)
 
     @commands.hybrid_command(name="incidents", description="View security incidents.")
     async def view_incidents(self, ctx):
@@ -300,7 +314,7 @@ class Security(commands.Cog):
             ))
             return
         
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('''SELECT incident_type, user_id, details, resolved, created_at
                                    FROM security_incidents WHERE guild_id = ?
                                    ORDER BY created_at DESC LIMIT 10''',
@@ -340,52 +354,52 @@ class Security(commands.Cog):
         await ctx.send(embed=embed)
 
     async def log_audit_event(self, guild_id: int, user_id: int, action: str, target_id: int = None, details: str = None):
-        """Log an audit event"""
-        async with aiosqlite.connect('database.db') as db:
-            await db.execute('''INSERT INTO audit_logs 
-                               (guild_id, user_id, action, target_id, details, timestamp)
-                               VALUES (?, ?, ?, ?, ?, ?)''',
-                           (guild_id, user_id, action, target_id, details,
-                            datetime.utcnow().isoformat()))
-            await db.commit()
+        """Log an audit event (queued, committed with the next batch)"""
+        self.bot.db.defer('''INSERT INTO audit_logs 
+                            (guild_id, user_id, action, target_id, details, timestamp)
+                            VALUES (?, ?, ?, ?, ?, ?)''',
+                          (guild_id, user_id, action, target_id, details,
+                           datetime.utcnow().isoformat()))
 
     async def create_incident(self, guild_id: int, incident_type: str, user_id: int, details: str):
         """Create a security incident"""
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''INSERT INTO security_incidents 
                                (guild_id, incident_type, user_id, details, created_at)
                                VALUES (?, ?, ?, ?, ?)''',
                            (guild_id, incident_type, user_id, details,
                             datetime.utcnow().isoformat()))
-            await db.commit()
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot:
-            return
-        
-        # Check security settings
-        async with aiosqlite.connect('database.db') as db:
-            async with db.execute('''SELECT raid_protection, spam_protection, link_protection,
-                                   invite_protection, whitelist_enabled, whitelist_users
+    async def load_message_settings(self, guild_id):
+        """Pipeline feature: link/invite protection settings, only when one is enabled"""
+        async with self.bot.db.read() as db:
+            async with db.execute('''SELECT link_protection, invite_protection, whitelist_enabled, whitelist_users
                                    FROM security_settings WHERE guild_id = ?''',
-                                (message.guild.id,)) as cursor:
+                                (guild_id,)) as cursor:
                 settings = await cursor.fetchone()
         
-        if not settings:
-            return
+        if not settings or not (settings[0] or settings[1]):
+            return None
         
-        raid_prot, spam_prot, link_prot, invite_prot, whitelist_enabled, whitelist_users = settings
+        link_prot, invite_prot, whitelist_enabled, whitelist_users = settings
+        return {
+            'link_protection': bool(link_prot),
+            'invite_protection': bool(invite_prot),
+            'whitelist': set(json.loads(whitelist_users)) if whitelist_enabled and whitelist_users else set()
+        }
+
+    async def message_stage(self, ctx):
+        message = ctx.message
+        settings = ctx.features['security']
         
         # Check if user is whitelisted
-        if whitelist_enabled and whitelist_users:
-            whitelist = json.loads(whitelist_users)
-            if message.author.id in whitelist:
-                return
+        if message.author.id in settings['whitelist']:
+            return
         
         # Link protection
-        if link_prot and any(domain in message.content.lower() for domain in ['http://', 'https://', 'discord.gg']):
+        if settings['link_protection'] and (ctx.urls or ctx.invite_codes):
             await message.delete()
+            ctx.deleted = True
             await self.log_audit_event(message.guild.id, message.author.id, "LINK_BLOCKED", None, message.content)
             await message.channel.send(embed=modern_embed(
                 title="🚫 Link Blocked",
@@ -393,10 +407,12 @@ class Security(commands.Cog):
                 color=discord.Color.red(),
                 ctx=None
             ))
+            return True
         
         # Invite protection
-        if invite_prot and 'discord.gg' in message.content.lower():
+        if settings['invite_protection'] and ctx.invite_codes:
             await message.delete()
+            ctx.deleted = True
             await self.log_audit_event(message.guild.id, message.author.id, "INVITE_BLOCKED", None, message.content)
             await message.channel.send(embed=modern_embed(
                 title="🚫 Invite Blocked",
@@ -404,8 +420,8 @@ class Security(commands.Cog):
                 color=discord.Color.red(),
                 ctx=None
             ))
+            return True
 
 async def setup(bot):
     cog = Security(bot)
-    await cog.init_database()
     await bot.add_cog(cog) 
\ No newline at end of file
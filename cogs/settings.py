@@ -67,6 +67,15 @@ class WelcomeModal(ui.Modal, title="Welcome Message Setup"):
     channel = ui.TextInput(label="Channel ID", placeholder="123456789012345678", required=True)
 
     async def on_submit(self, interaction: discord.Interaction):
+        if not self.channel.value.isdigit():
+            await interaction.response.send_message(embed=modern_embed(
+                title="❌ Invalid Channel",
+                description="Channel ID must be a number.",
+                color=discord.Color.red(),
+                ctx=interaction
+            ), ephemeral=True)
+            return
+        await interaction.client.settings.set(interaction.guild.id, welcome_channel=int(self.channel.value))
         await interaction.response.send_message(embed=modern_embed(
             title="✅ Welcome Setup",
             description=f"Welcome message configured!\nChannel: <#{self.channel.value}>\nMessage: {self.message.value}",
@@ -109,6 +118,7 @@ class Settings(commands.Cog):
             ))
             return
         # Save prefix to database
+        await self.bot.prefixes.set_guild_prefix(ctx.guild.id, new_prefix)
         await ctx.send(embed=modern_embed(
             title="✅ Prefix Updated",
             description=f"Server prefix set to `{new_prefix}`",
@@ -1,33 +1,38 @@
 import discord
 from discord.ext import commands
 from bot import modern_embed
-import aiosqlite
 import random
 import json
 from datetime import datetime, timedelta
+import migrations
+from bounded import TTLMap
+
+migrations.register('social', [
+    '''CREATE TABLE IF NOT EXISTS user_profiles
+       (user_id INTEGER PRIMARY KEY, guild_id INTEGER,
+        bio TEXT, age INTEGER, location TEXT, interests TEXT,
+        relationship_status TEXT, partner_id INTEGER,
+        reputation INTEGER DEFAULT 0, created_at TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS friendships
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user1_id INTEGER, user2_id INTEGER, guild_id INTEGER,
+        status TEXT, created_at TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS social_actions
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER, target_id INTEGER, guild_id INTEGER,
+        action TEXT, timestamp TEXT)''',
+], [
+    '''CREATE INDEX IF NOT EXISTS idx_friendships_user1 ON friendships (user1_id, guild_id)''',
+    '''CREATE INDEX IF NOT EXISTS idx_friendships_user2 ON friendships (user2_id, guild_id)''',
+])
+
 
 class Social(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.marriage_requests = {}
-        self.friendships = {}
-
-    async def init_database(self):
-        async with aiosqlite.connect('database.db') as db:
-            await db.execute('''CREATE TABLE IF NOT EXISTS user_profiles 
-                               (user_id INTEGER PRIMARY KEY, guild_id INTEGER,
-                                bio TEXT, age INTEGER, location TEXT, interests TEXT,
-                                relationship_status TEXT, partner_id INTEGER,
-                                reputation INTEGER DEFAULT 0, created_at TEXT)''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS friendships 
-                               (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                user1_id INTEGER, user2_id INTEGER, guild_id INTEGER,
-                                status TEXT, created_at TEXT)''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS social_actions 
-                               (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                user_id INTEGER, target_id INTEGER, guild_id INTEGER,
-                                action TEXT, timestamp TEXT)''')
-            await db.commit()
+        # Pending proposals and friend requests by message id; unanswered ones lapse after a day
+        self.marriage_requests = bot.sweeper.track(TTLMap(ttl=86400))
+        self.friendships = bot.sweeper.track(TTLMap(ttl=86400))
 
     @commands.hybrid_command(name="profile", description="View or edit your profile.")
     async def profile(self, ctx, user: discord.Member = None, action: str = "view", *, content: str = None):
@@ -55,7 +60,7 @@ class Social(commands.Cog):
             ))
 
     async def view_profile(self, ctx, user):
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('''SELECT bio, age, location, interests, relationship_status,
                                    partner_id, reputation, created_at
                                    FROM user_profiles WHERE user_id = ? AND guild_id = ?''',
@@ -130,12 +135,11 @@ class Social(commands.Cog):
             return
         
         # Simple bio editing for now
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''INSERT OR REPLACE INTO user_profiles 
                                (user_id, guild_id, bio, created_at)
                                VALUES (?, ?, ?, ?)''',
                            (ctx.author.id, ctx.guild.id, content, datetime.utcnow().isoformat()))
-            await db.commit()
         
         await ctx.send(embed=modern_embed(
             title="✅ Profile Updated",
@@ -165,7 +169,7 @@ class Social(commands.Cog):
             return
         
         # Check if already married
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('''SELECT relationship_status, partner_id 
                                    FROM user_profiles 
                                    WHERE user_id = ? AND guild_id = ?''',
@@ -206,15 +210,14 @@ class Social(commands.Cog):
         if user.bot:
             return
         
-        if reaction.message.id in self.marriage_requests:
-            request = self.marriage_requests[reaction.message.id]
-            
+        request = self.marriage_requests.get(reaction.message.id)
+        if request:
             if user.id != request['target']:
                 return
             
             if str(reaction.emoji) == "💍":
                 # Accept marriage
-                async with aiosqlite.connect('database.db') as db:
+                async with self.bot.db.write() as db:
                     # Update both profiles
                     await db.execute('''INSERT OR REPLACE INTO user_profiles 
                                        (user_id, guild_id, relationship_status, partner_id, created_at)
@@ -228,7 +231,6 @@ class Social(commands.Cog):
                                    (request['target'], request['guild_id'], request['proposer'],
                                     datetime.utcnow().isoformat()))
                     
-                    await db.commit()
                 
                 embed = modern_embed(
                     title="💒 Marriage Accepted!",
@@ -251,42 +253,43 @@ class Social(commands.Cog):
                 await reaction.message.edit(embed=embed)
                 await reaction.message.clear_reactions()
             
-            del self.marriage_requests[reaction.message.id]
+            self.marriage_requests.pop(reaction.message.id)
 
     @commands.hybrid_command(name="divorce", description="Divorce your partner.")
     async def divorce(self, ctx):
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             async with db.execute('''SELECT partner_id FROM user_profiles 
                                    WHERE user_id = ? AND guild_id = ? AND relationship_status = 'Married' ''',
                                 (ctx.author.id, ctx.guild.id)) as cursor:
                 profile = await cursor.fetchone()
             
-            if not profile:
-                await ctx.send(embed=modern_embed(
-                    title="❌ Not Married",
-                    description="You are not currently married.",
-                    color=discord.Color.red(),
-                    ctx=ctx
-                ))
-                return
-            
-            partner_id = profile[0]
-            partner = ctx.guild.get_member(partner_id)
-            
-            # Process divorce
-            await db.execute('''UPDATE user_profiles SET relationship_status = 'Single', partner_id = NULL
-                               WHERE user_id = ? AND guild_id = ?''', (ctx.author.id, ctx.guild.id))
-            await db.execute('''UPDATE user_profiles SET relationship_status = 'Single', partner_id = NULL
-                               WHERE user_id = ? AND guild_id = ?''', (partner_id, ctx.guild.id))
-            await db.commit()
+            if profile:
+                partner_id = profile[0]
+                partner = ctx.guild.get_member(partner_id)
             
-            embed = modern_embed(
-                title="💔 Divorce Finalized",
-                description=f"{ctx.author.mention} and {partner.mention if partner else 'Unknown'} are now divorced.",
+                # Process divorce
+                await db.execute('''UPDATE user_profiles SET relationship_status = 'Single', partner_id = NULL
+                                   WHERE user_id = ? AND guild_id = ?''', (ctx.author.id, ctx.guild.id))
+                await db.execute('''UPDATE user_profiles SET relationship_status = 'Single', partner_id = NULL
+                                   WHERE user_id = ? AND guild_id = ?''', (partner_id, ctx.guild.id))
+        
+        # Replies go out once the write lock is released
+        if not profile:
+            await ctx.send(embed=modern_embed(
+                title="❌ Not Married",
+                description="You are not currently married.",
                 color=discord.Color.red(),
                 ctx=ctx
-            )
-            await ctx.send(embed=embed)
+            ))
+            return
+        
+        embed = modern_embed(
+            title="💔 Divorce Finalized",
+            description=f"{ctx.author.mention} and {partner.mention if partner else 'Unknown'} are now divorced.",
+            color=discord.Color.red(),
+            ctx=ctx
+        )
+        await ctx.send(embed=embed)
 
     @commands.hybrid_command(name="friend", description="Send a friend request.")
     async def friend_request(self, ctx, user: discord.Member):
@@ -309,7 +312,7 @@ class Social(commands.Cog):
             return
         
         # Check if already friends
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('''SELECT status FROM friendships 
                                    WHERE ((user1_id = ? AND user2_id = ?) OR (user1_id = ? AND user2_id = ?))
                                    AND guild_id = ?''',
@@ -347,7 +350,7 @@ class Social(commands.Cog):
 
     @commands.hybrid_command(name="friends", description="List your friends.")
     async def list_friends(self, ctx):
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('''SELECT user1_id, user2_id FROM friendships 
                                    WHERE (user1_id = ? OR user2_id = ?) AND guild_id = ? AND status = 'accepted' ''',
                                 (ctx.author.id, ctx.author.id, ctx.guild.id)) as cursor:
@@ -459,5 +462,4 @@ class Social(commands.Cog):
 
 async def setup(bot):
     cog = Social(bot)
-    await cog.init_database()
     await bot.add_cog(cog) 
\ No newline at end of file
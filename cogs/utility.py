@@ -3,9 +3,10 @@ from discord.ext import commands
 from datetime import datetime
 import json
 import os
-import aiosqlite
 from discord import ui
 from bot import modern_embed
+from pipeline import ORDER_AFK
+from bounded import TTLMap
 
 OWNER_ID = 1201050377911554061
 
@@ -26,7 +27,13 @@ def is_owner(ctx):
 class Utility(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.afk_status = {}  # user_id: (message, timestamp)
+        self.afk_status = bot.sweeper.track(TTLMap(ttl=7 * 86400))  # user_id: (message, timestamp)
+
+    async def cog_load(self):
+        self.bot.pipeline.add_stage('afk', self.afk_stage, ORDER_AFK)
+
+    async def cog_unload(self):
+        self.bot.pipeline.remove_stage('afk')
 
     @commands.command(description="Check the bot's latency.")
     @commands.check(is_owner)
@@ -94,13 +101,12 @@ class Utility(commands.Cog):
         )
         await ctx.send(embed=embed)
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot:
+    async def afk_stage(self, ctx):
+        if not self.afk_status:
             return
+        message = ctx.message
         # Clear AFK if user sends a message
-        if message.author.id in self.afk_status:
-            del self.afk_status[message.author.id]
+        if self.afk_status.pop(message.author.id) is not None:
             embed = modern_embed(
                 title="AFK Removed",
                 description="Welcome back! Your AFK status has been cleared.",
@@ -111,8 +117,9 @@ class Utility(commands.Cog):
             await message.channel.send(embed=embed)
         # Notify if mentioned user is AFK
         for user in message.mentions:
-            if user.id in self.afk_status:
-                afk_msg, since = self.afk_status[user.id]
+            status = self.afk_status.get(user.id)
+            if status:
+                afk_msg, since = status
                 embed = modern_embed(
                     title=f"{user.display_name} is AFK",
                     description=afk_msg,
@@ -121,8 +128,6 @@ class Utility(commands.Cog):
                     emoji="🚧"
                 )
                 await message.channel.send(embed=embed)
-        # Don't break other listeners
-        # await self.bot.process_commands(message)  # Removed to prevent double replies
 
     @commands.command(name="poll", description="Create a poll.")
     async def poll(self, ctx, *, question: str):
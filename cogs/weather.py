@@ -1,29 +1,27 @@
 import discord
 from discord.ext import commands
 from bot import modern_embed
-import aiosqlite
 import random
 from datetime import datetime
+import migrations
+
+migrations.register('weather', [
+    '''CREATE TABLE IF NOT EXISTS weather_favorites
+       (user_id INTEGER, guild_id INTEGER, city TEXT,
+        PRIMARY KEY (user_id, guild_id))''',
+    '''CREATE TABLE IF NOT EXISTS weather_alerts
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER, guild_id INTEGER, city TEXT,
+        alert_type TEXT, threshold TEXT, created_at TEXT)''',
+], [
+    '''CREATE INDEX IF NOT EXISTS idx_weather_alerts_user ON weather_alerts (user_id, guild_id, created_at)''',
+])
+
 
 class Weather(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
-    async def init_database(self):
-        async with aiosqlite.connect('database.db') as db:
-            await db.execute('''CREATE TABLE IF NOT EXISTS weather_favorites 
-                               (user_id INTEGER, guild_id INTEGER, city TEXT,
-                                PRIMARY KEY (user_id, guild_id))''')
-            await db.execute('''CREATE TABLE IF NOT EXISTS weather_alerts 
-                               (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                user_id INTEGER, guild_id INTEGER, city TEXT,
-                                alert_type TEXT, threshold TEXT, created_at TEXT)''')
-            await db.commit()
-
-    async def cog_load(self):
-        """Async initialization when cog loads"""
-        await self.init_database()
-
     async def get_weather_data(self, city: str):
         """Simulate weather data (in real implementation, connect to weather API)"""
         # Simulate weather data
@@ -145,12 +143,11 @@ class Weather(commands.Cog):
     @commands.command(name="setweather", description="Set your favorite city for weather.")
     async def set_favorite_city(self, ctx, *, city: str):
         """Set your favorite city for weather"""
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''INSERT OR REPLACE INTO weather_favorites 
                                (user_id, guild_id, city)
                                VALUES (?, ?, ?)''',
                            (ctx.author.id, ctx.guild.id, city))
-            await db.commit()
         
         await ctx.send(embed=modern_embed(
             title="✅ Favorite City Set",
@@ -163,7 +160,7 @@ class Weather(commands.Cog):
     @commands.command(name="myweather", description="Get weather for your favorite city.")
     async def get_favorite_weather(self, ctx):
         """Get weather for your favorite city"""
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('''SELECT city FROM weather_favorites 
                                    WHERE user_id = ? AND guild_id = ?''',
                                 (ctx.author.id, ctx.guild.id)) as cursor:
@@ -225,13 +222,12 @@ class Weather(commands.Cog):
             ))
             return
         
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.write() as db:
             await db.execute('''INSERT INTO weather_alerts 
                                (user_id, guild_id, city, alert_type, threshold, created_at)
                                VALUES (?, ?, ?, ?, ?, ?)''',
                            (ctx.author.id, ctx.guild.id, city, alert_type.lower(),
                             threshold, datetime.utcnow().isoformat()))
-            await db.commit()
         
         await ctx.send(embed=modern_embed(
             title="⏰ Weather Alert Set",
@@ -245,7 +241,7 @@ class Weather(commands.Cog):
     @commands.command(name="weatheralerts", description="List your weather alerts.")
     async def list_weather_alerts(self, ctx):
         """List all your weather alerts"""
-        async with aiosqlite.connect('database.db') as db:
+        async with self.bot.db.read() as db:
             async with db.execute('''SELECT city, alert_type, threshold, created_at
                                    FROM weather_alerts 
                                    WHERE user_id = ? AND guild_id = ?
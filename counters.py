@@ -0,0 +1,531 @@
+"""
+Activity counters for Nexus Elite Bot
+Analytics increments are summed in memory per (entity, day) and flushed
+periodically as one upsert per key, so counting a message never waits on
+the database and concurrent counts add up instead of overwriting each other.
+Every flush adds the same increments to weekly and monthly rollup tables, so
+old per-entity daily rows can be pruned without losing any totals. Active
+users are counted with one HyperLogLog sketch per guild and channel per day,
+and message volume by hour of the week in one 168-slot array per week.
+Member join days and first/last active days feed the retention cohorts
+"""
+
+import asyncio
+import os
+import sys
+from array import array
+from datetime import datetime, timedelta
+
+import migrations
+from hyperloglog import HyperLogLog
+
+# Counts are written at least this often (and on shutdown)
+FLUSH_INTERVAL = int(os.getenv('ANALYTICS_FLUSH_SECONDS', '30'))
+# Daily user, channel and command rows older than this many days are pruned
+RETENTION_DAYS = int(os.getenv('ANALYTICS_RETENTION_DAYS', '90'))
+
+# table -> (key columns ending with date, conflict target, summed columns, latest-value columns)
+TABLES = {
+    'server_analytics': (
+        ('guild_id', 'date'), ('guild_id', 'date'),
+        ('message_count', 'voice_minutes', 'join_count', 'leave_count', 'command_usage'),
+        ('member_count',),
+    ),
+    'user_activity': (
+        ('user_id', 'guild_id', 'date'), ('user_id', 'guild_id', 'date'),
+        ('messages', 'voice_minutes', 'commands', 'reactions'),
+        (),
+    ),
+    'channel_stats': (
+        ('channel_id', 'guild_id', 'date'), ('channel_id', 'date'),
+        ('message_count', 'reaction_count'),
+        (),
+    ),
+    'command_stats': (
+        ('command_name', 'guild_id', 'date'), ('command_name', 'guild_id', 'date'),
+        ('usage_count',),
+        (),
+    ),
+}
+
+# Sketch and heatmap rows with this channel id cover the whole guild
+GUILD_WIDE = 0
+# Guild sketches are 4 KB (~1.6% error), channel sketches 1 KB (~3.3%)
+GUILD_SKETCH_PRECISION = 12
+CHANNEL_SKETCH_PRECISION = 10
+# One message counter per hour of the week, Monday 00:00 UTC first
+HEATMAP_SLOTS = 7 * 24
+
+# server_analytics keeps its daily rows (one per guild per day) for trend graphs
+PRUNED_TABLES = ('user_activity', 'channel_stats', 'command_stats')
+
+
+def week_start(date):
+    day = datetime.strptime(date, '%Y-%m-%d')
+    return (day - timedelta(days=day.weekday())).strftime('%Y-%m-%d')
+
+
+def month_start(date):
+    return date[:8] + '01'
+
+
+# Rollups live in <table>_<grain>, with date holding the first day of the period
+GRAINS = {
+    'weekly': week_start,
+    'monthly': month_start,
+}
+
+
+def today():
+    return datetime.utcnow().strftime('%Y-%m-%d')
+
+
+def hour_slot(when):
+    return when.weekday() * 24 + when.hour
+
+
+def new_slots(key=None):
+    return array('I', bytes(4 * HEATMAP_SLOTS))
+
+
+# Heatmap blobs are little-endian uint32 whatever the host byte order
+def load_slots(blob):
+    slots = array('I')
+    slots.frombytes(blob)
+    if sys.byteorder == 'big':
+        slots.byteswap()
+    return slots
+
+
+def dump_slots(slots):
+    if sys.byteorder == 'big':
+        slots = array('I', slots)
+        slots.byteswap()
+    return slots.tobytes()
+
+
+def add_slots(slots, other):
+    return array('I', map(int.__add__, slots, other))
+
+
+def new_sketch(key):
+    return HyperLogLog(GUILD_SKETCH_PRECISION if key[1] == GUILD_WIDE else CHANNEL_SKETCH_PRECISION)
+
+
+def upsert_sql(table, target_table=None):
+    keys, target, sums, gauges = TABLES[table]
+    columns = keys + sums + gauges
+    updates = [f'{column} = COALESCE({column}, 0) + excluded.{column}' for column in sums]
+    updates += [f'{column} = COALESCE(excluded.{column}, {column})' for column in gauges]
+    return (f'INSERT INTO {target_table or table} ({", ".join(columns)}) '
+            f'VALUES ({", ".join("?" for _ in columns)}) '
+            f'ON CONFLICT({", ".join(target)}) DO UPDATE SET {", ".join(updates)}')
+
+
+def rollup_schema():
+    """DDL for the weekly and monthly copies of every counter table"""
+    statements = []
+    for table, (keys, target, sums, gauges) in TABLES.items():
+        columns = ', '.join(f"{column} {'TEXT' if column in ('date', 'command_name') else 'INTEGER'}"
+                            for column in keys + sums + gauges)
+        for grain in GRAINS:
+            statements.append(f'CREATE TABLE IF NOT EXISTS {table}_{grain} '
+                              f'({columns}, PRIMARY KEY ({", ".join(target)}))')
+            if target[0] != 'guild_id':
+                statements.append(f'CREATE INDEX IF NOT EXISTS idx_{table}_{grain}_guild_date '
+                                  f'ON {table}_{grain} (guild_id, date)')
+    return statements
+
+
+def rolled_up(table, rows, period):
+    """Counter rows of ``table`` re-keyed by the period containing their date"""
+    index = len(TABLES[table][0]) - 1
+    for row in rows:
+        yield row[:index] + (period(row[index]),) + row[index + 1:]
+
+
+async def _backfill_rollups(db):
+    """Roll up the daily rows recorded before the rollup tables existed"""
+    for table, (keys, _, sums, gauges) in TABLES.items():
+        async with db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)) as cursor:
+            if await cursor.fetchone() is None:
+                continue
+        columns = keys + sums + gauges
+        async with db.execute(f'SELECT {", ".join(columns)} FROM {table} ORDER BY date') as cursor:
+            rows = [tuple(0 if value is None and column in sums else value for column, value in zip(columns, row))
+                    for row in await cursor.fetchall()]
+        for grain, period in GRAINS.items():
+            await db.executemany(upsert_sql(table, f'{table}_{grain}'), rolled_up(table, rows, period))
+
+
+migrations.register('analytics_rollups', rollup_schema(), _backfill_rollups)
+
+migrations.register('active_users', [
+    '''CREATE TABLE IF NOT EXISTS active_user_sketches
+       (guild_id INTEGER, channel_id INTEGER, date TEXT, sketch BLOB,
+        PRIMARY KEY (guild_id, channel_id, date))''',
+    '''CREATE INDEX IF NOT EXISTS idx_active_user_sketches_date ON active_user_sketches (date)''',
+])
+
+migrations.register('member_cohorts', [
+    '''CREATE TABLE IF NOT EXISTS member_cohorts
+       (guild_id INTEGER, user_id INTEGER, joined INTEGER,
+        first_active INTEGER, last_active INTEGER,
+        PRIMARY KEY (guild_id, user_id))''',
+    '''CREATE INDEX IF NOT EXISTS idx_member_cohorts_joined ON member_cohorts (guild_id, joined)''',
+])
+
+migrations.register('activity_heatmaps', [
+    '''CREATE TABLE IF NOT EXISTS activity_heatmaps
+       (guild_id INTEGER, channel_id INTEGER, week TEXT, slots BLOB,
+        PRIMARY KEY (guild_id, channel_id, week))''',
+])
+
+
+def segments(start, end):
+    """Cover the days start..end (inclusive) with whole months, whole weeks and single days
+
+    Returns ``(grain, first, last)`` runs, grain being None for daily rows and
+    first/last the period keys to read, so a long range touches a handful of
+    rollup rows and only its ragged edges need daily rows.
+    """
+    runs = []
+    day = datetime.strptime(start, '%Y-%m-%d')
+    last_day = datetime.strptime(end, '%Y-%m-%d')
+    while day <= last_day:
+        next_month = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+        if day.day == 1 and next_month - timedelta(days=1) <= last_day:
+            grain, following = 'monthly', next_month
+        elif day.weekday() == 0 and day + timedelta(days=6) <= last_day:
+            grain, following = 'weekly', day + timedelta(days=7)
+        else:
+            grain, following = None, day + timedelta(days=1)
+        key = day.strftime('%Y-%m-%d')
+        if runs and runs[-1][0] == grain:
+            runs[-1][2] = key
+        else:
+            runs.append([grain, key, key])
+        day = following
+    return [tuple(run) for run in runs]
+
+
+def range_source(table, columns, start, end, where, params=()):
+    """``(sql, params)`` for ``SELECT ... FROM {sql}`` over the days start..end
+
+    Each run from ``segments`` reads ``columns`` from the coarsest table that
+    covers it, filtered by ``where`` (bound with ``params``).
+    """
+    parts = []
+    values = []
+    for grain, first, last in segments(start, end):
+        source = f'{table}_{grain}' if grain else table
+        parts.append(f'SELECT {columns} FROM {source} WHERE {where} AND date BETWEEN ? AND ?')
+        values.extend(params)
+        values.extend((first, last))
+    if not parts:
+        parts.append(f'SELECT {columns} FROM {table} WHERE 0')
+    return f'({" UNION ALL ".join(parts)})', tuple(values)
+
+
+JOIN_SQL = '''INSERT INTO member_cohorts (guild_id, user_id, joined) VALUES (?, ?, ?)
+              ON CONFLICT(guild_id, user_id) DO UPDATE SET joined = excluded.joined'''
+ACTIVITY_SQL = '''INSERT INTO member_cohorts (guild_id, user_id, first_active, last_active) VALUES (?, ?, ?, ?)
+                  ON CONFLICT(guild_id, user_id) DO UPDATE SET
+                  first_active = COALESCE(first_active, excluded.first_active),
+                  last_active = MAX(COALESCE(last_active, 0), excluded.last_active)'''
+
+
+class BlobState:
+    """Per-key values rewritten whole as one blob per row
+
+    A key's stored blob is merged into memory once, on its first write, so
+    counting before then never waits on a read. Later writes replace the row
+    with the in-memory value.
+    """
+
+    def __init__(self, table, keys, column, new, load, merge, dump):
+        self.table = table
+        self.new = new
+        self.load = load
+        self.merge = merge
+        self.dump = dump
+        self.values = {}
+        self.dirty = set()
+        self._loaded = set()
+        where = ' AND '.join(f'{key} = ?' for key in keys)
+        self._select = f'SELECT {column} FROM {table} WHERE {where}'
+        self._upsert = (f'INSERT INTO {table} ({", ".join(keys)}, {column}) '
+                        f'VALUES ({", ".join("?" for _ in keys)}, ?) '
+                        f'ON CONFLICT({", ".join(keys)}) DO UPDATE SET {column} = excluded.{column}')
+
+    def get(self, key):
+        """The value for ``key``, marked to be written with the next flush"""
+        value = self.values.get(key)
+        if value is None:
+            value = self.values[key] = self.new(key)
+        self.dirty.add(key)
+        return value
+
+    async def write(self, db, keys):
+        rows = []
+        for key in keys:
+            value = self.values[key]
+            if key not in self._loaded:
+                # Whatever was counted before a restart is in the stored blob
+                async with db.execute(self._select, key) as cursor:
+                    stored = await cursor.fetchone()
+                if stored:
+                    value = self.values[key] = self.merge(value, self.load(stored[0]))
+                self._loaded.add(key)
+            rows.append(key + (self.dump(value),))
+        await db.executemany(self._upsert, rows)
+
+    def evict(self, current):
+        """Forget written values whose period (the last key column) has ended"""
+        for key in [key for key in self.values if key[-1] != current and key not in self.dirty]:
+            del self.values[key]
+            self._loaded.discard(key)
+
+
+class ActivityCounters:
+    """Daily analytics counters buffered in memory"""
+
+    def __init__(self, db, interval=FLUSH_INTERVAL, retention_days=RETENTION_DAYS):
+        self.db = db
+        self.interval = interval
+        self.retention_days = retention_days
+        # table -> {key tuple: {column: value}}
+        self._pending = {table: {} for table in TABLES}
+        self._statements = {table: upsert_sql(table) for table in TABLES}
+        for table in TABLES:
+            for grain in GRAINS:
+                self._statements[table, grain] = upsert_sql(table, f'{table}_{grain}')
+        # (guild_id, channel_id, date) -> HyperLogLog of the users seen
+        self.sketches = BlobState('active_user_sketches', ('guild_id', 'channel_id', 'date'), 'sketch',
+                                  new_sketch, HyperLogLog.from_bytes, HyperLogLog.merge, HyperLogLog.to_bytes)
+        # (guild_id, channel_id, week) -> messages per hour of the week
+        self.heatmaps = BlobState('activity_heatmaps', ('guild_id', 'channel_id', 'week'), 'slots',
+                                  new_slots, load_slots, add_slots, dump_slots)
+        # Day ordinals (date.toordinal()) for member_cohorts, written once per member per day
+        self._joins = {}
+        self._activity = {}
+        self._active_today = set()
+        self._active_day = None
+        self._pruned_on = None
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._closing = False
+        self.flushes = 0
+        self.failures = 0
+        # guild_id -> number of the last flush that wrote its data
+        self._versions = {}
+
+    @property
+    def depth(self):
+        return sum(len(keys) for keys in self._pending.values()) + len(self._joins) + len(self._activity)
+
+    def version(self, guild_id):
+        """Changes whenever a flush writes some of the guild's analytics data"""
+        return self._versions.get(guild_id, 0)
+
+    def add(self, table, key, **counts):
+        """Add to the summed columns of ``table`` for ``key`` (date last)"""
+        row = self._pending[table].setdefault(key, {})
+        for column, amount in counts.items():
+            row[column] = row.get(column, 0) + amount
+
+    def set(self, table, key, **values):
+        """Record the latest value of a gauge column such as member_count"""
+        self._pending[table].setdefault(key, {}).update(values)
+
+    # Analytics events
+
+    def message(self, guild_id, user_id, channel_id, member_count=None):
+        now = datetime.utcnow()
+        date = now.strftime('%Y-%m-%d')
+        self.add('server_analytics', (guild_id, date), message_count=1)
+        if member_count is not None:
+            self.set('server_analytics', (guild_id, date), member_count=member_count)
+        self.add('user_activity', (user_id, guild_id, date), messages=1)
+        self.add('channel_stats', (channel_id, guild_id, date), message_count=1)
+        self.active(guild_id, channel_id, user_id, date)
+        self.seen(guild_id, user_id, now.toordinal())
+        slot = hour_slot(now)
+        week = week_start(date)
+        self.heatmaps.get((guild_id, GUILD_WIDE, week))[slot] += 1
+        self.heatmaps.get((guild_id, channel_id, week))[slot] += 1
+
+    def active(self, guild_id, channel_id, user_id, date=None):
+        """Count a user as active in the guild and the channel"""
+        date = date or today()
+        self.sketches.get((guild_id, GUILD_WIDE, date)).add(user_id)
+        self.sketches.get((guild_id, channel_id, date)).add(user_id)
+
+    def seen(self, guild_id, user_id, day):
+        """Record the member's activity day for retention cohorts"""
+        if day != self._active_day:
+            self._active_today = set()
+            self._active_day = day
+        key = (guild_id, user_id)
+        if key not in self._active_today:
+            self._active_today.add(key)
+            self._activity[key] = day
+
+    def command(self, guild_id, user_id, command_name):
+        date = today()
+        self.add('server_analytics', (guild_id, date), command_usage=1)
+        self.add('user_activity', (user_id, guild_id, date), commands=1)
+        self.add('command_stats', (command_name, guild_id, date), usage_count=1)
+
+    def member_joined(self, guild_id, user_id, member_count):
+        now = datetime.utcnow()
+        key = (guild_id, now.strftime('%Y-%m-%d'))
+        self.add('server_analytics', key, join_count=1)
+        self.set('server_analytics', key, member_count=member_count)
+        self._joins[guild_id, user_id] = now.toordinal()
+
+    def member_left(self, guild_id, member_count):
+        key = (guild_id, today())
+        self.add('server_analytics', key, leave_count=1)
+        self.set('server_analytics', key, member_count=member_count)
+
+    def voice(self, guild_id, user_id, minutes):
+        if minutes <= 0:
+            return
+        date = today()
+        self.add('server_analytics', (guild_id, date), voice_minutes=minutes)
+        self.add('user_activity', (user_id, guild_id, date), voice_minutes=minutes)
+
+    # Flushing
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        # Stopped with a flag like the other sleepers, then flushed one last time
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def _rows(self, table, pending):
+        keys, _, sums, gauges = TABLES[table]
+        for key, row in pending.items():
+            yield key + tuple(row.get(column, 0) for column in sums) + tuple(row.get(column) for column in gauges)
+
+    async def prune(self, db, date):
+        """Delete daily per-entity rows that fell out of the retention window"""
+        cutoff = (datetime.strptime(date, '%Y-%m-%d') - timedelta(days=self.retention_days)).strftime('%Y-%m-%d')
+        for table in PRUNED_TABLES:
+            await db.execute(f'DELETE FROM {table} WHERE date < ?', (cutoff,))
+        # Sketches back the monthly active user count, so at least 31 days are kept
+        days = max(self.retention_days, 31)
+        cutoff = (datetime.strptime(date, '%Y-%m-%d') - timedelta(days=days)).strftime('%Y-%m-%d')
+        await db.execute('DELETE FROM active_user_sketches WHERE date < ?', (cutoff,))
+
+    async def active_users(self, guild_id, days, channel_id=GUILD_WIDE, end=None):
+        """Approximate distinct active users over the ``days`` days ending ``end`` (today)"""
+        end = end or today()
+        start = (datetime.strptime(end, '%Y-%m-%d') - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+        rows = await self.db.fetchall('''SELECT sketch FROM active_user_sketches
+                                         WHERE guild_id = ? AND channel_id = ? AND date BETWEEN ? AND ?''',
+                                      (guild_id, channel_id, start, end))
+        merged = None
+        for (blob,) in rows:
+            sketch = HyperLogLog.from_bytes(blob)
+            merged = sketch if merged is None else merged.merge(sketch)
+        return merged.count() if merged else 0
+
+    async def heatmap_blobs(self, guild_id, weeks, channel_id=GUILD_WIDE):
+        """Stored hour-of-week blobs for the last ``weeks`` weeks, this one included"""
+        first = week_start((datetime.utcnow() - timedelta(weeks=weeks - 1)).strftime('%Y-%m-%d'))
+        rows = await self.db.fetchall('''SELECT slots FROM activity_heatmaps
+                                         WHERE guild_id = ? AND channel_id = ? AND week >= ?''',
+                                      (guild_id, channel_id, first))
+        return [row[0] for row in rows]
+
+    async def record_joins(self, guild_id, joins):
+        """Store (user_id, join day ordinal) pairs, e.g. from the member cache"""
+        await self.db.executemany(JOIN_SQL, [(guild_id, user_id, day) for user_id, day in joins])
+
+    async def cohort_rows(self, guild_id, since):
+        """(joined, last_active or 0) day ordinals of members who joined on or after ``since``"""
+        return await self.db.fetchall('''SELECT joined, COALESCE(last_active, 0) FROM member_cohorts
+                                         WHERE guild_id = ? AND joined >= ?''', (guild_id, since))
+
+    async def flush(self):
+        """Upsert everything counted so far, with its rollups, in one transaction"""
+        states = (self.sketches, self.heatmaps)
+        if not self.depth and not any(state.dirty for state in states):
+            return
+        batch, self._pending = self._pending, {table: {} for table in TABLES}
+        joins, self._joins = self._joins, {}
+        activity, self._activity = self._activity, {}
+        dirty = []
+        for state in states:
+            dirty.append((state, state.dirty))
+            state.dirty = set()
+        date = today()
+        try:
+            async with self.db.write() as db:
+                for table, pending in batch.items():
+                    if not pending:
+                        continue
+                    rows = list(self._rows(table, pending))
+                    await db.executemany(self._statements[table], rows)
+                    for grain, period in GRAINS.items():
+                        await db.executemany(self._statements[table, grain], rolled_up(table, rows, period))
+                for state, keys in dirty:
+                    if keys:
+                        await state.write(db, keys)
+                if joins:
+                    await db.executemany(JOIN_SQL, [key + (day,) for key, day in joins.items()])
+                if activity:
+                    await db.executemany(ACTIVITY_SQL, [key + (day, day) for key, day in activity.items()])
+                if self._pruned_on != date:
+                    await self.prune(db, date)
+            self._pruned_on = date
+            self.flushes += 1
+            guilds = {key[0] for key in joins} | {key[0] for key in activity}
+            for table, pending in batch.items():
+                position = TABLES[table][0].index('guild_id')
+                guilds.update(key[position] for key in pending)
+            for _, keys in dirty:
+                guilds.update(key[0] for key in keys)
+            for guild_id in guilds:
+                self._versions[guild_id] = self.flushes
+            # Earlier days' sketches and weeks' heatmaps are complete once written
+            self.sketches.evict(date)
+            self.heatmaps.evict(week_start(date))
+        except Exception as e:
+            self.failures += 1
+            print(f"Error flushing analytics counters: {e}")
+            # Put everything back so it is retried with the next flush
+            for state, keys in dirty:
+                state.dirty |= keys
+            for key, day in joins.items():
+                self._joins.setdefault(key, day)
+            for key, day in activity.items():
+                self._activity[key] = max(day, self._activity.get(key, day))
+            for table, pending in batch.items():
+                gauges = TABLES[table][3]
+                for key, row in pending.items():
+                    current = self._pending[table].setdefault(key, {})
+                    for column, value in row.items():
+                        if column in gauges:
+                            # A value recorded since the failed flush is newer
+                            current.setdefault(column, value)
+                        else:
+                            current[column] = current.get(column, 0) + value
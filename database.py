@@ -0,0 +1,307 @@
+"""
+Shared database service for Nexus Elite Bot
+One WAL writer connection, a small pool of read-only connections and a
+write-behind queue for high-frequency counters and logs
+"""
+
+import asyncio
+import os
+import sqlite3
+import aiosqlite
+from contextlib import asynccontextmanager
+
+DB_PATH = 'database.db'
+READ_POOL_SIZE = 4
+
+# Write-behind durability window: queued rows are committed at least this often
+FLUSH_INTERVAL_MS = int(os.getenv('DB_FLUSH_INTERVAL_MS', '1000'))
+# ...or as soon as this many rows are waiting
+FLUSH_MAX_ROWS = int(os.getenv('DB_FLUSH_MAX_ROWS', '500'))
+
+WRITER_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA cache_size = -16000',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA mmap_size = 67108864',
+)
+
+READER_PRAGMAS = (
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA cache_size = -8000',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA mmap_size = 67108864',
+    'PRAGMA query_only = 1',
+)
+
+
+class Database:
+    """Pooled async access to the bot database"""
+
+    def __init__(self, path=DB_PATH, pool_size=READ_POOL_SIZE):
+        self.path = path
+        self.pool_size = pool_size
+        self._writer = None
+        self._write_lock = asyncio.Lock()
+        self._write_owner = None
+        self._readers = asyncio.Queue()
+        self._all_readers = []
+        self._read_owners = {}
+        self.deferred = WriteBehind(self)
+
+    async def connect(self):
+        """Open the writer and the read-only pool"""
+        self._writer = await aiosqlite.connect(self.path)
+        for pragma in WRITER_PRAGMAS:
+            await self._writer.execute(pragma)
+        await self._writer.commit()
+        for _ in range(self.pool_size):
+            reader = await self.open_reader()
+            self._all_readers.append(reader)
+            self._readers.put_nowait(reader)
+        self.deferred.start()
+
+    async def open_reader(self):
+        """A new read-only connection outside the pool; the caller closes it"""
+        reader = await aiosqlite.connect(f'file:{self.path}?mode=ro', uri=True)
+        for pragma in READER_PRAGMAS:
+            await reader.execute(pragma)
+        return reader
+
+    async def close(self):
+        """Close every connection, committing pending writes first"""
+        await self.deferred.close()
+        if self._writer is not None:
+            async with self._write_lock:
+                try:
+                    await self._writer.commit()
+                finally:
+                    await self._writer.close()
+                    self._writer = None
+        for reader in self._all_readers:
+            try:
+                await reader.close()
+            except Exception:
+                pass
+        self._all_readers = []
+
+    @asynccontextmanager
+    async def write(self):
+        """Serialized access to the writer, committed on success and rolled back on error"""
+        task = asyncio.current_task()
+        # Nested write blocks in the same task share the outer transaction
+        if self._write_owner is task:
+            yield self._writer
+            return
+        async with self._write_lock:
+            self._write_owner = task
+            try:
+                # Queued rows go first so direct writes never overtake them
+                await self.deferred.drain(self._writer)
+                yield self._writer
+                if self._writer.in_transaction:
+                    await self._writer.commit()
+            except BaseException:
+                if self._writer.in_transaction:
+                    await self._writer.rollback()
+                raise
+            finally:
+                self._write_owner = None
+
+    @asynccontextmanager
+    async def read(self):
+        """Borrow a read-only connection from the pool"""
+        # Reads issued inside a write block must see its uncommitted rows
+        if self._write_owner is not None and self._write_owner is asyncio.current_task():
+            yield self._writer
+            return
+        task = asyncio.current_task()
+        if task in self._read_owners:
+            yield self._read_owners[task]
+            return
+        reader = await self._readers.get()
+        self._read_owners[task] = reader
+        try:
+            yield reader
+        finally:
+            del self._read_owners[task]
+            self._readers.put_nowait(reader)
+
+    @asynccontextmanager
+    async def pinned(self, reader):
+        """Serve this task's read() calls from ``reader`` instead of the pool"""
+        task = asyncio.current_task()
+        self._read_owners[task] = reader
+        try:
+            yield reader
+        finally:
+            del self._read_owners[task]
+
+    def defer(self, sql, params=()):
+        """Queue a write to be committed with the next batch"""
+        self.deferred.enqueue(sql, params)
+
+    async def execute(self, sql, params=()):
+        async with self.write() as db:
+            cursor = await db.execute(sql, params)
+            return cursor.rowcount
+
+    async def executemany(self, sql, rows):
+        async with self.write() as db:
+            await db.executemany(sql, rows)
+
+    async def fetchone(self, sql, params=()):
+        async with self.read() as db:
+            async with db.execute(sql, params) as cursor:
+                return await cursor.fetchone()
+
+    async def fetchall(self, sql, params=()):
+        async with self.read() as db:
+            async with db.execute(sql, params) as cursor:
+                return await cursor.fetchall()
+
+
+class WriteBehind:
+    """Buffers writes in memory and commits them as one transaction per batch"""
+
+    def __init__(self, database, interval_ms=FLUSH_INTERVAL_MS, max_rows=FLUSH_MAX_ROWS):
+        self.database = database
+        self.interval = interval_ms / 1000
+        self.max_rows = max_rows
+        self._pending = []
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._closing = False
+        # Counters
+        self.enqueued = 0
+        self.written = 0
+        self.flushes = 0
+        self.failures = 0
+        self.dropped = 0
+        self.peak_depth = 0
+
+    @property
+    def depth(self):
+        return len(self._pending)
+
+    def stats(self):
+        return {
+            'depth': self.depth,
+            'peak_depth': self.peak_depth,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'flushes': self.flushes,
+            'failures': self.failures,
+            'dropped': self.dropped,
+            'interval_ms': int(self.interval * 1000),
+            'max_rows': self.max_rows,
+        }
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def enqueue(self, sql, params=()):
+        self._pending.append((sql, params))
+        self.enqueued += 1
+        if len(self._pending) > self.peak_depth:
+            self.peak_depth = len(self._pending)
+        if len(self._pending) >= self.max_rows:
+            self._wakeup.set()
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # A failed commit must not stop the flusher; the rows stay queued
+                print(f"Error in write-behind flush: {e}")
+
+    async def flush(self):
+        """Commit everything queued so far"""
+        if self._pending:
+            # Opening a write block drains the queue before yielding
+            async with self.database.write():
+                pass
+
+    async def drain(self, db):
+        """Write queued rows on the writer connection (caller holds the write lock)"""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        groups = _groups(batch)
+        try:
+            for sql, rows in groups:
+                await db.executemany(sql, rows)
+            # Committed on their own so a failing caller block cannot roll them back
+            await db.commit()
+            self.written += len(batch)
+            self.flushes += 1
+        except Exception as e:
+            # Nothing from a failed batch is kept; the groups are redone one at a time
+            await db.rollback()
+            self.failures += 1
+            print(f"Error flushing {len(batch)} queued writes: {e}")
+            await self._isolate(db, groups)
+
+    async def _isolate(self, db, groups):
+        """Commit ``groups`` one by one, dropping only the rows that cannot be written"""
+        for index, (sql, rows) in enumerate(groups):
+            try:
+                await db.executemany(sql, rows)
+                await db.commit()
+                self.written += len(rows)
+                continue
+            except Exception as e:
+                await db.rollback()
+                if _transient(e):
+                    # Not the rows' fault, so this group and the rest are queued again
+                    self._requeue(groups[index:])
+                    print(f"Requeued {sum(len(rows) for _, rows in groups[index:])} queued writes: {e}")
+                    return
+            # A bad row in the group: each row on its own, a failing statement only undoes itself
+            for params in rows:
+                try:
+                    await db.execute(sql, params)
+                    self.written += 1
+                except Exception as e:
+                    self.dropped += 1
+                    print(f"Dropped queued write {sql!r} {params!r}: {e}")
+            await db.commit()
+        self.flushes += 1
+
+    def _requeue(self, groups):
+        self._pending[:0] = [(sql, params) for sql, rows in groups for params in rows]
+
+    async def close(self):
+        # Woken rather than cancelled: wait_for can swallow a cancel that races the event
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        if self.database._writer is not None:
+            await self.flush()
+
+
+def _groups(batch):
+    """Consecutive rows with the same statement, as (sql, [params]) for one executemany each"""
+    groups = []
+    for sql, params in batch:
+        if groups and groups[-1][0] == sql:
+            groups[-1][1].append(params)
+        else:
+            groups.append((sql, [params]))
+    return groups
+
+
+def _transient(error):
+    """Whether ``error`` is the database being locked or busy rather than a bad row"""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
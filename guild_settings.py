@@ -0,0 +1,118 @@
+"""
+Guild settings for Nexus Elite Bot
+One typed row per guild in guild_settings, read through an in-memory cache
+so event handlers get their channel IDs without touching the database
+"""
+
+import migrations
+
+# Channel settings stored per guild, in column order
+CHANNEL_FIELDS = (
+    'invite_log_channel',
+    'leave_log_channel',
+    'drag_channel',
+    'verification_channel',
+    'welcome_channel',
+    'announcements_channel',
+    'database_stats_channel',
+    'bot_config_channel',
+    'registration_channel',
+    'show_channel',
+)
+
+# Values stored under this guild id apply to every guild that has not set its own
+DEFAULT_GUILD = 0
+
+
+async def _import_bot_config(db):
+    """Move the old bot_config '<field>_<guild_id>' keys into guild_settings"""
+    async with db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'bot_config'") as cursor:
+        if await cursor.fetchone() is None:
+            return
+    async with db.execute('SELECT key, value FROM bot_config') as cursor:
+        rows = await cursor.fetchall()
+    for key, value in rows:
+        for field in CHANNEL_FIELDS:
+            if key == field:
+                # registration_channel and show_channel were never guild scoped
+                guild_id = DEFAULT_GUILD
+            elif key.startswith(field + '_') and key[len(field) + 1:].isdigit():
+                guild_id = int(key[len(field) + 1:])
+            else:
+                continue
+            if not str(value).isdigit():
+                break
+            await db.execute(f'''INSERT INTO guild_settings (guild_id, {field}) VALUES (?, ?)
+                                 ON CONFLICT(guild_id) DO UPDATE SET {field} = excluded.{field}''',
+                             (guild_id, int(value)))
+            await db.execute('DELETE FROM bot_config WHERE key = ?', (key,))
+            break
+
+
+migrations.register('guild_settings', [
+    '''CREATE TABLE IF NOT EXISTS guild_settings
+       (guild_id INTEGER PRIMARY KEY, '''
+    + ', '.join(f'{field} INTEGER' for field in CHANNEL_FIELDS) + ')',
+], _import_bot_config)
+
+
+class GuildSettings:
+    """Settings of a single guild; unset channels are None"""
+
+    __slots__ = ('guild_id',) + CHANNEL_FIELDS
+
+    def __init__(self, guild_id, row=None, defaults=None):
+        self.guild_id = guild_id
+        for index, field in enumerate(CHANNEL_FIELDS):
+            value = row[index] if row else None
+            if value is None and defaults:
+                value = defaults[index]
+            setattr(self, field, value)
+
+    def channel(self, guild, field):
+        """Resolve a channel setting against the guild's channel cache"""
+        channel_id = getattr(self, field)
+        return guild.get_channel(channel_id) if channel_id else None
+
+
+class SettingsStore:
+    """Read-through cache of GuildSettings keyed by guild id"""
+
+    def __init__(self, db):
+        self.db = db
+        self._cache = {}
+
+    async def get(self, guild_id):
+        settings = self._cache.get(guild_id)
+        if settings is None:
+            columns = ', '.join(CHANNEL_FIELDS)
+            rows = await self.db.fetchall(
+                f'SELECT guild_id, {columns} FROM guild_settings WHERE guild_id IN (?, ?)',
+                (guild_id, DEFAULT_GUILD))
+            by_guild = {row[0]: row[1:] for row in rows}
+            settings = GuildSettings(guild_id, by_guild.get(guild_id), by_guild.get(DEFAULT_GUILD))
+            self._cache[guild_id] = settings
+        return settings
+
+    async def set(self, guild_id, **values):
+        """Update some of a guild's settings and drop its cached copy"""
+        unknown = set(values) - set(CHANNEL_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown guild settings: {', '.join(sorted(unknown))}")
+        if not values:
+            return
+        columns = ', '.join(values)
+        placeholders = ', '.join('?' for _ in values)
+        updates = ', '.join(f'{field} = excluded.{field}' for field in values)
+        await self.db.execute(
+            f'''INSERT INTO guild_settings (guild_id, {columns}) VALUES (?, {placeholders})
+                ON CONFLICT(guild_id) DO UPDATE SET {updates}''',
+            (guild_id, *values.values()))
+        self.invalidate(guild_id)
+
+    def invalidate(self, guild_id=None):
+        # Defaults are merged into every guild, so changing them drops everything
+        if guild_id is None or guild_id == DEFAULT_GUILD:
+            self._cache.clear()
+        else:
+            self._cache.pop(guild_id, None)
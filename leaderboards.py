@@ -0,0 +1,224 @@
+"""
+Leaderboard engine for Nexus Elite Bot
+Every ranking (levels, game coins, economy, invites, entertainment) is kept
+as an order-statistic skip list per (board, guild). Boards are loaded with a
+single scan when their cog loads and then updated as scores change, so a
+page of the top, a member's rank and the members around them are all
+O(log n) instead of a sort per command
+"""
+
+import math
+import random
+
+# Enough levels for a million members per board; larger boards stay correct, just slower
+MAX_LEVELS = 20
+
+# Boards that are not per guild (game coins, economy balances) use this guild id
+GLOBAL = 0
+
+# Leaderboard commands show this many places, PAGE_SIZE to a page
+TOP_SIZE = 50
+PAGE_SIZE = 10
+
+
+class _Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, levels):
+        self.key = key
+        self.next = [None] * levels
+        # Positions skipped by each link; the head is position 0
+        self.width = [1] * levels
+
+
+def _random_levels():
+    levels = 1
+    while levels < MAX_LEVELS and random.random() < 0.5:
+        levels += 1
+    return levels
+
+
+class RankedScores:
+    """Members ordered by score, highest first, with positional access
+
+    Ties go to the lower member id so every member has a distinct rank.
+    Ranks are 0-based here; commands show them 1-based.
+    """
+
+    def __init__(self):
+        self.scores = {}
+        self._tail = _Node((math.inf, math.inf), 0)
+        self._head = _Node(None, MAX_LEVELS)
+        self._head.next = [self._tail] * MAX_LEVELS
+
+    @classmethod
+    def from_sorted(cls, items):
+        """Build from (member, score) pairs already sorted best first, in O(n)"""
+        ranked = cls()
+        last = [ranked._head] * MAX_LEVELS
+        last_position = [0] * MAX_LEVELS
+        position = 0
+        for member, score in items:
+            position += 1
+            ranked.scores[member] = score
+            node = _Node((-score, member), _random_levels())
+            for level in range(len(node.next)):
+                last[level].next[level] = node
+                last[level].width[level] = position - last_position[level]
+                last[level] = node
+                last_position[level] = position
+        for level in range(MAX_LEVELS):
+            last[level].next[level] = ranked._tail
+            last[level].width[level] = position + 1 - last_position[level]
+        return ranked
+
+    def __len__(self):
+        return len(self.scores)
+
+    def _chain(self, key):
+        # The last node before ``key`` on every level, and the position of each
+        chain = [None] * MAX_LEVELS
+        positions = [0] * MAX_LEVELS
+        node = self._head
+        position = 0
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+            positions[level] = position
+        return chain, positions
+
+    def _insert(self, key):
+        chain, positions = self._chain(key)
+        node = _Node(key, _random_levels())
+        position = positions[0] + 1
+        for level in range(MAX_LEVELS):
+            previous = chain[level]
+            if level < len(node.next):
+                node.next[level] = previous.next[level]
+                previous.next[level] = node
+                node.width[level] = previous.width[level] - (position - positions[level]) + 1
+                previous.width[level] = position - positions[level]
+            else:
+                previous.width[level] += 1
+
+    def _remove(self, key):
+        chain, _ = self._chain(key)
+        node = chain[0].next[0]
+        for level in range(MAX_LEVELS):
+            previous = chain[level]
+            if level < len(node.next):
+                previous.width[level] += node.width[level] - 1
+                previous.next[level] = node.next[level]
+            else:
+                previous.width[level] -= 1
+
+    def set(self, member, score):
+        old = self.scores.get(member)
+        if old == score:
+            return
+        if old is not None:
+            self._remove((-old, member))
+        self.scores[member] = score
+        self._insert((-score, member))
+
+    def add(self, member, amount):
+        self.set(member, self.scores.get(member, 0) + amount)
+
+    def discard(self, member):
+        score = self.scores.pop(member, None)
+        if score is not None:
+            self._remove((-score, member))
+
+    def rank(self, member):
+        """0-based rank of ``member``, or None if they have no score"""
+        score = self.scores.get(member)
+        if score is None:
+            return None
+        key = (-score, member)
+        node = self._head
+        position = 0
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level].key <= key:
+                position += node.width[level]
+                node = node.next[level]
+        return position - 1
+
+    def page(self, start, count):
+        """(member, score) pairs ranked ``start`` to ``start + count - 1``"""
+        if start < 0 or start >= len(self.scores) or count <= 0:
+            return []
+        node = self._head
+        remaining = start + 1
+        for level in reversed(range(MAX_LEVELS)):
+            while node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        entries = []
+        while node is not self._tail and len(entries) < count:
+            entries.append((node.key[1], -node.key[0]))
+            node = node.next[0]
+        return entries
+
+    def around(self, member, radius=2):
+        """(rank of ``member``, (rank, member, score) from ``radius`` above to ``radius`` below them)"""
+        rank = self.rank(member)
+        if rank is None:
+            return None, []
+        start = max(0, rank - radius)
+        entries = self.page(start, rank - start + radius + 1)
+        return rank, [(start + offset, *entry) for offset, entry in enumerate(entries)]
+
+
+def around_text(lookup, member_id, entries, unit):
+    """Lines for an ``around`` result, the member's own in bold
+
+    ``lookup`` finds a user by id, ``guild.get_member`` or ``bot.get_user``.
+    """
+    lines = []
+    for rank, member, score in entries:
+        user = lookup(member)
+        line = f"#{rank + 1} {user.display_name if user else member} - {score:,} {unit}"
+        lines.append(f"**{line}**" if member == member_id else line)
+    return "\n".join(lines)
+
+
+class Leaderboards:
+    """RankedScores per (board, guild_id)"""
+
+    def __init__(self, db):
+        self.db = db
+        self._boards = {}
+
+    def board(self, board, guild_id=GLOBAL):
+        ranked = self._boards.get((board, guild_id))
+        if ranked is None:
+            ranked = self._boards[board, guild_id] = RankedScores()
+        return ranked
+
+    async def load(self, board, sql, params=()):
+        """Replace every guild's ``board`` from one query of (guild_id, member, score) rows"""
+        rows = await self.db.fetchall(sql, params)
+        by_guild = {}
+        for guild_id, member, score in rows:
+            if score is not None:
+                by_guild.setdefault(guild_id or GLOBAL, []).append((member, score))
+        for key in [key for key in self._boards if key[0] == board]:
+            del self._boards[key]
+        for guild_id, entries in by_guild.items():
+            entries.sort(key=lambda entry: (-entry[1], entry[0]))
+            self._boards[board, guild_id] = RankedScores.from_sorted(entries)
+        return len(rows)
+
+    def set(self, board, guild_id, member, score):
+        self.board(board, guild_id).set(member, score)
+
+    def add(self, board, guild_id, member, amount):
+        self.board(board, guild_id).add(member, amount)
+
+    def stats(self):
+        return {
+            'boards': len(self._boards),
+            'entries': sum(len(ranked) for ranked in self._boards.values()),
+        }
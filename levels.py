@@ -0,0 +1,288 @@
+"""
+Write-behind XP engine for Nexus Elite Bot
+Members' user_levels rows are kept in an LRU of decoded records. XP, levels
+and achievements change in memory and dirty records are upserted together in
+one batch, so a message from a member already in memory awards XP without
+touching the database
+"""
+
+import asyncio
+import bisect
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+LEVEL_FLUSH_SECONDS = int(os.getenv('LEVEL_FLUSH_SECONDS', '10'))
+LEVEL_CACHE_SIZE = int(os.getenv('LEVEL_CACHE_SIZE', '50000'))
+
+# Highest level a curve reaches; 100 * 1000 ** 2 XP under the default curve
+MAX_LEVEL = 1000
+
+LOAD_SQL = '''SELECT xp, level, total_xp, daily_streak, last_daily, voice_time, invites,
+                     reactions, messages, achievement_bits, skill_points, skills
+              FROM user_levels WHERE user_id = ? AND guild_id = ?'''
+
+RECOMPUTE_SQL = '''SELECT user_id, xp, level, skill_points FROM user_levels WHERE guild_id = ?'''
+
+REWRITE_SQL = '''UPDATE user_levels SET level = ?, skill_points = ? WHERE user_id = ? AND guild_id = ?'''
+
+SAVE_SQL = '''INSERT INTO user_levels (user_id, guild_id, xp, level, total_xp, daily_streak, last_daily, voice_time,
+                                       invites, reactions, messages, achievement_bits, skill_points, skills)
+              VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+              ON CONFLICT(user_id, guild_id) DO UPDATE SET
+                  xp = excluded.xp, level = excluded.level, total_xp = excluded.total_xp,
+                  daily_streak = excluded.daily_streak, last_daily = excluded.last_daily,
+                  voice_time = excluded.voice_time, invites = excluded.invites,
+                  reactions = excluded.reactions, messages = excluded.messages,
+                  achievement_bits = excluded.achievement_bits,
+                  skill_points = excluded.skill_points, skills = excluded.skills'''
+
+
+class LevelCurve:
+    """XP needed for every level up to MAX_LEVEL: ``step * level ** exponent``
+
+    The defaults are the original ``int(sqrt(xp) / 10)`` curve.
+    """
+
+    __slots__ = ('step', 'exponent', 'thresholds', '_bounds')
+
+    def __init__(self, step=100, exponent=2.0):
+        self.step = step
+        self.exponent = exponent
+        self.thresholds = np.floor(step * np.arange(MAX_LEVEL + 1, dtype=np.float64) ** exponent).astype(np.int64)
+        # Per-message lookups bisect a plain list; a NumPy call costs more than the search for one value
+        self._bounds = self.thresholds.tolist()
+
+    def level(self, xp):
+        return bisect.bisect_right(self._bounds, xp) - 1
+
+    def levels(self, xp):
+        """Level for every value of an XP array"""
+        return np.searchsorted(self.thresholds, xp, side='right') - 1
+
+    def xp_for(self, level):
+        return self._bounds[min(level, MAX_LEVEL)]
+
+
+DEFAULT_CURVE = LevelCurve()
+
+
+class LevelRecord:
+    """One member's user_levels row with skills decoded"""
+
+    __slots__ = ('user_id', 'guild_id', 'xp', 'level', 'total_xp', 'daily_streak', 'last_daily', 'voice_time',
+                 'invites', 'reactions', 'messages', 'achievement_bits', 'skill_points', 'skills')
+
+    def __init__(self, user_id, guild_id, xp=0, level=0, total_xp=0, daily_streak=0, last_daily=None, voice_time=0,
+                 invites=0, reactions=0, messages=0, achievement_bits=0, skill_points=0, skills=None):
+        self.user_id = user_id
+        self.guild_id = guild_id
+        self.xp = xp
+        self.level = level
+        self.total_xp = total_xp
+        self.daily_streak = daily_streak
+        # New members count as having claimed today, as before the engine
+        self.last_daily = last_daily or datetime.utcnow().isoformat()
+        self.voice_time = voice_time
+        self.invites = invites
+        self.reactions = reactions
+        self.messages = messages
+        # One bit per achievement, as numbered in the leveling cog's rules
+        self.achievement_bits = achievement_bits
+        self.skill_points = skill_points
+        self.skills = skills if skills is not None else {}
+
+    @classmethod
+    def from_row(cls, user_id, guild_id, row):
+        xp, level, total_xp, streak, last_daily, voice_time, invites, reactions, messages, bits, points, skills = row
+        return cls(user_id, guild_id, xp, level, total_xp, streak, last_daily, voice_time, invites,
+                   reactions, messages, bits, points, json.loads(skills or '{}'))
+
+    def to_row(self):
+        return (self.user_id, self.guild_id, self.xp, self.level, self.total_xp, self.daily_streak,
+                self.last_daily, self.voice_time, self.invites, self.reactions, self.messages,
+                self.achievement_bits, self.skill_points, json.dumps(self.skills))
+
+
+class XPEngine:
+    """LRU of level records with batched write-behind
+
+    The engine owns user_levels: every change goes through a record and
+    ``mark``, and only clean records are evicted, so a record read back from
+    the table is never behind one that was dropped.
+    """
+
+    def __init__(self, db, interval=LEVEL_FLUSH_SECONDS, capacity=LEVEL_CACHE_SIZE):
+        self.db = db
+        self.interval = interval
+        self.capacity = capacity
+        # (guild_id, user_id) -> LevelRecord, least recently used first
+        self._records = OrderedDict()
+        self._dirty = set()
+        # Keys whose rows are being written; reloading them now would read the old row
+        self._writing = set()
+        # Cleared while a guild is rewritten in bulk; misses wait so they read the new rows
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._closing = False
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+        self.written = 0
+        self.failures = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not self._closing:
+                await self.flush()
+
+    def stats(self):
+        return {
+            'cached': len(self._records),
+            'dirty': len(self._dirty),
+            'hits': self.hits,
+            'misses': self.misses,
+            'flushes': self.flushes,
+            'written': self.written,
+            'failures': self.failures,
+        }
+
+    async def get(self, guild_id, user_id):
+        """The member's record, or None if they have never earned XP"""
+        key = (guild_id, user_id)
+        record = self._records.get(key)
+        if record is not None:
+            self._records.move_to_end(key)
+            self.hits += 1
+            return record
+        self.misses += 1
+        await self._idle.wait()
+        row = await self.db.fetchone(LOAD_SQL, (user_id, guild_id))
+        # Another task may have loaded or created it during the read
+        record = self._records.get(key)
+        if record is not None or row is None:
+            return record
+        record = LevelRecord.from_row(user_id, guild_id, row)
+        self._remember(key, record)
+        return record
+
+    async def fetch(self, guild_id, user_id):
+        """The member's record, created if they have none yet"""
+        record = await self.get(guild_id, user_id)
+        if record is None:
+            record = LevelRecord(user_id, guild_id)
+            self.mark(record)
+        return record
+
+    def mark(self, record):
+        """Queue a changed record for the next batch, caching it if it is new"""
+        key = (record.guild_id, record.user_id)
+        self._dirty.add(key)
+        if key not in self._records:
+            self._remember(key, record)
+
+    def _remember(self, key, record):
+        self._records[key] = record
+        self._trim()
+
+    def _trim(self):
+        excess = len(self._records) - self.capacity
+        if excess <= 0:
+            return
+        # Dirty records stay until they are written
+        victims = []
+        for key in self._records:
+            if len(victims) == excess:
+                break
+            if key not in self._dirty and key not in self._writing:
+                victims.append(key)
+        for key in victims:
+            del self._records[key]
+
+    async def flush(self):
+        """Upsert every dirty record in one transaction"""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        # Rows are taken now; changes made while they are written mark the record again
+        rows = [self._records[key].to_row() for key in dirty]
+        self._writing |= dirty
+        try:
+            await self.db.executemany(SAVE_SQL, rows)
+            self.flushes += 1
+            self.written += len(rows)
+        except Exception as e:
+            self.failures += 1
+            print(f"Error flushing level records: {e}")
+            self._dirty |= dirty
+        finally:
+            self._writing -= dirty
+        self._trim()
+
+    async def recompute(self, guild_id, derive):
+        """Rewrite the level and skill points of every member of a guild
+
+        ``derive(xp, level, skill_points)`` maps arrays of the current values
+        to arrays of new levels and skill points. Cached records change in
+        place and are written with the next batch; the rest are updated with
+        one executemany. Returns (old levels, new levels) for every member.
+        """
+        self._idle.clear()
+        try:
+            await self.flush()
+            rows = await self.db.fetchall(RECOMPUTE_SQL, (guild_id,))
+            if not rows:
+                empty = np.zeros(0, dtype=np.int64)
+                return empty, empty
+            table = await asyncio.to_thread(np.array, rows, dtype=np.int64)
+            users, xp, level, points = table.T
+            # Members in memory may have earned XP since the flush
+            cached = {user_id: record for (guild, user_id), record in self._records.items() if guild == guild_id}
+            for index, user_id in enumerate(users.tolist()):
+                record = cached.get(user_id)
+                if record is not None:
+                    xp[index], level[index], points[index] = record.xp, record.level, record.skill_points
+            new_level, new_points = derive(xp, level, points)
+            changed = np.flatnonzero((new_level != level) | (new_points != points))
+            updates = {}
+            for index in changed.tolist():
+                user_id = int(users[index])
+                values = (int(new_level[index]), int(new_points[index]))
+                record = cached.get(user_id)
+                if record is not None:
+                    record.level, record.skill_points = values
+                    self.mark(record)
+                else:
+                    updates[user_id] = values
+            await self.db.executemany(REWRITE_SQL, [(*values, user_id, guild_id) for user_id, values in updates.items()])
+            # A miss already reading when the rewrite began may have cached an old row
+            for user_id, values in updates.items():
+                record = self._records.get((guild_id, user_id))
+                if record is not None:
+                    record.level, record.skill_points = values
+                    self.mark(record)
+            return level, new_level
+        finally:
+            self._idle.set()
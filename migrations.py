@@ -0,0 +1,56 @@
+"""
+Schema migrations for Nexus Elite Bot
+Every module registers its ordered migrations at import time and they are
+applied once at startup, before any cog is loaded
+"""
+
+from datetime import datetime
+
+# namespace -> ordered list of migrations, each a list of SQL statements
+# or an async callable taking the writer connection
+_registry = {}
+
+
+def register(namespace, *steps):
+    """Register the ordered migrations for a namespace (re-registering replaces)"""
+    _registry[namespace] = list(steps)
+
+
+async def current_versions(db):
+    async with db.execute('SELECT namespace, version FROM schema_version') as cursor:
+        return {row[0]: row[1] for row in await cursor.fetchall()}
+
+
+async def run_migrations(database):
+    """Apply every pending migration in a single transaction"""
+    applied = []
+    async with database.write() as db:
+        await db.execute('BEGIN')
+        await db.execute('''CREATE TABLE IF NOT EXISTS schema_version
+                           (namespace TEXT PRIMARY KEY, version INTEGER NOT NULL, applied_at TEXT)''')
+        versions = await current_versions(db)
+        for namespace, steps in _registry.items():
+            version = versions.get(namespace, 0)
+            if version >= len(steps):
+                continue
+            for step in steps[version:]:
+                if callable(step):
+                    await step(db)
+                else:
+                    for statement in step:
+                        await db.execute(statement)
+            await db.execute('REPLACE INTO schema_version (namespace, version, applied_at) VALUES (?, ?, ?)',
+                             (namespace, len(steps), datetime.utcnow().isoformat()))
+            applied.append(f'{namespace} v{version} -> v{len(steps)}')
+    return applied
+
+
+def add_columns(table, *columns):
+    """Migration step adding any of the given column definitions missing from a table"""
+    async def step(db):
+        async with db.execute(f'PRAGMA table_info({table})') as cursor:
+            existing = {row[1] for row in await cursor.fetchall()}
+        for column in columns:
+            if column.split()[0] not in existing:
+                await db.execute(f'ALTER TABLE {table} ADD COLUMN {column}')
+    return step
@@ -0,0 +1,118 @@
+"""
+Message pipeline for Nexus Elite Bot
+A single on_message dispatcher running ordered stages registered by the cogs
+"""
+
+import re
+
+URL_RE = re.compile(r'https?://\S+', re.IGNORECASE)
+INVITE_RE = re.compile(r'(?:discord\.gg|discord(?:app)?\.com/invite)/([\w-]+)', re.IGNORECASE)
+
+# Stage order used across the bot (lower runs first)
+ORDER_CORE = 10
+ORDER_ANALYTICS = 50
+ORDER_SECURITY = 100
+ORDER_AUTOMOD = 110
+ORDER_MODERATION = 120
+ORDER_COMMANDS = 200
+ORDER_REGISTRATION = 250
+ORDER_AFK = 300
+ORDER_RESPONDERS = 400
+ORDER_LEVELING = 500
+
+
+class MessageContext:
+    """A message parsed once and shared by every stage"""
+
+    def __init__(self, message, features):
+        self.message = message
+        self.guild = message.guild
+        self.author = message.author
+        self.content = message.content
+        self.normalized = message.content.strip().lower()
+        self.mention_ids = {user.id for user in message.mentions}
+        self.urls = URL_RE.findall(message.content)
+        self.invite_codes = INVITE_RE.findall(message.content)
+        self.features = features
+        # Set by stages that removed the message
+        self.deleted = False
+
+
+class Stage:
+    def __init__(self, name, handler, order, feature=None, guild_only=True):
+        self.name = name
+        self.handler = handler
+        self.order = order
+        self.feature = feature
+        self.guild_only = guild_only
+
+
+class MessagePipeline:
+    """Ordered message stages with per-guild cached feature flags
+
+    A stage handler is ``async def handler(ctx)`` and returns True to stop
+    the remaining stages. A stage bound to a feature only runs when the
+    guild's cached value for that feature is truthy.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.stages = []
+        self.feature_loaders = {}
+        self._features = {}
+
+    def add_stage(self, name, handler, order, feature=None, guild_only=True):
+        self.remove_stage(name)
+        self.stages.append(Stage(name, handler, order, feature, guild_only))
+        self.stages.sort(key=lambda stage: stage.order)
+
+    def remove_stage(self, name):
+        self.stages = [stage for stage in self.stages if stage.name != name]
+
+    def add_feature(self, name, loader):
+        """Register ``async def loader(guild_id)`` returning the feature's cached value"""
+        self.feature_loaders[name] = loader
+        self.invalidate(feature=name)
+
+    def remove_feature(self, name):
+        self.feature_loaders.pop(name, None)
+        self.invalidate(feature=name)
+
+    def invalidate(self, guild_id=None, feature=None):
+        """Drop cached feature values so they are reloaded on the next message"""
+        if guild_id is None:
+            guilds = list(self._features)
+        else:
+            guilds = [guild_id] if guild_id in self._features else []
+        for gid in guilds:
+            if feature is None:
+                del self._features[gid]
+            else:
+                self._features[gid].pop(feature, None)
+
+    async def features_for(self, guild_id):
+        features = self._features.setdefault(guild_id, {})
+        for name, loader in self.feature_loaders.items():
+            if name not in features:
+                try:
+                    features[name] = await loader(guild_id)
+                except Exception as e:
+                    print(f"Error loading feature {name} for guild {guild_id}: {e}")
+                    features[name] = None
+        return features
+
+    async def dispatch(self, message):
+        if message.author.bot:
+            return
+        features = await self.features_for(message.guild.id) if message.guild else {}
+        ctx = MessageContext(message, features)
+        for stage in self.stages:
+            if stage.guild_only and ctx.guild is None:
+                continue
+            if stage.feature and not features.get(stage.feature):
+                continue
+            try:
+                if await stage.handler(ctx):
+                    break
+            except Exception as e:
+                print(f"Error in message stage {stage.name}: {e}")
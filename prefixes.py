@@ -0,0 +1,54 @@
+"""
+Prefix resolver for Nexus Elite Bot
+Per-guild prefixes and no-prefix users kept in memory, so resolving a
+prefix never touches the database
+"""
+
+from discord.ext import commands
+
+
+class PrefixResolver:
+    """In-memory prefix map and no-prefix set backed by the database"""
+
+    def __init__(self, db, default_prefix, admins=()):
+        self.db = db
+        self.default = default_prefix
+        self.admins = set(admins)
+        self.noprefix = set()
+        self.guild_prefixes = {}
+
+    async def load(self):
+        """Load both caches once at startup"""
+        rows = await self.db.fetchall('SELECT user_id FROM noprefix_users')
+        self.noprefix = {row[0] for row in rows}
+        rows = await self.db.fetchall('SELECT guild_id, prefix FROM guild_prefixes')
+        self.guild_prefixes = {guild_id: prefix for guild_id, prefix in rows}
+
+    def prefix_for(self, guild_id):
+        return self.guild_prefixes.get(guild_id, self.default)
+
+    def is_noprefix(self, user_id):
+        return user_id in self.admins or user_id in self.noprefix
+
+    def resolve(self, bot, message):
+        prefix = self.prefix_for(message.guild.id) if message.guild else self.default
+        if self.is_noprefix(message.author.id):
+            return commands.when_mentioned_or(prefix, '')(bot, message)
+        return commands.when_mentioned_or(prefix)(bot, message)
+
+    async def add_noprefix(self, user_id):
+        # The cache is updated before the write so the next message already sees it
+        self.noprefix.add(user_id)
+        await self.db.execute('INSERT OR IGNORE INTO noprefix_users (user_id) VALUES (?)', (user_id,))
+
+    async def remove_noprefix(self, user_id):
+        self.noprefix.discard(user_id)
+        await self.db.execute('DELETE FROM noprefix_users WHERE user_id = ?', (user_id,))
+
+    async def set_guild_prefix(self, guild_id, prefix):
+        if prefix == self.default:
+            self.guild_prefixes.pop(guild_id, None)
+            await self.db.execute('DELETE FROM guild_prefixes WHERE guild_id = ?', (guild_id,))
+        else:
+            self.guild_prefixes[guild_id] = prefix
+            await self.db.execute('REPLACE INTO guild_prefixes (guild_id, prefix) VALUES (?, ?)', (guild_id, prefix))
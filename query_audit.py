@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Query Audit Script
+Runs EXPLAIN QUERY PLAN over every SQL statement in the bot and its cogs and
+fails when a filtered or sorted query has to scan a whole table
+
+Usage: python query_audit.py [--database database.db] [--min-rows 0]
+"""
+
+import argparse
+import ast
+import asyncio
+import glob
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+import migrations
+from database import Database
+
+# Statements are written with upper case keywords throughout the bot
+SQL_START = re.compile(r'^\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE|WITH)\s.*\b(FROM|INTO|SET)\b', re.DOTALL)
+WHERE = re.compile(r'\bWHERE\b')
+FILTERED = re.compile(r'\b(WHERE|ORDER\s+BY|GROUP\s+BY)\b')
+BINDINGS = re.compile(r'uses (\d+)')
+# "SCAN t" / "SCAN TABLE t" (older SQLite), optionally walking a whole index
+SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?( USING (?:COVERING )?INDEX \w+)?$')
+
+
+def source_files():
+    files = sorted(glob.glob('*.py')) + sorted(glob.glob('cogs/*.py'))
+    return [path for path in files if path != os.path.basename(__file__)]
+
+
+def parse(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return ast.parse(f.read(), filename=path)
+
+
+def is_register_call(node):
+    return isinstance(node, ast.Call) and ast.unparse(node.func) == 'migrations.register'
+
+
+def is_format_call(node):
+    return (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+            and node.func.attr == 'format' and isinstance(node.func.value, ast.Constant))
+
+
+def is_stdlib_import(node):
+    if isinstance(node, ast.Import):
+        return all(alias.name.split('.')[0] in sys.stdlib_module_names for alias in node.names)
+    return (isinstance(node, ast.ImportFrom) and node.level == 0
+            and node.module.split('.')[0] in sys.stdlib_module_names)
+
+
+def collect_statements(files):
+    """(file, line, sql) for every literal SQL string, plus the count of f-string SQL skipped"""
+    statements = []
+    dynamic = 0
+    for path in files:
+        tree = parse(path)
+        # Pieces of f-strings and one-off migration statements are not audited
+        skipped = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.JoinedStr) or is_register_call(node) or is_format_call(node):
+                skipped.update(id(child) for child in ast.walk(node))
+        for node in ast.walk(tree):
+            if isinstance(node, ast.JoinedStr):
+                text = ''.join(part.value if isinstance(part, ast.Constant) else '?' for part in node.values)
+                if SQL_START.match(text):
+                    dynamic += 1
+            elif is_format_call(node):
+                if isinstance(node.func.value.value, str) and SQL_START.match(node.func.value.value):
+                    dynamic += 1
+            elif (isinstance(node, ast.Constant) and isinstance(node.value, str)
+                    and id(node) not in skipped and SQL_START.match(node.value)):
+                statements.append((path, node.lineno, node.value))
+    return statements, dynamic
+
+
+def register_migrations(files):
+    """Register every module's migrations without importing discord
+
+    Only module-level helpers and the ``migrations.register(...)`` calls are
+    evaluated, so the cogs' imports are never run.
+    """
+    for path in files:
+        tree = parse(path)
+        namespace = {'migrations': migrations}
+        for node in tree.body:
+            # Helper functions used as migration steps, and the standard library they use
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Assign)) or is_stdlib_import(node):
+                try:
+                    exec(compile(ast.Module(body=[node], type_ignores=[]), path, 'exec'), namespace)
+                except Exception:
+                    pass
+        for node in tree.body:
+            if isinstance(node, ast.Expr) and is_register_call(node.value):
+                exec(compile(ast.Expression(body=node.value), path, 'eval'), namespace)
+
+
+async def prepare_database(source, files):
+    """Copy the database (or start empty) and bring it to the current schema"""
+    directory = tempfile.mkdtemp(prefix='query_audit_')
+    path = os.path.join(directory, 'audit.db')
+    if source and os.path.exists(source):
+        shutil.copyfile(source, path)
+    register_migrations(files)
+    db = Database(path)
+    await db.connect()
+    try:
+        await migrations.run_migrations(db)
+    finally:
+        await db.close()
+    return directory, path
+
+
+def explain(conn, sql):
+    try:
+        return conn.execute(f'EXPLAIN QUERY PLAN {sql}').fetchall()
+    except sqlite3.ProgrammingError as e:
+        match = BINDINGS.search(str(e))
+        if not match:
+            raise
+        return conn.execute(f'EXPLAIN QUERY PLAN {sql}', (None,) * int(match.group(1))).fetchall()
+
+
+def audit(db_path, statements, min_rows):
+    conn = sqlite3.connect(db_path)
+    row_counts = {}
+
+    def rows_in(table):
+        if table not in row_counts:
+            try:
+                row_counts[table] = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+            except sqlite3.Error:
+                row_counts[table] = 0
+        return row_counts[table]
+
+    failures = []
+    errors = []
+    checked = 0
+    for path, line, sql in statements:
+        try:
+            plan = explain(conn, sql)
+        except sqlite3.Error as e:
+            errors.append((path, line, str(e)))
+            continue
+        checked += 1
+        # Whole-table reads (startup loads, counts) are scans by design
+        if not FILTERED.search(sql):
+            continue
+        for row in plan:
+            match = SCAN.match(row[-1])
+            if not match or match.group(1).startswith('sqlite_'):
+                continue
+            # Walking an index in order is fine for ORDER BY ... LIMIT, not for a filter
+            if match.group(2) and not WHERE.search(sql):
+                continue
+            if rows_in(match.group(1)) >= min_rows:
+                failures.append((path, line, row[-1], ' '.join(sql.split())))
+    conn.close()
+    return checked, failures, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Audit query plans for full table scans')
+    parser.add_argument('--database', default='database.db',
+                        help='database to copy for schema and row counts (default: database.db)')
+    parser.add_argument('--min-rows', type=int, default=0,
+                        help='ignore scans of tables with fewer rows than this (default: 0)')
+    args = parser.parse_args()
+
+    print("🔎 Running Query Audit...")
+    files = source_files()
+    statements, dynamic = collect_statements(files)
+    directory, db_path = asyncio.run(prepare_database(args.database, files))
+    try:
+        checked, failures, errors = audit(db_path, statements, args.min_rows)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"📊 {checked} statements checked, {dynamic} dynamic statements skipped")
+    if errors:
+        print(f"⚠️  {len(errors)} statements could not be planned:")
+        for path, line, error in errors:
+            print(f"   📁 {path}:{line} - {error}")
+    if failures:
+        print("❌ Full table scans found:")
+        for path, line, detail, sql in failures:
+            print(f"   📁 {path}:{line}")
+            print(f"   🔍 {detail}")
+            print(f"      {sql[:160]}")
+            print()
+        return 1
+    print("✅ No full table scans in filtered queries!")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+Rank cards for Nexus Elite Bot
+Cards are drawn with Pillow in their own worker processes (a ChartService
+pool), each of which decodes the fonts and draws the background once and
+reuses them for every card. Avatars are downloaded once per avatar hash into
+a bounded directory the workers read from, and finished cards are cached by
+the caller under a key holding everything drawn, so a repeated request only
+costs a dictionary lookup until the member's XP changes
+"""
+
+import asyncio
+import io
+import os
+import tempfile
+from collections import OrderedDict
+
+RANK_CARD_WORKERS = int(os.getenv('RANK_CARD_WORKERS', '2'))
+RANK_CARD_CACHE_SIZE = int(os.getenv('RANK_CARD_CACHE_SIZE', '256'))
+AVATAR_CACHE_DIR = os.getenv('AVATAR_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'nexus_avatars'))
+AVATAR_CACHE_FILES = int(os.getenv('AVATAR_CACHE_FILES', '2000'))
+# TrueType font for card text; Pillow's built-in font is used when it cannot be loaded
+RANK_CARD_FONT = os.getenv('RANK_CARD_FONT', 'DejaVuSans-Bold.ttf')
+
+CARD_SIZE = (934, 282)
+AVATAR_SIZE = 180
+AVATAR_BOX = (50, 51)
+BAR_BOX = (270, 190, 880, 226)
+
+# Decoded once per worker process by _template()
+_template_cache = None
+
+
+def _template():
+    global _template_cache
+    if _template_cache is None:
+        from PIL import Image, ImageDraw, ImageFont
+
+        def font(size):
+            try:
+                return ImageFont.truetype(RANK_CARD_FONT, size)
+            except OSError:
+                return ImageFont.load_default(size)
+
+        width, height = CARD_SIZE
+        background = Image.new('RGBA', CARD_SIZE, (35, 39, 42, 255))
+        draw = ImageDraw.Draw(background)
+        # Vertical gradient, a darker panel for the content and the empty progress track
+        for y in range(height):
+            shade = 35 + int(12 * y / height)
+            draw.line([(0, y), (width, y)], fill=(shade, shade + 4, shade + 7, 255))
+        draw.rounded_rectangle((20, 20, width - 20, height - 20), radius=24, fill=(24, 25, 28, 255))
+        draw.rounded_rectangle(BAR_BOX, radius=18, fill=(72, 75, 78, 255))
+
+        mask = Image.new('L', (AVATAR_SIZE, AVATAR_SIZE), 0)
+        ImageDraw.Draw(mask).ellipse((0, 0, AVATAR_SIZE, AVATAR_SIZE), fill=255)
+        placeholder = Image.new('RGBA', (AVATAR_SIZE, AVATAR_SIZE), (88, 101, 242, 255))
+
+        _template_cache = {
+            'background': background,
+            'mask': mask,
+            'placeholder': placeholder,
+            'name': font(40),
+            'label': font(26),
+            'value': font(48),
+            'small': font(24),
+        }
+    return _template_cache
+
+
+def render_rank_card(avatar_path, name, level, rank, xp, level_xp, next_xp, color):
+    """PNG of a member's rank card; runs in a worker process, which is where Pillow is imported
+
+    ``rank`` is 0-based or None, ``color`` an (r, g, b) accent for the bar.
+    """
+    from PIL import Image, ImageDraw
+
+    template = _template()
+    card = template['background'].copy()
+    draw = ImageDraw.Draw(card)
+
+    avatar = template['placeholder']
+    if avatar_path:
+        try:
+            with Image.open(avatar_path) as image:
+                avatar = image.convert('RGBA').resize((AVATAR_SIZE, AVATAR_SIZE))
+        except OSError:
+            pass
+    card.paste(avatar, AVATAR_BOX, template['mask'])
+
+    left, top, right, bottom = BAR_BOX
+    span = max(next_xp - level_xp, 1)
+    progress = min(max((xp - level_xp) / span, 0), 1)
+    if progress > 0:
+        filled = max(left + int((right - left) * progress), left + (bottom - top))
+        draw.rounded_rectangle((left, top, filled, bottom), radius=18, fill=tuple(color) + (255,))
+
+    draw.text((left, 140), name[:24], font=template['name'], fill=(255, 255, 255, 255), anchor='ls')
+    draw.text((right, 256), f"{xp:,} / {next_xp:,} XP", font=template['small'],
+              fill=(185, 187, 190, 255), anchor='rs')
+    standing = f"#{rank + 1}" if rank is not None else "-"
+    draw.text((right, 100), f"LEVEL {level}", font=template['value'], fill=tuple(color) + (255,), anchor='rs')
+    draw.text((left, 90), f"RANK {standing}", font=template['label'],
+              fill=(185, 187, 190, 255), anchor='ls')
+
+    buffer = io.BytesIO()
+    # Speed over size: cards are sent once and cached as bytes
+    card.convert('RGB').save(buffer, format='PNG', compress_level=1)
+    return buffer.getvalue()
+
+
+class AvatarCache:
+    """Avatar PNGs on disk keyed by avatar hash, keeping the ``max_files`` most recently used"""
+
+    def __init__(self, directory=AVATAR_CACHE_DIR, max_files=AVATAR_CACHE_FILES):
+        self.directory = directory
+        self.max_files = max_files
+        os.makedirs(directory, exist_ok=True)
+        # file name -> path, least recently used first; files from earlier runs are reused
+        entries = sorted(os.scandir(directory), key=lambda entry: entry.stat().st_mtime)
+        self._files = OrderedDict((entry.name, entry.path) for entry in entries if entry.name.endswith('.png'))
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self._trim()
+
+    async def fetch(self, asset):
+        """Path of ``asset`` (a discord.Asset) on disk, downloading it once; None if it cannot be"""
+        name = f"{asset.key}.png"
+        path = self._files.get(name)
+        if path is not None:
+            self._files.move_to_end(name)
+            self.hits += 1
+            return path
+        task = self._inflight.get(name)
+        if task is None:
+            self.misses += 1
+            task = asyncio.create_task(self._download(name, asset))
+            self._inflight[name] = task
+            task.add_done_callback(lambda done: self._inflight.pop(name, None))
+        return await asyncio.shield(task)
+
+    async def _download(self, name, asset):
+        try:
+            data = await asset.with_format('png').with_size(256).read()
+        except Exception as e:
+            print(f"Error downloading avatar {asset.key}: {e}")
+            return None
+        path = os.path.join(self.directory, name)
+        await asyncio.to_thread(_write, path, data)
+        self._files[name] = path
+        self._trim()
+        return path
+
+    def _trim(self):
+        while len(self._files) > self.max_files:
+            _, path = self._files.popitem(last=False)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        return {'files': len(self._files), 'hits': self.hits, 'misses': self.misses}
+
+
+def _write(path, data):
+    # Written under another name first so a worker never opens half a file
+    partial = f"{path}.part"
+    with open(partial, 'wb') as file:
+        file.write(data)
+    os.replace(partial, path)
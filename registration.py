@@ -0,0 +1,130 @@
+"""
+Scrim registration for Nexus Elite Bot
+Registration channels, registered players and member names are held in
+memory so sign-up bursts never scan the member list or query per player
+"""
+
+import sqlite3
+
+# Rows registered before registrations were scoped to a guild
+LEGACY_GUILD = None
+
+
+def parse_team(content, player_count):
+    """Split a registration message into (team_name, tags), or None if malformed
+
+    Either ``team @p1 @p2`` on one line or the team name on the first line
+    followed by the tags on the next ones.
+    """
+    content = content.strip()
+    if not content:
+        return None
+    lines = content.split('\n')
+    if len(lines) == 1:
+        parts = lines[0].split()
+        if len(parts) < 1 + player_count:
+            return None
+        team_name = parts[0]
+        tags = parts[1:]
+    else:
+        team_name = lines[0].strip()
+        tags = []
+        for line in lines[1:]:
+            tags.extend(line.strip().split())
+    tags = [tag for tag in tags if tag]
+    if len(tags) != player_count:
+        return None
+    return team_name, tags
+
+
+class ScrimRegistry:
+    """In-memory view of scrim registration backed by scrim_tags"""
+
+    def __init__(self, db):
+        self.db = db
+        self.channels = set()
+        self.player_count = None
+        # guild id -> set of registered tags (user ids as strings)
+        self.registered = {}
+        # guild id -> {(name, discriminator): user id}, built on first use
+        self._names = {}
+
+    async def load(self):
+        rows = await self.db.fetchall('SELECT registration_channel FROM guild_settings')
+        self.channels = {row[0] for row in rows if row[0]}
+        row = await self.db.fetchone('SELECT player_count FROM scrim_config WHERE id = 1')
+        self.player_count = row[0] if row else None
+        self.registered = {}
+        for guild_id, tag in await self.db.fetchall('SELECT guild_id, tag FROM scrim_tags'):
+            self.registered.setdefault(guild_id, set()).add(tag)
+
+    def is_registration_channel(self, channel_id):
+        return channel_id in self.channels
+
+    def is_registered(self, guild_id, tag):
+        return tag in self.registered.get(guild_id, ()) or tag in self.registered.get(LEGACY_GUILD, ())
+
+    # Member name index
+
+    def _name_index(self, guild):
+        index = self._names.get(guild.id)
+        if index is None:
+            index = {(member.name, member.discriminator): member.id for member in guild.members}
+            self._names[guild.id] = index
+        return index
+
+    def add_member(self, member):
+        index = self._names.get(member.guild.id)
+        if index is not None:
+            index[(member.name, member.discriminator)] = member.id
+
+    def remove_member(self, member):
+        index = self._names.get(member.guild.id)
+        if index is not None and index.get((member.name, member.discriminator)) == member.id:
+            del index[(member.name, member.discriminator)]
+
+    def rename_user(self, before, after):
+        old_key = (before.name, before.discriminator)
+        new_key = (after.name, after.discriminator)
+        if old_key == new_key:
+            return
+        for index in self._names.values():
+            if index.get(old_key) == after.id:
+                del index[old_key]
+                index[new_key] = after.id
+
+    def resolve_tag(self, guild, tag):
+        """Member id for a mention, raw id or name#discriminator tag, or None"""
+        user_id = None
+        if tag.startswith('<@') and tag.endswith('>'):
+            tag_id = tag.replace('<@!', '').replace('<@', '').replace('>', '')
+            if tag_id.isdigit():
+                user_id = int(tag_id)
+        elif tag.isdigit():
+            user_id = int(tag)
+        elif '#' in tag:
+            name, discrim = tag.rsplit('#', 1)
+            user_id = self._name_index(guild).get((name, discrim))
+        if user_id is None or guild.get_member(user_id) is None:
+            return None
+        return user_id
+
+    async def register(self, guild_id, team_name, member_ids, author_id):
+        """Register a team in one batch; False if any player is already registered"""
+        tags = [str(user_id) for user_id in member_ids]
+        if any(self.is_registered(guild_id, tag) for tag in tags):
+            return False
+        # Claim the players before awaiting so concurrent sign-ups see them
+        registered = self.registered.setdefault(guild_id, set())
+        registered.update(tags)
+        try:
+            await self.db.executemany(
+                'INSERT INTO scrim_tags (guild_id, team_name, tag, user_id) VALUES (?, ?, ?, ?)',
+                [(guild_id, team_name, tag, author_id) for tag in tags])
+        except sqlite3.IntegrityError:
+            registered.difference_update(tags)
+            return False
+        except Exception:
+            registered.difference_update(tags)
+            raise
+        return True
@@ -0,0 +1,114 @@
+"""
+Background report engine for Nexus Elite Bot
+Heavy admin reports run as jobs on their own read-only connections, so they
+never hold a pooled reader or wait behind the write path. Results are cached
+per guild until the guild's analytics data version moves or the TTL passes
+(bot-wide reports, keyed by None, only by the TTL),
+and a report already being built is shared instead of queued again
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', '2'))
+REPORT_CACHE_TTL = int(os.getenv('REPORT_CACHE_TTL', '300'))
+REPORT_CACHE_SIZE = 256
+
+
+class ReportEngine:
+    """Runs report builders in the background and caches what they return
+
+    A builder is ``async def build(*args)`` returning plain data; embeds are
+    made from it by the command, so a cached result can be shown to anyone.
+    Every ``bot.db.read()`` inside a builder uses the job's connection.
+    """
+
+    def __init__(self, db, counters, workers=REPORT_WORKERS, ttl=REPORT_CACHE_TTL,
+                 cache_size=REPORT_CACHE_SIZE):
+        self.db = db
+        self.counters = counters
+        self.workers = workers
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self._readers = asyncio.Queue()
+        self._all_readers = []
+        # key -> (expires, data version, result)
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def start(self):
+        for _ in range(self.workers):
+            reader = await self.db.open_reader()
+            self._all_readers.append(reader)
+            self._readers.put_nowait(reader)
+
+    async def close(self):
+        for task in list(self._inflight.values()):
+            task.cancel()
+        if self._inflight:
+            await asyncio.gather(*self._inflight.values(), return_exceptions=True)
+        for reader in self._all_readers:
+            try:
+                await reader.close()
+            except Exception:
+                pass
+        self._all_readers = []
+
+    def stats(self):
+        return {
+            'cached': len(self._cache),
+            'running': len(self._inflight),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    async def run(self, key, build, *args):
+        """Result of ``build(*args)`` for ``key``, a tuple starting with the guild id
+
+        A key starting with None is a bot-wide report, shared by every guild
+        and cached for the TTL alone.
+        """
+        entry = self._cache.get(key)
+        if entry is not None:
+            expires, version, result = entry
+            if time.monotonic() < expires and version == self._version(key):
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return result
+            del self._cache[key]
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.create_task(self._job(key, build, args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        # Callers giving up must not cancel a job other callers are waiting for
+        return await asyncio.shield(task)
+
+    async def _job(self, key, build, args):
+        # Counts still in memory belong in a fresh report; the version is taken
+        # before reading so a flush during the build makes the result stale
+        await self.counters.flush()
+        version = self._version(key)
+        reader = await self._readers.get()
+        try:
+            async with self.db.pinned(reader):
+                result = await build(*args)
+        finally:
+            self._readers.put_nowait(reader)
+        self._cache[key] = (time.monotonic() + self.ttl, version, result)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def _version(self, key):
+        return None if key[0] is None else self.counters.version(key[0])
+
+    def _finished(self, key, task):
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Error building report {key[1]} for guild {key[0]}: {task.exception()}")
@@ -0,0 +1,161 @@
+"""
+Timer service for Nexus Elite Bot
+Delayed work is stored as rows in the timers table and a single sleeper
+wakes for the earliest deadline, so pending timers survive restarts and
+cost a heap entry each instead of a parked coroutine
+"""
+
+import asyncio
+import heapq
+import json
+import time
+from datetime import datetime, timezone
+
+import migrations
+
+# The sleeper re-checks the clock at least this often
+MAX_SLEEP = 3600
+# A failing handler is retried after RETRY_DELAY seconds, doubling up to MAX_SLEEP; after
+# MAX_ATTEMPTS the timer is left in the table and only tried again on the next start
+RETRY_DELAY = 30
+MAX_ATTEMPTS = 10
+
+migrations.register('timers', [
+    '''CREATE TABLE IF NOT EXISTS timers
+       (id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL,
+        due REAL NOT NULL, payload TEXT NOT NULL DEFAULT '{}', created_at TEXT)''',
+    '''CREATE INDEX IF NOT EXISTS idx_timers_due ON timers (due)''',
+])
+
+
+def to_timestamp(when):
+    """Unix time for a datetime (naive values are UTC, as everywhere in the bot) or a number"""
+    if isinstance(when, datetime):
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        return when.timestamp()
+    return float(when)
+
+
+class TimerService:
+    """Durable one-shot timers dispatched by kind to registered handlers
+
+    A handler is ``async def handler(payload)`` taking the dict passed to
+    ``schedule``. Timers whose kind has no handler yet (the cog is not
+    loaded) wait until one is registered.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.handlers = {}
+        # (due, id, kind); payloads stay in the database until the timer fires
+        self._heap = []
+        self._waiting = {}
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._closing = False
+        self._running = set()
+        # timer id -> failed runs this process; a restart gives every timer a fresh set
+        self._attempts = {}
+
+    async def load(self):
+        rows = await self.db.fetchall('SELECT due, id, kind FROM timers')
+        self._heap = [tuple(row) for row in rows]
+        heapq.heapify(self._heap)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        # Stopped the same way as the write-behind queue (see WriteBehind.close)
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        # Timers already firing finish before the database goes away
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    @property
+    def pending(self):
+        return len(self._heap) + sum(len(entries) for entries in self._waiting.values())
+
+    def register(self, kind, handler):
+        self.handlers[kind] = handler
+        for entry in self._waiting.pop(kind, []):
+            heapq.heappush(self._heap, entry)
+        self._wakeup.set()
+
+    def unregister(self, kind):
+        self.handlers.pop(kind, None)
+
+    async def schedule(self, kind, when, payload=None):
+        """Persist a timer firing at ``when`` (datetime or unix time) and return its id"""
+        due = to_timestamp(when)
+        async with self.db.write() as db:
+            cursor = await db.execute(
+                'INSERT INTO timers (kind, due, payload, created_at) VALUES (?, ?, ?, ?)',
+                (kind, due, json.dumps(payload or {}), datetime.utcnow().isoformat()))
+            timer_id = cursor.lastrowid
+        heapq.heappush(self._heap, (due, timer_id, kind))
+        # Only a new earliest deadline needs the sleeper to wake up
+        if self._heap[0][1] == timer_id:
+            self._wakeup.set()
+        return timer_id
+
+    async def cancel(self, timer_id):
+        # The heap entry is dropped lazily when it comes due and has no row
+        return await self.db.execute('DELETE FROM timers WHERE id = ?', (timer_id,)) > 0
+
+    async def _run(self):
+        while not self._closing:
+            delay = MAX_SLEEP
+            if self._heap:
+                delay = min(max(self._heap[0][0] - time.time(), 0), MAX_SLEEP)
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+            if self._closing:
+                break
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                if entry[2] not in self.handlers:
+                    self._waiting.setdefault(entry[2], []).append(entry)
+                    continue
+                task = asyncio.create_task(self._fire(entry))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+
+    async def _fire(self, entry):
+        _, timer_id, kind = entry
+        row = await self.db.fetchone('SELECT payload FROM timers WHERE id = ?', (timer_id,))
+        if row is None:
+            self._attempts.pop(timer_id, None)
+            return  # Cancelled
+        handler = self.handlers.get(kind)
+        if handler is None:
+            self._waiting.setdefault(kind, []).append(entry)
+            return
+        try:
+            await handler(json.loads(row[0]))
+        except Exception as e:
+            # The row is kept so a transient failure cannot lose the timer
+            attempts = self._attempts.get(timer_id, 0) + 1
+            if attempts >= MAX_ATTEMPTS:
+                self._attempts.pop(timer_id, None)
+                print(f"Error running {kind} timer {timer_id}, giving up until restart: {e}")
+                return
+            self._attempts[timer_id] = attempts
+            delay = min(RETRY_DELAY * 2 ** (attempts - 1), MAX_SLEEP)
+            print(f"Error running {kind} timer {timer_id}, retrying in {delay}s: {e}")
+            heapq.heappush(self._heap, (time.time() + delay, timer_id, kind))
+            self._wakeup.set()
+            return
+        self._attempts.pop(timer_id, None)
+        await self.db.execute('DELETE FROM timers WHERE id = ?', (timer_id,))
@@ -0,0 +1,135 @@
+"""
+Voice session accounting for Nexus Elite Bot
+Members in voice have an open session in memory. Every interval the time
+since the last credit is turned into whole minutes for the analytics
+counters and for subscribers such as leveling, so long sessions earn as they
+go and nothing is written per voice event. Sessions are rebuilt from the
+gateway's voice states when the bot connects
+"""
+
+import asyncio
+import os
+import time
+
+VOICE_CREDIT_SECONDS = int(os.getenv('VOICE_CREDIT_SECONDS', '60'))
+
+
+class VoiceSession:
+    __slots__ = ('channel_id', 'afk', 'credited', 'seconds')
+
+    def __init__(self, channel_id, afk, now):
+        self.channel_id = channel_id
+        self.afk = afk
+        # Time up to which the session has been accounted
+        self.credited = now
+        # Accounted seconds not yet credited as a whole minute
+        self.seconds = 0.0
+
+
+class VoiceSessions:
+    """Open voice sessions keyed by (guild_id, user_id)
+
+    Time in the AFK channel is not counted. Subscribers are
+    ``async def callback(credits)`` taking (guild_id, user_id, minutes) tuples.
+    """
+
+    def __init__(self, counters, interval=VOICE_CREDIT_SECONDS):
+        self.counters = counters
+        self.interval = interval
+        self._sessions = {}
+        # Whole minutes of sessions that ended since the last credit
+        self._ended = []
+        self._subscribers = {}
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._closing = False
+        self.minutes = 0
+
+    def subscribe(self, name, callback):
+        self._subscribers[name] = callback
+
+    def unsubscribe(self, name):
+        self._subscribers.pop(name, None)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.credit()
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not self._closing:
+                await self.credit()
+
+    def stats(self):
+        return {
+            'open': len(self._sessions),
+            'afk': sum(1 for session in self._sessions.values() if session.afk),
+            'minutes': self.minutes,
+        }
+
+    def update(self, guild_id, user_id, channel_id, afk=False, now=None):
+        """Apply a voice state: join, leave (channel_id None), move or AFK change"""
+        now = time.monotonic() if now is None else now
+        key = (guild_id, user_id)
+        session = self._sessions.get(key)
+        if session is None:
+            if channel_id is not None:
+                self._sessions[key] = VoiceSession(channel_id, afk, now)
+            return
+        self._account(session, now)
+        if channel_id is None:
+            # Whole minutes are credited with the next batch; the rest is dropped
+            self._sessions.pop(key)
+            minutes = int(session.seconds // 60)
+            if minutes:
+                self._ended.append((guild_id, user_id, minutes))
+            return
+        session.channel_id = channel_id
+        session.afk = afk
+
+    def restore(self, guild_id, states, now=None):
+        """Rebuild a guild's sessions from {user_id: (channel_id, afk)} of everyone in voice"""
+        now = time.monotonic() if now is None else now
+        for key in [key for key in self._sessions if key[0] == guild_id and key[1] not in states]:
+            self.update(guild_id, key[1], None, now=now)
+        for user_id, (channel_id, afk) in states.items():
+            self.update(guild_id, user_id, channel_id, afk, now)
+
+    def _account(self, session, now):
+        if not session.afk:
+            session.seconds += now - session.credited
+        session.credited = now
+
+    async def credit(self, now=None):
+        """Credit every session's whole minutes to the counters and subscribers"""
+        now = time.monotonic() if now is None else now
+        credits, self._ended = self._ended, []
+        for (guild_id, user_id), session in self._sessions.items():
+            self._account(session, now)
+            minutes = int(session.seconds // 60)
+            if minutes:
+                session.seconds -= minutes * 60
+                credits.append((guild_id, user_id, minutes))
+        if not credits:
+            return
+        for guild_id, user_id, minutes in credits:
+            self.counters.voice(guild_id, user_id, minutes)
+            self.minutes += minutes
+        for name, callback in list(self._subscribers.items()):
+            try:
+                await callback(credits)
+            except Exception as e:
+                print(f"Error crediting voice minutes to {name}: {e}")